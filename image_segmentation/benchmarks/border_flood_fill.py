@@ -0,0 +1,66 @@
+"""
+Compares the connected components based ObjectSegmentation._process_mask with the previous per-pixel border flood fill.
+
+Run from the repository root: python -m image_segmentation.benchmarks.border_flood_fill
+"""
+import time
+
+import cv2
+import numpy as np
+
+from image_segmentation.object_detection.object_segmentation import ObjectSegmentation
+
+# (width, height) of typical phone camera photos
+RESOLUTIONS = [(1920, 1080), (3264, 2448), (4032, 3024), (4000, 3000), (8064, 6048)]
+OBJECTS = 150
+
+
+def reference_process_mask(mask: np.ndarray) -> np.ndarray:
+    """Per-pixel border flood fill, as computed before connected components were used."""
+    image = np.ascontiguousarray(np.array(mask) * 255, dtype=np.uint8)
+    for x in range(0, image.shape[0]):
+        if image[x][0] == 0:
+            cv2.floodFill(image, None, (0, x), 255)
+        if image[x][image.shape[1] - 1] == 0:
+            cv2.floodFill(image, None, (image.shape[1] - 1, x), 255)
+    for y in range(0, image.shape[1]):
+        if image[0][y] == 0:
+            cv2.floodFill(image, None, (y, 0), 255)
+        if image[image.shape[0] - 1][y] == 0:
+            cv2.floodFill(image, None, (y, image.shape[0] - 1), 255)
+    _, binary_image = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY_INV)
+    return binary_image
+
+
+def random_mask(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """Background mask with objects (holes) scattered over it, including objects cut by the border,
+    and noisy border columns which trigger many separate flood fills."""
+    mask = np.full((height, width), 255, dtype=np.uint8)
+    radius = max(4, min(width, height) // 60)
+    for x, y in zip(rng.integers(-radius, width + radius, OBJECTS), rng.integers(-radius, height + radius, OBJECTS)):
+        cv2.circle(mask, (int(x), int(y)), int(rng.integers(radius // 2, radius * 2)), 0, thickness=cv2.FILLED)
+    mask[:, :2] = np.where(rng.random((height, 2)) < 0.5, 0, 255)
+    return mask > 0
+
+
+def main():
+    rng = np.random.default_rng(0)
+    segmentation = ObjectSegmentation.__new__(ObjectSegmentation)
+    print(f"{'resolution':>11} {'MP':>5} {'flood fill [s]':>15} {'components [s]':>15} {'speedup':>8} identical")
+    for width, height in RESOLUTIONS:
+        mask = random_mask(rng, width, height)
+
+        start = time.perf_counter()
+        reference = reference_process_mask(mask)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        binary_image = segmentation._process_mask(mask)  # pylint: disable=protected-access
+        components_time = time.perf_counter() - start
+
+        print(f"{width:>5}x{height:<5} {width * height / 1e6:>5.1f} {reference_time:>15.3f} {components_time:>15.3f} "
+              f"{reference_time / components_time:>7.1f}x {np.array_equal(reference, binary_image)}")
+
+
+if __name__ == "__main__":
+    main()
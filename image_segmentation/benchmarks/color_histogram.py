@@ -0,0 +1,75 @@
+"""
+Compares the lookup table based ColorSimilarity.get_histogram with the previous per-pixel implementation.
+
+Run from the repository root: python -m image_segmentation.benchmarks.color_histogram
+"""
+import time
+
+import cv2
+import numpy as np
+from PIL import Image as PILImage
+
+from image_segmentation.constants import HISTOGRAM_IMAGE_SIZE
+from image_segmentation.object_classification.feature_extraction import ColorSimilarity, build_bin_lookup_table
+
+CROPS = 50
+REPEATS = 3
+
+
+def reference_histogram(image: PILImage.Image) -> np.ndarray:
+    """Per-pixel histogram, as computed before the lookup table was introduced."""
+    image = image.resize((HISTOGRAM_IMAGE_SIZE, HISTOGRAM_IMAGE_SIZE))
+    image_array = np.array(image.convert('RGB'))
+    mask = np.array([not (image_array[x][y] == np.array([255, 255, 255])).all() for x in range(image.height)
+                     for y in range(image.width)])
+    image = cv2.cvtColor(np.array(image).astype(np.float32) / 255.0, cv2.COLOR_RGB2Luv)
+
+    centroids = ColorSimilarity.ISCC_NBS_CENTROIDS_LUV
+    histogram = np.zeros(len(centroids))
+    for i, pixel in enumerate(image.reshape(-1, 3)):
+        if mask[i]:
+            histogram[np.argmin(np.sqrt(np.sum((centroids - pixel) ** 2, axis=1)))] += 1
+    return histogram / np.sum(histogram)
+
+
+def random_crop(rng: np.random.Generator) -> PILImage.Image:
+    """Random noisy crop with a white background border, similar to a processed element."""
+    height, width = rng.integers(40, 400, size=2)
+    crop = rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    crop[:height // 8] = 255
+    crop[:, :width // 8] = 255
+    return PILImage.fromarray(crop)
+
+
+def measure(function, crops) -> tuple[float, list[np.ndarray]]:
+    best = float('inf')
+    histograms = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        histograms = [function(crop) for crop in crops]
+        best = min(best, time.perf_counter() - start)
+    return best, histograms
+
+
+def main():
+    start = time.perf_counter()
+    lut = build_bin_lookup_table(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV)
+    print(f"Lookup table ({lut.nbytes / 2 ** 20:.0f} MiB) built in {time.perf_counter() - start:.2f}s, "
+          "once per process")
+
+    rng = np.random.default_rng(0)
+    crops = [random_crop(rng) for _ in range(CROPS)]
+
+    reference_time, reference = measure(reference_histogram, crops)
+    lut_time, histograms = measure(ColorSimilarity.get_histogram, crops)
+
+    identical = all(np.array_equal(a, b) for a, b in zip(reference, histograms))
+    print(f"{CROPS} crops, best of {REPEATS}")
+    print(f"  per-pixel:    {reference_time * 1000 / CROPS:8.2f} ms/crop")
+    print(f"  lookup table: {lut_time * 1000 / CROPS:8.2f} ms/crop")
+    print(f"  speedup:      {reference_time / lut_time:8.1f}x")
+    print(f"  bit-identical histograms: {identical}")
+
+
+if __name__ == "__main__":
+    main()
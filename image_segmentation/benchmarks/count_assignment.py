@@ -0,0 +1,44 @@
+"""
+Compares the optimal and the greedy assignment of elements to the expected category counts of a dataset.
+
+Run from the repository root: python -m image_segmentation.benchmarks.count_assignment
+"""
+import time
+
+import numpy as np
+
+from image_segmentation.object_classification.assignment import assign_expected_categories, GREEDY_ASSIGNMENT, \
+    OPTIMAL_ASSIGNMENT
+
+ELEMENT_COUNTS = [25, 50, 100, 200, 400]
+CATEGORY_COUNTS = [2, 5, 10]
+
+
+def total_margin(probabilities: list[dict], assignment: list) -> float:
+    return sum(element_probabilities[category] - min(element_probabilities.values())
+               for element_probabilities, category in zip(probabilities, assignment) if category is not None)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'N':>5} {'K':>3} {'greedy [s]':>11} {'optimal [s]':>12} {'greedy margin':>14} {'optimal margin':>15}")
+    for categories_count in CATEGORY_COUNTS:
+        categories = [str(category) for category in range(1, categories_count + 1)]
+        for elements_count in ELEMENT_COUNTS:
+            scores = rng.uniform(0.3, 0.9, size=(elements_count, categories_count))
+            probabilities = [dict(zip(categories, row)) for row in scores.tolist()]
+            expected = rng.multinomial(elements_count, np.ones(categories_count) / categories_count)
+            expected_counts = dict(zip(categories, expected.tolist()))
+
+            timings, margins = [], []
+            for method in (GREEDY_ASSIGNMENT, OPTIMAL_ASSIGNMENT):
+                start = time.perf_counter()
+                assignment = assign_expected_categories(probabilities, categories, expected_counts, method)
+                timings.append(time.perf_counter() - start)
+                margins.append(total_margin(probabilities, assignment))
+            print(f"{elements_count:>5} {categories_count:>3} {timings[0]:>11.4f} {timings[1]:>12.4f} "
+                  f"{margins[0]:>14.3f} {margins[1]:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Compares the similarity matrix based dataset classification with the previous per-pair implementation.
+
+Run from the repository root: python -m image_segmentation.benchmarks.dataset_classification
+"""
+import time
+from statistics import mean
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+from image_segmentation.object_classification.classifier import ObjectClassifier
+from image_segmentation.object_classification.feature_extraction import ColorSimilarity
+
+EMBEDDING_SIZE = 1024
+CATEGORIES = 8
+QUERY_ELEMENTS = 1_000
+DATASET_ELEMENTS = 10_000
+REFERENCE_QUERY_SAMPLE = 5
+
+
+def reference_classification(classifier: ObjectClassifier, image_element, dataset) -> list:
+    """Per-pair classification, as computed before the similarity matrix was introduced."""
+    classification_results = {category: [] for category in dataset.categories}
+    for element in dataset.elements:
+        classification_results[element.classification].append(classifier.calculate_similarity(image_element, element))
+    classification = [[category, mean(classification_results[category])] for category in dataset.categories]
+    return sorted(classification, key=lambda x: x[1], reverse=True)
+
+
+def make_elements(rng: np.random.Generator, classifier: ObjectClassifier, first_id: int, count: int) -> list:
+    """Creates elements clustered around one centre per category and caches their features."""
+    labels = rng.integers(0, CATEGORIES, size=count)
+    centres = np.random.default_rng(1).normal(size=(CATEGORIES, EMBEDDING_SIZE))
+    embeddings = centres[labels] + rng.normal(scale=2.0, size=(count, EMBEDDING_SIZE))
+    histograms = rng.dirichlet(np.ones(len(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV)), size=count)
+    elements = [SimpleNamespace(id=first_id + i, classification=str(label), is_leader=False)
+                for i, label in enumerate(labels)]
+    classifier.feature_cache.put([element.id for element in elements],
+                                 torch.tensor(embeddings, dtype=torch.float32), histograms)
+    return elements
+
+
+def make_dataset(elements: list) -> SimpleNamespace:
+    categories = sorted({element.classification for element in elements})
+    return SimpleNamespace(elements=elements, categories=categories, preprocessed=True)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    classifier = ObjectClassifier(None, SimpleNamespace(device='cpu'), ColorSimilarity(), feature_cache_bytes=2 ** 30)
+    dataset = make_dataset(make_elements(rng, classifier, 0, DATASET_ELEMENTS))
+    queries = make_elements(rng, classifier, DATASET_ELEMENTS, QUERY_ELEMENTS)
+
+    start = time.perf_counter()
+    classifications = classifier.classify_image_elements_based_on_dataset(queries, dataset)
+    matrix_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = [reference_classification(classifier, query, dataset) for query in queries[:REFERENCE_QUERY_SAMPLE]]
+    reference_time = (time.perf_counter() - start) / REFERENCE_QUERY_SAMPLE * QUERY_ELEMENTS
+
+    same_order = all([category for category, _ in a] == [category for category, _ in b]
+                     for a, b in zip(reference, classifications))
+    max_difference = max(abs(x[1] - y[1]) for a, b in zip(reference, classifications) for x, y in zip(a, b))
+    print(f"{QUERY_ELEMENTS} query elements x {DATASET_ELEMENTS} dataset elements, {CATEGORIES} categories")
+    print(f"  per-pair (extrapolated from {REFERENCE_QUERY_SAMPLE} queries): {reference_time:8.2f} s")
+    print(f"  similarity matrix:                          {matrix_time:8.2f} s")
+    print(f"  speedup:                                    {reference_time / matrix_time:8.1f}x")
+    print(f"  same category ranking: {same_order}, max score difference: {max_difference:.2e}")
+
+
+if __name__ == "__main__":
+    main()
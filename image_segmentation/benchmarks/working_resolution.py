@@ -0,0 +1,116 @@
+"""
+Compares counting objects at the original resolution with the working resolution mode, from SAM's low resolution
+logits to the processed image. The image encoder is not included, it always runs at 1024 px.
+
+Run from the repository root: python -m image_segmentation.benchmarks.working_resolution
+"""
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import torch
+from segment_anything.modeling import Sam
+from segment_anything.utils.transforms import ResizeLongestSide
+
+from image_segmentation.object_detection.object_segmentation import ObjectSegmentation
+
+# (width, height) of typical phone camera photos
+RESOLUTIONS = [(1920, 1080), (4032, 3024), (5664, 4248), (8064, 6048)]
+WORKING_RESOLUTION = 2048
+OBJECTS = 60
+LOW_RES_SIZE = 256
+ENCODER_SIZE = 1024
+
+
+def low_res_logits(rng: np.random.Generator) -> torch.Tensor:
+    """Three mask logits like the ones predicted by SAM, the background is positive and the objects negative."""
+    mask = np.full((LOW_RES_SIZE, LOW_RES_SIZE), 1, dtype=np.uint8)
+    for x, y in rng.integers(0, LOW_RES_SIZE, size=(OBJECTS, 2)):
+        cv2.circle(mask, (int(x), int(y)), int(rng.integers(5, 9)), 0, thickness=cv2.FILLED)
+    logits = cv2.GaussianBlur(np.where(mask, 8.0, -8.0).astype(np.float32), (5, 5), 0)
+    return torch.from_numpy(np.repeat(logits[None, None], 3, axis=1))
+
+
+def current_rss() -> int:
+    with open('/proc/self/statm', encoding='utf-8') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def segment(segmentation: ObjectSegmentation, logits: torch.Tensor, input_size: tuple[int, int], height: int,
+            width: int) -> list[np.ndarray]:
+    """Upscales the mask like ObjectSegmentation.count_objects and returns the contours in original coordinates."""
+    sam = SimpleNamespace(image_encoder=SimpleNamespace(img_size=ENCODER_SIZE))
+    # pylint: disable=protected-access
+    scale = segmentation._working_scale(height, width)
+    with torch.no_grad():
+        if scale < 1:
+            masks = Sam.postprocess_masks(sam, logits[:, 2:], input_size, (round(height * scale), round(width * scale)))
+            mask = (masks[0, 0] > 0).numpy()
+        else:
+            # predict upscales all three masks to the original resolution
+            mask = (Sam.postprocess_masks(sam, logits, input_size, (height, width)) > 0)[0, 2].numpy()
+    return segmentation._extract_contours(mask, scale)
+
+
+def run(width: int, height: int, working_resolution: int | None, queue: multiprocessing.Queue) -> None:
+    """Runs one configuration in a fresh process, so its peak memory can be measured."""
+    rng = np.random.default_rng(0)
+    logits = low_res_logits(rng)
+    # filled in place, a temporary copy would raise the peak memory before the measurement starts
+    image_data = np.empty((height, width, 3), dtype=np.uint8)
+    cv2.randu(image_data, 0, 255)
+    input_size = ResizeLongestSide.get_preprocess_shape(height, width, ENCODER_SIZE)
+    segmentation = ObjectSegmentation.__new__(ObjectSegmentation)
+    segmentation.working_resolution = working_resolution
+
+    with tempfile.TemporaryDirectory() as folder:
+        image = SimpleNamespace(id=0, filepath=os.path.join(folder, 'image.jpg'))
+        baseline = current_rss()
+        start = time.perf_counter()
+        contours = segment(segmentation, logits, input_size, height, width)
+        # pylint: disable=protected-access
+        segmentation._remove_background_from_image(image, image_data, contours)
+        bounding_boxes = segmentation._get_bounding_boxes(contours)
+        elapsed = time.perf_counter() - start
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - baseline
+    queue.put((elapsed, peak, bounding_boxes))
+
+
+def measure(width: int, height: int, working_resolution: int | None) -> tuple[float, int, list]:
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run, args=(width, height, working_resolution, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def box_iou(a, b) -> float:
+    (ax0, ay0), (ax1, ay1) = a
+    (bx0, by0), (bx1, by1) = b
+    intersection = max(0, min(ax1, bx1) - max(ax0, bx0)) * max(0, min(ay1, by1) - max(ay0, by0))
+    union = (ax1 - ax0) * (ay1 - ay0) + (bx1 - bx0) * (by1 - by0) - intersection
+    return intersection / union if union else 1.0
+
+
+def main():
+    print(f"working resolution: {WORKING_RESOLUTION} px")
+    print(f"{'resolution':>11} {'MP':>5} {'original [s]':>13} {'working [s]':>12} {'original [MB]':>14} "
+          f"{'working [MB]':>13} {'objects':>8} {'min box IoU':>12}")
+    for width, height in RESOLUTIONS:
+        original_time, original_peak, original_boxes = measure(width, height, None)
+        working_time, working_peak, working_boxes = measure(width, height, WORKING_RESOLUTION)
+        min_iou = min((max(box_iou(box, other) for other in working_boxes) for box in original_boxes), default=1.0)
+        print(f"{width:>5}x{height:<5} {width * height / 1e6:>5.1f} {original_time:>13.3f} {working_time:>12.3f} "
+              f"{original_peak / 2 ** 20:>14.0f} {working_peak / 2 ** 20:>13.0f} "
+              f"{len(original_boxes):>3}/{len(working_boxes):<4} {min_iou:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
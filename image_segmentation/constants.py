@@ -1,9 +1,15 @@
-import os
-
 import numpy as np
 
-TEMP_IMAGE_DIR = os.path.join("images", "temp")
 DEFAULT_COLOR_WEIGHT = 0.3
+HISTOGRAM_IMAGE_SIZE = 128
+DEFAULT_EMBEDDING_BATCH_SIZE = 16
+DEFAULT_FEATURE_CACHE_BYTES = 256 * 2 ** 20
+CLASSIFICATION_CHUNK_SIZE = 256
+DEFAULT_SAM_CACHE_BYTES = 2 ** 30
+DEFAULT_SAM_SPILL_BYTES = 8 * 2 ** 30
+PREVIEW_LOGITS_CAPACITY = 64
+DEFAULT_SAM_POOL_SIZE = 1
+DEFAULT_TILE_OVERLAP = 128
 
 BW = 60
 SIGMA = 18
@@ -0,0 +1,73 @@
+from typing import List, Dict
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+OPTIMAL_ASSIGNMENT = 'optimal'
+GREEDY_ASSIGNMENT = 'greedy'
+
+
+def assign_expected_categories(probabilities: List[Dict[str, float]], categories: List[str],
+                               expected_counts: Dict[str, int], method: str = OPTIMAL_ASSIGNMENT) -> List[str | None]:
+    """
+    Matches elements to the expected number of elements of each category.
+    An element's score for a category is its margin: probability of the category minus its lowest probability.
+    :param probabilities: Probability of each category, one dictionary per element
+    :param categories: Categories to assign
+    :param expected_counts: How many elements each category expects
+    :param method: OPTIMAL_ASSIGNMENT maximizes the total margin, GREEDY_ASSIGNMENT repeatedly takes the best margin
+    :return: Assigned category of each element, None for elements left over after all counts are met
+    """
+    if method == GREEDY_ASSIGNMENT:
+        return assign_greedily(probabilities, categories, expected_counts)
+    if method == OPTIMAL_ASSIGNMENT:
+        return assign_optimally(probabilities, categories, expected_counts)
+    raise ValueError(f'Unknown assignment method: {method}')
+
+
+def assign_optimally(probabilities: List[Dict[str, float]], categories: List[str],
+                     expected_counts: Dict[str, int]) -> List[str | None]:
+    """Solves the assignment as a rectangular linear sum assignment, one column per expected element."""
+    assignment: List[str | None] = [None] * len(probabilities)
+    categories = list(dict.fromkeys(categories))
+    if not probabilities or not categories:
+        return assignment
+    scores = np.array([[element_probabilities[category] for category in categories]
+                       for element_probabilities in probabilities])
+    margins = scores - scores.min(axis=1, keepdims=True)
+    # no category can take more elements than there are, which keeps the matrix at most N x (N * K)
+    slots = [index for index, category in enumerate(categories)
+             for _ in range(min(expected_counts[category], len(probabilities)))]
+    rows, columns = linear_sum_assignment(margins[:, slots], maximize=True)
+    for row, column in zip(rows, columns):
+        assignment[row] = categories[slots[column]]
+    return assignment
+
+
+def assign_greedily(probabilities: List[Dict[str, float]], categories: List[str],
+                    expected_counts: Dict[str, int]) -> List[str | None]:
+    """Repeatedly assigns the unassigned element with the best margin for a category which still expects elements."""
+    assignment: List[str | None] = [None] * len(probabilities)
+    remaining = dict(expected_counts)
+    for _ in probabilities:
+        best_candidates = {category: (None, 0) for category in categories}
+        for index, element_probabilities in enumerate(probabilities):
+            if assignment[index] is not None:
+                continue
+            for category in categories:
+                best_result = -1
+                for compared_category in categories:
+                    best_result = max(best_result,
+                                      element_probabilities[category] - element_probabilities[compared_category])
+                if best_candidates[category][0] is None or best_candidates[category][1] < best_result:
+                    best_candidates[category] = (index, best_result)
+        current_candidate = (None, 0, None)
+        for category in categories:
+            if remaining[category] == 0:
+                continue
+            if current_candidate[0] is None or current_candidate[1] < best_candidates[category][1]:
+                current_candidate = (best_candidates[category][0], best_candidates[category][1], category)
+        if current_candidate[0] is not None:
+            assignment[current_candidate[0]] = current_candidate[2]
+            remaining[current_candidate[2]] -= 1
+    return assignment
@@ -1,16 +1,18 @@
 import logging
-import os
-from statistics import mean
-from typing import List, Dict
+from typing import List, Tuple
 
 import numpy as np
 import torch
 
-from image_segmentation.constants import TEMP_IMAGE_DIR, DEFAULT_COLOR_WEIGHT
+from image_segmentation.constants import DEFAULT_COLOR_WEIGHT, DEFAULT_FEATURE_CACHE_BYTES, \
+    CLASSIFICATION_CHUNK_SIZE
+from image_segmentation.object_classification.assignment import assign_expected_categories, OPTIMAL_ASSIGNMENT
+from image_segmentation.object_classification.feature_cache import FeatureCache
 from image_segmentation.object_classification.feature_extraction import FeatureSimilarity, ImageElementProcessor, \
     ColorSimilarity
-from image_segmentation.utils import delete_temp_images
-from objects_counter.db.dataops.image import update_element_classification_by_id
+from objects_counter.db.dataops.element_features import get_element_features, bulk_set_element_features, \
+    EMBEDDING_DTYPE, HISTOGRAM_DTYPE
+from objects_counter.db.dataops.image import bulk_update_element_classifications
 from objects_counter.db.models import Image, ImageElement
 
 log = logging.getLogger(__name__)
@@ -18,50 +20,93 @@ log = logging.getLogger(__name__)
 
 class ObjectClassifier:
 
-    def __init__(self, segmenter, feature_similarity_model: FeatureSimilarity, color_similarity_model: ColorSimilarity):
+    def __init__(self, segmenter, feature_similarity_model: FeatureSimilarity, color_similarity_model: ColorSimilarity,
+                 feature_cache_bytes: int = DEFAULT_FEATURE_CACHE_BYTES):
         self.segmenter = segmenter
         self.feature_similarity_model = feature_similarity_model
         self.color_similarity_model = color_similarity_model
 
-        self.embeddings: Dict[int, List[torch.Tensor]] = {}
-        self.histograms: Dict[int, List[np.ndarray]] = {}
-
-        os.makedirs(TEMP_IMAGE_DIR, exist_ok=True)
+        self.feature_cache = FeatureCache(feature_cache_bytes)
 
     def process_image_elements(self, image: Image) -> None:
         """Processes each object in the image to compute embeddings and histograms."""
-        for element in image.elements:
-            self.process_element(element)
-
-    def process_element(self, element: ImageElement):
-        """Crops the image element, computes its embedding and histogram, and cleans up."""
-        processor = ImageElementProcessor(self.feature_similarity_model, self.color_similarity_model)
-        embedding, histogram = processor.process_image_element(element)
-        self.embeddings[element.id] = embedding
-        self.histograms[element.id] = histogram
-        return embedding, histogram
+        self.get_features(image.elements)
+
+    def get_features(self, elements: List[ImageElement]) -> Tuple[torch.Tensor, np.ndarray]:
+        """
+        Returns the embeddings and histograms of the elements, taking them from the cache when possible.
+        :return: Embeddings and histograms, one row per element in the order of elements
+        """
+        positions, embeddings, histograms = self.feature_cache.get([element.id for element in elements])
+        cached_positions = set(positions)
+        missing_positions = [position for position in range(len(elements)) if position not in cached_positions]
+        if not missing_positions:
+            if not positions:
+                return torch.empty(0), np.empty((0, len(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV)))
+            return embeddings, histograms
+
+        missing_embeddings, missing_histograms = self.process_elements([elements[i] for i in missing_positions])
+        if not positions:
+            return missing_embeddings, missing_histograms
+        order = np.argsort(positions + missing_positions)
+        embeddings = torch.cat([embeddings, missing_embeddings.to(embeddings.device)])[torch.from_numpy(order)]
+        histograms = np.concatenate([histograms, missing_histograms])[order]
+        return embeddings, histograms
+
+    def process_elements(self, elements: List[ImageElement]) -> Tuple[torch.Tensor, np.ndarray]:
+        """
+        Loads stored embeddings and histograms of the elements, computes and stores the missing ones in batches.
+        :return: Embeddings and histograms, one row per element in the order of elements
+        """
+        stored_features = get_element_features([element.id for element in elements])
+        pending_elements = [element for element in elements if element.id not in stored_features]
+        if pending_elements:
+            processor = ImageElementProcessor(self.feature_similarity_model, self.color_similarity_model)
+            embeddings, histograms = processor.process_image_elements(pending_elements)
+            # at the stored precision, so the first run gives the same results as the runs loading the features
+            new_features = {
+                element.id: (np.asarray(embedding, dtype=EMBEDDING_DTYPE), np.asarray(histogram, dtype=HISTOGRAM_DTYPE))
+                for element, embedding, histogram in zip(pending_elements, embeddings.cpu().numpy(), histograms)
+            }
+            # committed with the request, a commit here would expire the loaded elements
+            bulk_set_element_features(new_features, do_commit=False)
+            stored_features.update(new_features)
+
+        device = self.feature_similarity_model.device
+        embeddings = torch.stack([torch.as_tensor(stored_features[element.id][0], dtype=torch.float32, device=device)
+                                  for element in elements])
+        histograms = np.stack([stored_features[element.id][1] for element in elements]).astype(np.float64)
+        self.feature_cache.put([element.id for element in elements], embeddings, histograms)
+        return embeddings, histograms
 
     def calculate_similarity(self, obj_i: ImageElement, obj_j: ImageElement,
                              color_weight: float = DEFAULT_COLOR_WEIGHT) -> float:
         """Calculates combined feature and color similarity between two objects."""
         if obj_i.id == obj_j.id:
             return 1
-        if self.histograms and self.embeddings:
-            hist_i = self.histograms[obj_i.id]
-            hist_j = self.histograms[obj_j.id]
-
-            embedding_i = self.embeddings[obj_i.id]
-            embedding_j = self.embeddings[obj_j.id]
-        else:
-            embedding_i, hist_i = self.process_element(obj_i)
-            embedding_j, hist_j = self.process_element(obj_j)
+        embeddings, histograms = self.get_features([obj_i, obj_j])
 
         # pylint: disable=not-callable
-        feature_sim = torch.nn.functional.cosine_similarity(embedding_i, embedding_j).item()
-        color_sim = self.color_similarity_model.compute_color_similarity(hist_i, hist_j)
+        feature_sim = torch.nn.functional.cosine_similarity(embeddings[0:1], embeddings[1:2]).item()
+        color_sim = self.color_similarity_model.compute_color_similarity(histograms[0], histograms[1])
 
         return (color_weight * color_sim) + ((1 - color_weight) * feature_sim)
 
+    def calculate_similarity_matrix(self, elements_i: List[ImageElement], elements_j: List[ImageElement],
+                                    color_weight: float = DEFAULT_COLOR_WEIGHT) -> np.ndarray:
+        """Calculates combined feature and color similarity between every pair of objects of the two lists."""
+        embeddings_i, histograms_i = self.get_features(elements_i)
+        embeddings_j, histograms_j = self.get_features(elements_j)
+
+        embeddings_i = torch.nn.functional.normalize(embeddings_i, dim=1, eps=1e-8)
+        embeddings_j = torch.nn.functional.normalize(embeddings_j.to(embeddings_i.device), dim=1, eps=1e-8)
+        feature_sim = (embeddings_i @ embeddings_j.T).cpu().numpy().astype(np.float64)
+        color_sim = self.color_similarity_model.compute_color_similarity_matrix(histograms_i, histograms_j)
+
+        similarity = (color_weight * color_sim) + ((1 - color_weight) * feature_sim)
+        similarity[np.equal.outer([element.id for element in elements_i], [element.id for element in elements_j])] = 1
+        return similarity
+
     def group_objects_by_similarity(self, images: List[Image], representatives: List[ImageElement] | None = None,
                                     threshold: float = 0.7, color_weight: float = DEFAULT_COLOR_WEIGHT) -> None:
         """Groups objects by their similarity based on a combination of feature and color similarity."""
@@ -70,13 +115,11 @@ class ObjectClassifier:
             self.process_image_elements(image)
             elements += image.elements
         self.assign_categories_based_on_similarity(elements, representatives, threshold, color_weight)
-        delete_temp_images(TEMP_IMAGE_DIR)
+        log.debug("Feature cache: %s", self.feature_cache.stats())
 
     def preprocess_dataset(self, dataset):
         dataset.elements = [element for image in dataset.images for element in image.elements]
-        for element in dataset.elements:
-            if element.id not in self.histograms or element.id not in self.embeddings:
-                self.process_element(element)
+        self.get_features(dataset.elements)
         dataset.representatives = [element for element in dataset.elements if element.is_leader]
         dataset.categories = [representative.classification for representative in dataset.representatives]
         dataset.category_count = {category: 0 for category in dataset.categories}
@@ -85,25 +128,46 @@ class ObjectClassifier:
         dataset.preprocessed = True
 
     def classify_image_element_based_on_dataset(self, image_element, dataset):
+        return self.classify_image_elements_based_on_dataset([image_element], dataset)[0]
+
+    def classify_image_elements_based_on_dataset(self, image_elements: List[ImageElement], dataset) -> list:
+        """
+        Scores every element against each dataset category with the mean similarity to the category's elements.
+        :return: For each element, a list of [category, mean similarity] sorted from the most similar category
+        """
         if not dataset.preprocessed:
             log.error("Please run preprocess_dataset() before using classification on dataset")
 
-        classification_results = {category: [] for category in dataset.categories}
-        for element in dataset.elements:
-            classification_results[element.classification].append(self.calculate_similarity(image_element, element))
-        classification = [[category, mean(classification_results[category])] for category in dataset.categories]
-        classification = sorted(classification, key=lambda x: x[1], reverse=True)
-        return classification
-
-    def classify_images_based_on_dataset(self, images: List[Image], dataset):
-        """Classify images elements based on dataset"""
+        categories = list(dict.fromkeys(dataset.categories))
+        membership = np.zeros((len(dataset.elements), len(categories)))
+        membership[np.arange(len(dataset.elements)),
+                   [categories.index(element.classification) for element in dataset.elements]] = 1
+        category_sizes = membership.sum(axis=0)
+
+        classifications = []
+        for start in range(0, len(image_elements), CLASSIFICATION_CHUNK_SIZE):
+            similarity = self.calculate_similarity_matrix(image_elements[start:start + CLASSIFICATION_CHUNK_SIZE],
+                                                          dataset.elements)
+            category_means = (similarity @ membership) / category_sizes
+            for element_means in category_means.tolist():
+                means = dict(zip(categories, element_means))
+                classification = [[category, means[category]] for category in dataset.categories]
+                classifications.append(sorted(classification, key=lambda x: x[1], reverse=True))
+        return classifications
+
+    def classify_images_based_on_dataset(self, images: List[Image], dataset,
+                                         assignment_method: str = OPTIMAL_ASSIGNMENT):
+        """
+        Classify images elements based on dataset, then reconcile the classifications with the dataset's category
+        counts using the given assignment method (see assign_expected_categories)
+        """
         self.preprocess_dataset(dataset)
         for image in images:
             self.process_image_elements(image)
         elements = [element for image in images for element in image.elements]
         result = {category: 0 for category in dataset.categories}
-        for element in elements:
-            classes_probabilities = self.classify_image_element_based_on_dataset(element, dataset)
+        for element, classes_probabilities in zip(elements,
+                                                  self.classify_image_elements_based_on_dataset(elements, dataset)):
             element.classification = classes_probabilities[0][0]
             element.certainty = classes_probabilities[0][1]
             result[element.classification] += 1
@@ -113,39 +177,15 @@ class ObjectClassifier:
             element.probabilities = element_dict_classification
 
         result = {category: dataset.category_count[category] for category in dataset.categories}
-
-        assigned_elements = []
-        for _ in elements:
-            best_candidates = {category: (None, 0) for category in dataset.categories}
-            for element in elements:
-                if element in assigned_elements:
-                    continue
-                for category in dataset.categories:
-                    best_result = -1
-                    for compared_category in dataset.categories:
-                        probabilities = element.probabilities
-                        best_result = max(best_result, probabilities[category] - probabilities[compared_category])
-                    if best_candidates[category][0] is None or best_candidates[category][1] < best_result:
-                        best_candidates[category] = (element, best_result)
-            current_candidate = (None, 0, None)
-            for category in dataset.categories:
-                if result[category] == 0:
-                    continue
-                if current_candidate[0] is None or current_candidate[1] < best_candidates[category][1]:
-                    current_candidate = (best_candidates[category][0], best_candidates[category][1], category)
-            if current_candidate[0] is not None:
-                element = current_candidate[0]
-                category = current_candidate[2]
-                certainty = element.probabilities[category]
-                assigned_elements.append(element)
-                element.classification = category
-                element.certainty = certainty
-                result[category] -= 1
-
-        for element in elements:
-            if element in assigned_elements:
+        assignment = assign_expected_categories([element.probabilities for element in elements], dataset.categories,
+                                                result, method=assignment_method)
+        for element, category in zip(elements, assignment):
+            if category is None:
+                result[element.classification] -= 1
                 continue
-            result[element.classification] -= 1
+            element.classification = category
+            element.certainty = element.probabilities[category]
+            result[category] -= 1
 
         result = {category: -result[category] for category in dataset.categories}
         return result
@@ -156,29 +196,32 @@ class ObjectClassifier:
         self.process_image_elements(image)
         image_representatives = [element for element in image.elements if element.is_leader]
         representatives = image_representatives + dataset.representatives
+        classifications = {}
         for element in image.elements:
             best_certainty = 0
             best_category = None
             for representative in representatives:
                 current_certainty = self.calculate_similarity(element, representative)
                 if current_certainty > best_certainty:
-                    best_category = representative.classification
+                    best_category, _ = self.get_element_category(classifications, representative)
                     best_certainty = current_certainty
             assert best_category is not None
-            self.update_element_category(element.id, best_category, best_certainty)
+            self.update_element_category(classifications, element, best_category, best_certainty)
+        bulk_update_element_classifications(classifications)
 
     def assign_categories_based_on_similarity(self, elements: List[ImageElement], representatives: List[ImageElement],
                                               threshold: float, color_weight: float) -> None:
         """Assigns elements to categories based on their similarity scores."""
         predefined_representatives = True
         category_id = 1
+        classifications = {}
 
         if representatives is None:
             representatives = []
             predefined_representatives = False
 
         for representative in representatives:
-            self.update_element_category(representative.id, category_id, certainty=1.0)
+            self.update_element_category(classifications, representative, category_id, certainty=1.0)
             category_id += 1
 
         for element in elements:
@@ -194,20 +237,36 @@ class ObjectClassifier:
                     best_similarity = similarity_score
 
             if best_similar_element is not None:
-                self.assign_element_to_category(element, best_similarity, best_similar_element.classification)
+                best_category, _ = self.get_element_category(classifications, best_similar_element)
+                self.assign_element_to_category(classifications, element, best_similarity, best_category)
             else:
-                self.update_element_category(element.id, category_id, certainty=1.0)
+                self.update_element_category(classifications, element, category_id, certainty=1.0)
                 representatives.append(element)
                 category_id += 1
+        bulk_update_element_classifications(classifications)
 
-    def assign_element_to_category(self, element: ImageElement, similarity: float, category_id: int) -> None:
+    def assign_element_to_category(self, classifications: dict[int, tuple[str, float]], element: ImageElement,
+                                   similarity: float, category_id: int | str) -> None:
         """Assigns an element to a category or updates its similarity score if already classified."""
-        if element.classification:
-            if similarity > element.certainty:
-                self.update_element_category(element.id, category_id, similarity)
+        classification, certainty = self.get_element_category(classifications, element)
+        if classification:
+            if similarity > certainty:
+                self.update_element_category(classifications, element, category_id, similarity)
         else:
-            self.update_element_category(element.id, category_id, similarity)
-
-    def update_element_category(self, element_id: int, category_id: int, certainty: float) -> None:
-        """Updates the classification and certainty of an element based on its ID."""
-        update_element_classification_by_id(element_id, str(category_id), certainty)
+            self.update_element_category(classifications, element, category_id, similarity)
+
+    @staticmethod
+    def get_element_category(classifications: dict[int, tuple[str, float]],
+                             element: ImageElement) -> tuple[str | None, float | None]:
+        """Classification and certainty of an element, assigned in this run or the stored ones."""
+        return classifications.get(element.id, (element.classification, element.certainty))
+
+    @staticmethod
+    def update_element_category(classifications: dict[int, tuple[str, float]], element: ImageElement,
+                                category_id: int | str, certainty: float) -> None:
+        """
+        Records the classification and certainty of an element, bulk_update_element_classifications stores all
+        of them in one statement at the end of the run.
+        :param classifications: Element ID -> (classification, certainty) of the elements assigned in this run
+        """
+        classifications[element.id] = (str(category_id), certainty)
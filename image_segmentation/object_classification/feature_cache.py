@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+INITIAL_ROWS = 64
+
+
+class FeatureCache:  # pylint: disable=too-many-instance-attributes
+    """
+    LRU cache of element embeddings and histograms, kept in two contiguous matrices under a byte budget.
+    Each cached element owns one row of both matrices, the matrices grow on demand up to the budget.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.embeddings: torch.Tensor | None = None
+        self.histograms: np.ndarray | None = None
+        self.capacity = 0
+        self.rows: OrderedDict[int, int] = OrderedDict()
+        self.free_rows: list[int] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, element_id: int) -> bool:
+        return element_id in self.rows
+
+    @property
+    def row_bytes(self) -> int:
+        if self.embeddings is None:
+            return 0
+        return self.embeddings.shape[1] * self.embeddings.element_size() + self.histograms.shape[1] * \
+            self.histograms.itemsize
+
+    def get(self, element_ids: list[int]) -> tuple[list[int], torch.Tensor | None, np.ndarray | None]:
+        """
+        :param element_ids: IDs of the requested elements
+        :return: Positions in element_ids of the cached elements, followed by their embeddings and histograms
+         (one row per cached element, in the same order). Both matrices are None when nothing is cached
+        """
+        with self.lock:
+            positions = [position for position, element_id in enumerate(element_ids) if element_id in self.rows]
+            self.hits += len(positions)
+            self.misses += len(element_ids) - len(positions)
+            if not positions:
+                return [], None, None
+            rows = []
+            for position in positions:
+                self.rows.move_to_end(element_ids[position])
+                rows.append(self.rows[element_ids[position]])
+            row_index = torch.tensor(rows, device=self.embeddings.device)
+            return positions, self.embeddings[row_index], self.histograms[rows]
+
+    def put(self, element_ids: list[int], embeddings: torch.Tensor, histograms: np.ndarray) -> None:
+        """Caches the embeddings and histograms (one row per element), evicting the least recently used elements."""
+        if not element_ids:
+            return
+        with self.lock:
+            if self.embeddings is None:
+                self._allocate(embeddings, histograms)
+            if self.capacity == 0:
+                return
+            # only the most recent elements are kept when they do not fit at once
+            element_ids = element_ids[-self.capacity:]
+            embeddings = embeddings[-self.capacity:]
+            histograms = histograms[-self.capacity:]
+
+            rows = [self._take_row(element_id) for element_id in element_ids]
+            row_index = torch.tensor(rows, device=self.embeddings.device)
+            self.embeddings[row_index] = embeddings.to(self.embeddings.device, self.embeddings.dtype)
+            self.histograms[rows] = histograms
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'elements': len(self.rows),
+                'capacity': self.capacity,
+                'bytes': len(self.rows) * self.row_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def _allocate(self, embeddings: torch.Tensor, histograms: np.ndarray) -> None:
+        self.embeddings = torch.empty((0, embeddings.shape[1]), dtype=torch.float32, device=embeddings.device)
+        self.histograms = np.empty((0, histograms.shape[1]), dtype=np.float64)
+        self.capacity = self.max_bytes // self.row_bytes
+
+    def _take_row(self, element_id: int) -> int:
+        if element_id in self.rows:
+            self.rows.move_to_end(element_id)
+            return self.rows[element_id]
+        if not self.free_rows:
+            if len(self.embeddings) < self.capacity:
+                self._grow()
+            else:
+                _, row = self.rows.popitem(last=False)
+                self.evictions += 1
+                self.free_rows.append(row)
+        row = self.free_rows.pop()
+        self.rows[element_id] = row
+        return row
+
+    def _grow(self) -> None:
+        old_rows = len(self.embeddings)
+        new_rows = min(self.capacity, max(INITIAL_ROWS, 2 * old_rows))
+        embeddings = torch.empty((new_rows, self.embeddings.shape[1]), dtype=self.embeddings.dtype,
+                                 device=self.embeddings.device)
+        embeddings[:old_rows] = self.embeddings
+        histograms = np.empty((new_rows, self.histograms.shape[1]), dtype=self.histograms.dtype)
+        histograms[:old_rows] = self.histograms
+        self.embeddings, self.histograms = embeddings, histograms
+        self.free_rows.extend(reversed(range(old_rows, new_rows)))
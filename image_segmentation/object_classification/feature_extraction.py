@@ -1,4 +1,4 @@
-import os
+import functools
 
 import cv2
 import numpy as np
@@ -7,9 +7,9 @@ from PIL import Image as PILImage
 from torch import nn
 from torchvision import transforms as tr
 
-from image_segmentation.constants import TEMP_IMAGE_DIR, ISCC_NBS_CENTROIDS_RGB, BW, SIGMA
-from image_segmentation.utils import crop_element
-from objects_counter.db.dataops.image import get_image_by_id
+from image_segmentation.constants import ISCC_NBS_CENTROIDS_RGB, BW, SIGMA, HISTOGRAM_IMAGE_SIZE, \
+    DEFAULT_EMBEDDING_BATCH_SIZE
+from image_segmentation.utils import crop_element, find_processed_image_path
 from objects_counter.db.models import ImageElement
 
 
@@ -18,38 +18,38 @@ class ImageElementProcessor:
         self.feature_similarity_model = feature_similarity_model
         self.color_similarity_model = color_similarity_model
 
-    def process_image_element(self, element: ImageElement) -> tuple:
-        """Crops, saves, computes embedding, computes histogram, and deletes element image."""
-        image = get_image_by_id(element.image_id)
-        image_data = np.array(PILImage.open(image.filepath[:-4] + "_processed.bmp"))
+    def process_image_elements(self, elements: list[ImageElement]) -> tuple[torch.Tensor, np.ndarray]:
+        """
+        Crops the elements in memory, computes their histograms and batches the embeddings.
+        :return: Embeddings and histograms of the elements, one row per element
+        """
+        cropped_images = self._crop_elements(elements)
+        histograms = [self.color_similarity_model.get_histogram(cropped_image) for cropped_image in cropped_images]
+        embeddings = self.feature_similarity_model.get_embeddings(cropped_images)
+        return embeddings, np.array(histograms).reshape((len(elements), -1))
 
-        cropped_image = crop_element(image_data, element.top_left, element.bottom_right)
-
-        temp_image_path = os.path.join(TEMP_IMAGE_DIR, f"element_{element.id}.bmp")
-        cropped_image.save(temp_image_path)
-
-        embedding = self._calculate_embedding(temp_image_path)
-        histogram = self._calculate_histogram(temp_image_path)
-
-        os.remove(temp_image_path)
-        return embedding, histogram
-
-    def _calculate_embedding(self, image_path: str) -> torch.Tensor:
-        """Calculates the embedding for the image at the given path."""
-        image_tensor = self.feature_similarity_model.preprocess_image(image_path)
-        return self.feature_similarity_model.get_embedding(image_tensor)
-
-    def _calculate_histogram(self, image_path: str) -> np.ndarray:
-        """Calculates the histogram for the image at the given path."""
-        image = PILImage.open(image_path)
-        return self.color_similarity_model.get_histogram(image)
+    @staticmethod
+    def _crop_elements(elements: list[ImageElement]) -> list[PILImage.Image]:
+        """Crops the elements out of their processed images, decoding each processed image only once."""
+        processed_images: dict[int, np.ndarray] = {}
+        cropped_images = []
+        for element in elements:
+            if element.image_id not in processed_images:
+                with PILImage.open(find_processed_image_path(element.image)) as processed_image:
+                    processed_images[element.image_id] = np.array(processed_image)
+            cropped_images.append(crop_element(processed_images[element.image_id], element.top_left,
+                                               element.bottom_right))
+        return cropped_images
 
 
 class FeatureSimilarity:
     """Calculates feature similarities of the object using cosine similarity"""
 
-    def __init__(self):
+    def __init__(self, batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE):
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.batch_size = batch_size
+        self.transformations = tr.Compose([tr.ToTensor(), tr.Resize((224, 224), tr.InterpolationMode.BICUBIC),
+                                           tr.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225))])
         self.model = self.load_model()
 
     def load_model(self) -> nn.Module:
@@ -59,12 +59,11 @@ class FeatureSimilarity:
         model = model.to(self.device)
         return model
 
-    def preprocess_image(self, image_path: str) -> torch.Tensor:
-        """Preprocesses the image before embedding extraction."""
-        img = PILImage.open(image_path).convert('RGB')
-        transformations = tr.Compose([tr.ToTensor(), tr.Resize((224, 224), tr.InterpolationMode.BICUBIC),
-                                      tr.Normalize(mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225))])
-        img = transformations(img).float().unsqueeze_(0).to(self.device)
+    def preprocess_image(self, image: str | PILImage.Image) -> torch.Tensor:
+        """Preprocesses the image (a path or an already opened image) before embedding extraction."""
+        if isinstance(image, str):
+            image = PILImage.open(image)
+        img = self.transformations(image.convert('RGB')).float().unsqueeze_(0).to(self.device)
         return img
 
     def get_embedding(self, image_tensor: torch.Tensor) -> torch.Tensor:
@@ -73,81 +72,115 @@ class FeatureSimilarity:
             embedding = self.model(image_tensor)
         return embedding
 
+    def get_embeddings(self, images: list[str | PILImage.Image], batch_size: int | None = None) -> torch.Tensor:
+        """
+        Generates the embedding vectors of many images, running the model on batches of images.
+        :param images: Paths or already opened images
+        :param batch_size: Maximum number of images in a single forward pass, bounds the peak memory usage.
+         Defaults to the batch size given at construction
+        :return: Tensor with one embedding per row, in the order of the images
+        """
+        batch_size = batch_size or self.batch_size
+        embeddings = []
+        for start in range(0, len(images), batch_size):
+            batch = torch.cat([self.preprocess_image(image) for image in images[start:start + batch_size]])
+            embeddings.append(self.get_embedding(batch))
+        if not embeddings:
+            return torch.empty(0, device=self.device)
+        return torch.cat(embeddings)
+
+
+def build_bin_lookup_table(centroids_luv: np.ndarray, chunk_size: int = 16) -> np.ndarray:
+    """
+    Maps every 8-bit RGB color to the index of its closest centroid in LUV space.
+    :param centroids_luv: Array of shape (bins, 3) with the bin centroids in LUV space
+    :param chunk_size: Number of red levels converted at once, bounds the temporary memory usage
+    :return: Array of shape (256, 256, 256) indexed by [r, g, b]
+    """
+    levels = np.arange(256, dtype=np.float32) / 255.0
+    lut = np.empty((256, 256, 256), dtype=np.uint8)
+    for red_start in range(0, 256, chunk_size):
+        rgb = np.empty((chunk_size, 256, 256, 3), dtype=np.float32)
+        rgb[..., 0] = levels[red_start:red_start + chunk_size, None, None]
+        rgb[..., 1] = levels[None, :, None]
+        rgb[..., 2] = levels[None, None, :]
+        luv = cv2.cvtColor(rgb.reshape((chunk_size, -1, 3)), cv2.COLOR_RGB2Luv).reshape(-1, 3)
+        lum, u, v = luv[:, 0], luv[:, 1], luv[:, 2]
+
+        # same float32 operations as a per-pixel np.argmin over the euclidean distances, ties go to the lower index
+        best_distances = np.full(len(luv), np.inf, dtype=np.float32)
+        best_bins = np.zeros(len(luv), dtype=np.uint8)
+        for index, (c_lum, c_u, c_v) in enumerate(centroids_luv):
+            distances = np.sqrt((lum - c_lum) ** 2 + (u - c_u) ** 2 + (v - c_v) ** 2)
+            closer = distances < best_distances
+            best_distances[closer] = distances[closer]
+            best_bins[closer] = index
+        lut[red_start:red_start + chunk_size] = best_bins.reshape((chunk_size, 256, 256))
+    return lut
+
+
+def build_weight_matrix(centroids_luv: np.ndarray) -> np.ndarray:
+    """
+    Computes the bin pair weights of the weighted histogram intersection.
+    The diagonal is 1, bins j > i get a Gaussian weight of their LUV distance (0 above BW), the rest is 0.
+    """
+    num_bins = len(centroids_luv)
+    weights = np.zeros((num_bins, num_bins))
+    for i in range(num_bins):
+        weights[i, i] = 1.0
+        for j in range(i + 1, num_bins):
+            distance = np.sqrt(np.sum((centroids_luv[i] - centroids_luv[j]) ** 2))
+            if distance <= BW:
+                weights[i, j] = (1 / (np.sqrt(2 * np.pi) * SIGMA)) * np.exp(-(distance ** 2) / (2 * SIGMA ** 2))
+    return weights
+
 
 class ColorSimilarity:
     """Calculates color similarities of the object using histograms"""
 
     ISCC_NBS_CENTROIDS_LUV = cv2.cvtColor(ISCC_NBS_CENTROIDS_RGB, cv2.COLOR_RGB2Luv).reshape(-1, 3)
+    WEIGHT_MATRIX = build_weight_matrix(ISCC_NBS_CENTROIDS_LUV)
 
     @staticmethod
-    def compute_color_similarity(hist1: np.ndarray, hist2: np.ndarray) -> float:
-        """Computes the RGWHI similarity between two histograms."""
-        return ColorSimilarity.__calculate_histogram_intersection(hist1, hist2)
+    @functools.cache
+    def get_bin_lookup_table() -> np.ndarray:
+        """RGB -> ISCC-NBS bin table, 16 MiB which take a few seconds to build, so it is built on first use."""
+        return build_bin_lookup_table(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV)
 
     @staticmethod
-    def __calculate_histogram_intersection(hist_model: np.ndarray, hist_target: np.ndarray) -> float:
-        """Calculates the weighted intersection score between two histograms."""
-        intersection_score = 0.0
-        num_bins = len(hist_model)
-
-        for i in range(num_bins):
-            for j in range(num_bins):
-                weight = 0.0
-                if i == j:
-                    weight = 1.0
-                elif j > i:
-                    distance = ColorSimilarity.__color_distance(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV[i],
-                                                                ColorSimilarity.ISCC_NBS_CENTROIDS_LUV[j])
-                    weight = ColorSimilarity.__weight_function(distance)
-                if weight > 0:
-                    intersection_score += (min(hist_model[i], hist_target[j]) * weight)
-
-        return intersection_score
-
-    @staticmethod
-    def __color_distance(c1: np.ndarray, c2: np.ndarray) -> float:
-        """Computes the Euclidean distance between two colors in LUV space."""
-        return np.sqrt(np.sum((c1 - c2) ** 2))
+    def compute_color_similarity(hist1: np.ndarray, hist2: np.ndarray) -> float:
+        """Computes the RGWHI similarity between two histograms."""
+        return float(ColorSimilarity.compute_color_similarity_matrix(hist1[np.newaxis], hist2[np.newaxis])[0, 0])
 
     @staticmethod
-    def __weight_function(distance: float) -> float:
-        """Applies a weight based on color distance, using a Gaussian function."""
-        if distance <= BW:
-            return (1 / (np.sqrt(2 * np.pi) * SIGMA)) * np.exp(-(distance ** 2) / (2 * SIGMA ** 2))
-        return 0.0
+    def compute_color_similarity_matrix(hists_model: np.ndarray, hists_target: np.ndarray) -> np.ndarray:
+        """
+        Computes the RGWHI similarity between every pair of histograms of the two stacks.
+        :param hists_model: Array of shape (N, bins)
+        :param hists_target: Array of shape (M, bins)
+        :return: Array of shape (N, M), element [n, m] is the similarity of hists_model[n] and hists_target[m]
+        """
+        hists_model = np.asarray(hists_model, dtype=np.float64)
+        hists_target = np.asarray(hists_target, dtype=np.float64)
+        similarity = np.zeros((len(hists_model), len(hists_target)))
+        # accumulates the bin pairs in the same order as the scalar weighted intersection did
+        for i, j in zip(*np.nonzero(ColorSimilarity.WEIGHT_MATRIX)):
+            similarity += np.minimum(hists_model[:, i, np.newaxis], hists_target[np.newaxis, :, j]) \
+                * ColorSimilarity.WEIGHT_MATRIX[i, j]
+        return similarity
 
     @staticmethod
     def get_histogram(image: PILImage) -> np.ndarray:
         """Computes a color histogram for an image, ignoring white background pixels."""
-        image = image.resize((128, 128))
+        image = np.array(image.resize((HISTOGRAM_IMAGE_SIZE, HISTOGRAM_IMAGE_SIZE)).convert('RGB'))
         mask = ColorSimilarity.__get_mask(image)
-        image = np.array(image)
-
-        image = image.astype(np.float32) / 255.0
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2Luv)
-
-        histogram = np.zeros(len(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV))
-        reshaped_mask = mask.reshape(-1)
-        for i, pixel in enumerate(image.reshape(-1, 3)):
-            if reshaped_mask[i]:
-                closest_index = ColorSimilarity.__find_closest_bin_color(pixel)
-                histogram[closest_index] += 1
+        bins = ColorSimilarity.get_bin_lookup_table()[image[..., 0], image[..., 1], image[..., 2]]
 
+        histogram = np.bincount(bins[mask], minlength=len(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV))
         histogram = histogram / np.sum(histogram)
         return histogram
 
     @staticmethod
-    def __get_mask(image: PILImage):
-        image = image.convert('RGB')
-        image_array = np.array(image)
-        mask = np.array(
-            [not (image_array[x][y] == np.array([255, 255, 255])).all() for x in range(image.height) for y in
-             range(image.width)])
-        mask.resize(image.height, image.width)
-        return mask
-
-    @staticmethod
-    def __find_closest_bin_color(pixel_luv: np.ndarray) -> int:
-        """Finds the index of the closest ISCC-NBS color centroid in LUV space."""
-        distances = np.sqrt(np.sum((ColorSimilarity.ISCC_NBS_CENTROIDS_LUV - pixel_luv) ** 2, axis=1))
-        return np.argmin(distances)
+    def __get_mask(image: np.ndarray) -> np.ndarray:
+        """Returns a boolean mask of the pixels which are not pure white."""
+        return np.any(image != 255, axis=-1)
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+from segment_anything import SamPredictor
+
+log = logging.getLogger(__name__)
+
+# names of the spilled embedding files, the SHA-256 of the key
+SPILL_FILE_PATTERN = re.compile(r'[0-9a-f]{64}\.npy')
+
+
+class ImageCache:
+    """Image encoder output of the SAM predictor for one image"""
+
+    def __init__(self, features: torch.Tensor, original_size: tuple[int, int], input_size: tuple[int, int]):
+        self.features = features
+        self.original_size = original_size
+        self.input_size = input_size
+
+    @staticmethod
+    def from_predictor(predictor: SamPredictor) -> 'ImageCache':
+        return ImageCache(predictor.features, predictor.original_size, predictor.input_size)
+
+    @property
+    def nbytes(self) -> int:
+        return self.features.numel() * self.features.element_size()
+
+
+class EmbeddingCache:  # pylint: disable=too-many-instance-attributes
+    """
+    LRU cache of SAM image embeddings with a RAM budget, keyed by the image file path.
+    Embeddings evicted from RAM are spilled to .npy files in the spill folder (when one is set) and memory-mapped
+    back on the next access, so the image encoder does not need to run again. The spill folder has its own budget,
+    the least recently spilled files are deleted first.
+    """
+
+    def __init__(self, max_bytes: int, max_spill_bytes: int = 0, device: str = 'cpu'):
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.spill_folder = None
+        self.entries: OrderedDict[str, ImageCache] = OrderedDict()
+        self.spilled: OrderedDict[str, tuple[tuple[int, int], tuple[int, int], int]] = OrderedDict()
+        self.bytes = 0
+        self.spilled_bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'spills': 0, 'spill_hits': 0, 'evictions': 0}
+        self.device = device
+        self.lock = threading.RLock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries or key in self.spilled
+
+    def set_spill_folder(self, spill_folder: str) -> None:
+        """
+        Sets the folder for spilled embeddings, embedding files left over from previous processes are removed.
+        Other files in the folder are kept.
+        """
+        with self.lock:
+            os.makedirs(spill_folder, exist_ok=True)
+            for filename in os.listdir(spill_folder):
+                if SPILL_FILE_PATTERN.fullmatch(filename):
+                    try:
+                        os.remove(os.path.join(spill_folder, filename))
+                    except OSError as e:
+                        log.warning('Failed to remove spilled embedding %s: %s', filename, e)
+            self.spill_folder = spill_folder
+            self.spilled.clear()
+            self.spilled_bytes = 0
+
+    def get(self, key: str) -> ImageCache | None:
+        with self.lock:
+            if key in self.entries:
+                self.counters['hits'] += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            if key in self.spilled:
+                self.counters['spill_hits'] += 1
+                entry = self._load_spilled(key)
+                self._insert(key, entry)
+                return entry
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key: str, entry: ImageCache) -> None:
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key).nbytes
+            self._discard_spilled(key)
+            self._insert(key, entry)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'images': len(self.entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'spilled_images': len(self.spilled),
+                'spilled_bytes': self.spilled_bytes,
+                'max_spill_bytes': self.max_spill_bytes,
+                **self.counters
+            }
+
+    def _insert(self, key: str, entry: ImageCache) -> None:
+        self.entries[key] = entry
+        self.bytes += entry.nbytes
+        # the most recent entry always stays, even when it alone exceeds the budget
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            evicted_id, evicted = self.entries.popitem(last=False)
+            self.bytes -= evicted.nbytes
+            self.counters['evictions'] += 1
+            self._spill(evicted_id, evicted)
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_folder, hashlib.sha256(key.encode()).hexdigest() + ".npy")
+
+    def _spill(self, key: str, entry: ImageCache) -> None:
+        if self.spill_folder is None or entry.nbytes > self.max_spill_bytes:
+            return
+        if key in self.spilled:
+            self.spilled.move_to_end(key)
+            return
+        while self.spilled and self.spilled_bytes + entry.nbytes > self.max_spill_bytes:
+            self._discard_spilled(next(iter(self.spilled)))
+        try:
+            np.save(self._spill_path(key), entry.features.cpu().numpy())
+        except OSError as e:
+            log.exception('Failed to spill embedding of %s: %s', key, e)
+            return
+        self.spilled[key] = (entry.original_size, entry.input_size, entry.nbytes)
+        self.spilled_bytes += entry.nbytes
+        self.counters['spills'] += 1
+
+    def _load_spilled(self, key: str) -> ImageCache:
+        original_size, input_size, _ = self.spilled[key]
+        self.spilled.move_to_end(key)
+        # copy-on-write mapping, pages are read from the file when the predictor uses them
+        features = np.load(self._spill_path(key), mmap_mode='c')
+        return ImageCache(torch.from_numpy(features).to(self.device), original_size, input_size)
+
+    def _discard_spilled(self, key: str) -> None:
+        if key not in self.spilled:
+            return
+        _, _, nbytes = self.spilled.pop(key)
+        self.spilled_bytes -= nbytes
+        try:
+            os.remove(self._spill_path(key))
+        except OSError as e:
+            log.warning('Failed to remove spilled embedding of %s: %s', key, e)
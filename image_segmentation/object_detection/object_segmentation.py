@@ -1,97 +1,386 @@
 import logging
-from typing import Tuple, List, Dict
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Tuple, List
 
 import cv2
 import numpy as np
 import torch
 import torchvision
-from segment_anything import sam_model_registry, SamPredictor
+from segment_anything import sam_model_registry
 
+from image_segmentation.constants import DEFAULT_SAM_CACHE_BYTES, DEFAULT_SAM_SPILL_BYTES, PREVIEW_LOGITS_CAPACITY, \
+    DEFAULT_SAM_POOL_SIZE, DEFAULT_TILE_OVERLAP
+from image_segmentation.object_detection.embedding_cache import EmbeddingCache, ImageCache
+from image_segmentation.object_detection.predictor_pool import PredictorPool, PredictorContext
+from image_segmentation.object_detection.tiling import Tile, split_into_tiles
+from image_segmentation.utils import get_processed_image_path
 from objects_counter.db.dataops.image import bulk_set_elements, get_background_points
 from objects_counter.db.models import Image
 
 log = logging.getLogger(__name__)
 
+EMBEDDING_QUEUED = 'queued'
+EMBEDDING_RUNNING = 'running'
+EMBEDDING_READY = 'ready'
+EMBEDDING_FAILED = 'failed'
+EMBEDDING_MISSING = 'missing'
+
+
+class PrecomputeTask:
+    """Background computation of an image embedding, the flags are guarded by the precompute lock."""
+
+    def __init__(self):
+        self.future: Future | None = None
+        # set once the worker holds a predictor context, a request waits for the result from then on
+        self.started = False
+        # set by a request which computes the embedding itself before the worker got a context
+        self.cancelled = False
 
-class ObjectSegmentation:
-    """Handles image segmentation and object detection using the Segment Anything Model (SAM)."""
 
-    class ImageCache:
-        def __init__(self, predictor: SamPredictor):
-            self.features = predictor.features
-            self.original_size = predictor.original_size
-            self.input_size = predictor.input_size
+class ObjectSegmentation:  # pylint: disable=too-many-instance-attributes
+    """Handles image segmentation and object detection using the Segment Anything Model (SAM)."""
 
-    def __init__(self, sam_checkpoint_path, model_type="vit_h"):
+    def __init__(self, sam_checkpoint_path, model_type="vit_h",  # pylint: disable=too-many-arguments
+                 cache_bytes: int = DEFAULT_SAM_CACHE_BYTES, spill_bytes: int = DEFAULT_SAM_SPILL_BYTES, *,
+                 pool_size: int = DEFAULT_SAM_POOL_SIZE, torch_threads: int | None = None,
+                 working_resolution: int | None = None, tile_size: int | None = None,
+                 tile_overlap: int = DEFAULT_TILE_OVERLAP):
+        """
+        :param sam_checkpoint_path: Path to the SAM model weights
+        :param model_type: SAM model type matching the checkpoint
+        :param cache_bytes: RAM budget of the image embedding cache
+        :param spill_bytes: Disk budget for embeddings evicted from RAM
+        :param pool_size: Number of requests which can use SAM at the same time, all of them share the model weights
+        :param torch_threads: Number of threads used by torch operations, torch's default when not given
+        :param working_resolution: Longest side [px] the mask and contours of larger images are computed at,
+                                   the original resolution when not given
+        :param tile_size: Side [px] of the tiles larger images are counted in, each tile is embedded on its own,
+                          so small objects keep more detail, the whole image is embedded at once when not given
+        :param tile_overlap: Overlap [px] of neighbouring tiles, smaller than the tile size
+        """
+        if tile_size and tile_size <= tile_overlap:
+            raise ValueError(f"Tile size {tile_size} must be larger than the tile overlap {tile_overlap}")
         log.info("Creating new Segment Anything Object Counter")
         log.info("PyTorch version: %s", torch.__version__)
         log.info("Torchvision version: %s", torchvision.__version__)
         log.info("CUDA is available: %s", torch.cuda.is_available())
 
         assert sam_checkpoint_path is not None
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+        log.info("PyTorch threads: %s, SAM predictor pool size: %s", torch.get_num_threads(), pool_size)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         self.sam = sam_model_registry[model_type](checkpoint=sam_checkpoint_path).to(self.device)
-        self.predictor = SamPredictor(self.sam)
-        self.cache: Dict[int, ObjectSegmentation.ImageCache] = {}
-        self.current_image_id = None
+        self.sam.eval()
+        self.pool = PredictorPool(self.sam, pool_size)
+        self.cache = EmbeddingCache(cache_bytes, spill_bytes, self.device)
+        self.working_resolution = working_resolution
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        # image id -> (points, labels, low resolution logits) of the last preview
+        self.preview_logits: OrderedDict[int, tuple[list, list, torch.Tensor]] = OrderedDict()
+        self.preview_lock = threading.Lock()
+        # embeddings computed in the background after upload, image file path -> state of the computation
+        self.precompute_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sam-precompute')
+        self.precomputing: dict[str, PrecomputeTask] = {}
+        self.precompute_lock = threading.Lock()
+
+    # Embeddings are keyed by the image file path: uploads with the same content share the stored file, so they share
+    # the embedding as well.
+
+    def precompute_embedding(self, image: Image) -> None:
+        """Queues computing the image embedding in the background, so it is cached before the first prediction."""
+        with self.precompute_lock:
+            task = self.precomputing.get(image.filepath)
+            # a failed precompute is queued again
+            if image.filepath in self.cache or (task is not None and not task.future.done()):
+                return
+            # the worker gets plain values, database objects belong to the request's session
+            task = PrecomputeTask()
+            task.future = self.precompute_executor.submit(self._precompute, image.filepath, task)
+            self.precomputing[image.filepath] = task
+
+    def _precompute(self, filepath: str, task: 'PrecomputeTask') -> None:
+        start = time.perf_counter()
+        try:
+            with self.pool.checkout(filepath, background=True) as context:
+                with self.precompute_lock:
+                    # a request took the computation over while the precompute waited for a context
+                    if task.cancelled:
+                        return
+                    task.started = True
+                self._set_image(context, filepath)
+        except Exception as e:
+            log.exception("Failed to precompute the embedding of %s: %s", filepath, e)
+            raise
+        with self.precompute_lock:
+            if self.precomputing.get(filepath) is task:
+                del self.precomputing[filepath]
+        log.info("Precomputed the embedding of %s in %.2f s", filepath, time.perf_counter() - start)
 
-    def _set_image(self, image: Image) -> None:
-        if self.current_image_id == image.id:
-            assert self.predictor.is_image_set is True
+    def embedding_status(self, image: Image) -> str:
+        with self.precompute_lock:
+            task = self.precomputing.get(image.filepath)
+            if task is None:
+                return EMBEDDING_READY if image.filepath in self.cache else EMBEDDING_MISSING
+            if task.future.done():
+                return EMBEDDING_FAILED if task.future.exception() is not None else EMBEDDING_READY
+            return EMBEDDING_RUNNING if task.started else EMBEDDING_QUEUED
+
+    def _wait_for_precompute(self, filepath: str) -> None:
+        """
+        Blocks while the image's embedding is being computed in the background. A precompute which does not hold a
+        predictor context yet is cancelled, the request computes the embedding itself instead of waiting for the queue
+        or for a context, which background work only gets when no request is waiting.
+        Used as the prerequisite of a predictor context checkout, so queued precomputes of other images cannot take
+        the context freed by this one before the request does.
+        """
+        with self.precompute_lock:
+            task = self.precomputing.get(filepath)
+            if task is None:
+                return
+            if not task.started:
+                task.cancelled = True
+                task.future.cancel()
+            if task.cancelled or task.future.done():
+                del self.precomputing[filepath]
+                return
+        start = time.perf_counter()
+        try:
+            task.future.result()
+        except Exception:  # pylint: disable=broad-except
+            # already logged by the worker, the request computes the embedding itself
+            with self.precompute_lock:
+                if self.precomputing.get(filepath) is task:
+                    del self.precomputing[filepath]
+        log.debug("Waited %.2f s for the embedding of %s", time.perf_counter() - start, filepath)
+
+    def _set_image(self, context: PredictorContext, filepath: str, image_data: np.ndarray | None = None) -> None:
+        """Sets the embedding of the image in the context, filepath is also the cache key of the embedding."""
+        predictor = context.predictor
+        if context.current_filepath == filepath:
+            assert predictor.is_image_set is True
             return
-        if image.id in self.cache:
-            self.current_image_id = image.id
-            self.predictor.features = self.cache[image.id].features
-            self.predictor.original_size = self.cache[image.id].original_size
-            self.predictor.input_size = self.cache[image.id].input_size
-            self.predictor.is_image_set = True
+        cached = self.cache.get(filepath)
+        if cached is not None:
+            context.current_filepath = filepath
+            predictor.features = cached.features
+            predictor.original_size = cached.original_size
+            predictor.input_size = cached.input_size
+            predictor.is_image_set = True
             return
-        image_data = cv2.imread(image.filepath)
-        self.predictor.set_image(image_data)
-        assert self.predictor.is_image_set is True
-        self.current_image_id = image.id
-        self.cache[image.id] = ObjectSegmentation.ImageCache(self.predictor)
-
-    def calculate_mask(self, image: Image) -> np.ndarray:
-        """Calculates and assigns a mask to the image based on input points."""
-        self._set_image(image)
+        if image_data is None:
+            image_data = cv2.imread(filepath)
+        predictor.set_image(image_data)
+        assert predictor.is_image_set is True
+        context.current_filepath = filepath
+        self.cache.put(filepath, ImageCache.from_predictor(predictor))
+        log.debug("SAM embedding cache: %s", self.cache.stats())
+
+    def calculate_mask(self, image: Image, image_data: np.ndarray | None = None,
+                       output_size: tuple[int, int] | None = None) -> np.ndarray:
+        """
+        Calculates and assigns a mask to the image based on input points.
+        :param image: Image to calculate the mask for
+        :param image_data: Already decoded image, read from the image file when needed and not given
+        :param output_size: (height, width) to upscale the mask to instead of the original resolution
+        """
         points, labels = get_background_points(image)
-        masks, _, _ = self.predictor.predict(point_coords=np.array(points),
-                                             point_labels=np.array([1 if label else 0 for label in labels]),
-                                             multimask_output=True)
-        return masks[2]
+        with self.pool.checkout(image.filepath,
+                                prerequisite=lambda: self._wait_for_precompute(image.filepath)) as context:
+            self._set_image(context, image.filepath, image_data)
+            if output_size is None:
+                masks, _, _ = context.predictor.predict(point_coords=np.array(points),
+                                                        point_labels=np.array([1 if label else 0 for label in labels]),
+                                                        multimask_output=True)
+                return masks[2]
+            # only the selected mask is upscaled, and only to the requested size
+            logits = self._predict_low_res_logits(context.predictor, points, labels, None)
+            with torch.no_grad():
+                masks = self.sam.postprocess_masks(logits, context.predictor.input_size, output_size)
+        return (masks[0, 0] > self.sam.mask_threshold).cpu().numpy()
+
+    def calculate_preview_mask(self, image: Image, size: int | None = None) -> np.ndarray:
+        """
+        Calculates the mask for interactive previews without upscaling it to the original resolution.
+        When the points only extend the previous preview's points, its low resolution logits are used as the mask
+        input, so the mask is refined instead of predicted from scratch.
+        :param image: Image to calculate the mask for
+        :param size: Longest side of the returned mask [px], SAM's low resolution (256 px) when not given
+        :return: Boolean mask with the aspect ratio of the image
+        """
+        points, labels = get_background_points(image)
+        mask_input = None
+        with self.preview_lock:
+            previous = self.preview_logits.pop(image.id, None)
+        if previous is not None and len(points) > len(previous[0]) \
+                and points[:len(previous[0])] == previous[0] and labels[:len(previous[1])] == previous[1]:
+            mask_input = previous[2]
+
+        with self.pool.checkout(image.filepath,
+                                prerequisite=lambda: self._wait_for_precompute(image.filepath)) as context:
+            self._set_image(context, image.filepath)
+            logits = self._predict_low_res_logits(context.predictor, points, labels, mask_input)
+            input_height, input_width = context.predictor.input_size
+            original_height, original_width = context.predictor.original_size
+        with self.preview_lock:
+            self.preview_logits[image.id] = (points, labels, logits)
+            while len(self.preview_logits) > PREVIEW_LOGITS_CAPACITY:
+                self.preview_logits.popitem(last=False)
+
+        # the logits cover the padded square encoder input, the image is in the top left corner
+        scale = logits.shape[-1] / self.sam.image_encoder.img_size
+        valid_logits = logits[0, 0, :round(input_height * scale), :round(input_width * scale)].cpu().numpy()
+        if size is not None:
+            ratio = size / max(original_height, original_width)
+            target = (max(1, round(original_width * ratio)), max(1, round(original_height * ratio)))
+            valid_logits = cv2.resize(valid_logits, target, interpolation=cv2.INTER_LINEAR)
+        return valid_logits > self.sam.mask_threshold
+
+    def _predict_low_res_logits(self, predictor, points: list, labels: list,
+                                mask_input: torch.Tensor | None) -> torch.Tensor:
+        """Runs the prompt encoder and mask decoder, without upscaling, and returns the selected mask's logits."""
+        coords = predictor.transform.apply_coords(np.array(points), predictor.original_size)
+        coords_torch = torch.as_tensor(coords, dtype=torch.float, device=self.device)[None, :, :]
+        labels_torch = torch.as_tensor([1 if label else 0 for label in labels], dtype=torch.int,
+                                       device=self.device)[None, :]
+        with torch.no_grad():
+            sparse_embeddings, dense_embeddings = self.sam.prompt_encoder(points=(coords_torch, labels_torch),
+                                                                          boxes=None, masks=mask_input)
+            low_res_masks, _ = self.sam.mask_decoder(image_embeddings=predictor.features,
+                                                     image_pe=self.sam.prompt_encoder.get_dense_pe(),
+                                                     sparse_prompt_embeddings=sparse_embeddings,
+                                                     dense_prompt_embeddings=dense_embeddings,
+                                                     # a refined mask is unambiguous, the first one takes the same
+                                                     # mask as calculate_mask
+                                                     multimask_output=mask_input is None)
+        return low_res_masks[:, -1:, :, :]
+
+    def _calculate_tiled_mask(self, image: Image, image_data: np.ndarray, scale: float) -> np.ndarray:
+        """
+        Segments overlapping tiles of the image on their own and merges their masks, at the working scale.
+        Every pixel of the merged mask comes from the core of one tile, objects crossing a seam become a single
+        region of the merged mask, so its contours count them once.
+        Tiles are segmented in parallel, one per predictor context. Tiles without a background point of their own
+        are prompted from the mask of the whole image.
+        """
+        height, width = image_data.shape[:2]
+        prompts = list(zip(*get_background_points(image)))
+        tiles = split_into_tiles(height, width, self.tile_size, self.tile_overlap)
+        merged = np.zeros((round(height * scale), round(width * scale)), dtype=bool)
+        tile_prompts = [[([x - tile.x0, y - tile.y0], label) for (x, y), label in prompts if tile.contains(x, y)]
+                        for tile in tiles]
+        untiled_mask = None
+        with ThreadPoolExecutor(max_workers=len(self.pool.contexts), thread_name_prefix='sam-tile') as executor:
+            futures = {index: executor.submit(self._calculate_tile_mask, image.filepath, image_data, tile,
+                                              tile_prompts[index], scale)
+                       for index, tile in enumerate(tiles) if tile_prompts[index]}
+            if len(futures) < len(tiles):
+                # predicted while the prompted tiles are segmented
+                untiled_mask = self.calculate_mask(image, image_data, merged.shape)
+                for index, tile in enumerate(tiles):
+                    if index not in futures:
+                        tile_prompts[index] = self._prompts_from_mask(untiled_mask, tile, scale)
+                        if tile_prompts[index]:
+                            futures[index] = executor.submit(self._calculate_tile_mask, image.filepath, image_data,
+                                                             tile, tile_prompts[index], scale)
+            for index, tile in enumerate(tiles):
+                scaled = tile.scaled(scale)
+                if index in futures:
+                    tile_mask = futures[index].result()
+                else:
+                    # the mask of the whole image has no background in the tile to prompt it with
+                    tile_mask = untiled_mask[scaled.y0:scaled.y1, scaled.x0:scaled.x1]
+                merged[scaled.core_y0:scaled.core_y1, scaled.core_x0:scaled.core_x1] = \
+                    tile_mask[scaled.core_y0 - scaled.y0:scaled.core_y1 - scaled.y0,
+                              scaled.core_x0 - scaled.x0:scaled.core_x1 - scaled.x0]
+        log.debug("Segmented image %s in %s tiles: %s", image.id, len(tiles), self.pool.stats())
+        return merged
+
+    @staticmethod
+    def _prompts_from_mask(mask: np.ndarray, tile: Tile, scale: float) -> list:
+        """
+        Prompts a tile with the innermost background pixel of the tile in the mask of the whole image, and with its
+        innermost object pixel when the tile has one. Segmented at the tile's resolution, the tile still finds
+        objects too small for the mask of the whole image.
+        :param mask: Mask of the whole image at the working scale
+        :return: (point, label) pairs in tile coordinates, empty when the mask has no background in the tile
+        """
+        scaled = tile.scaled(scale)
+        crop = mask[scaled.y0:scaled.y1, scaled.x0:scaled.x1]
+        if not crop.any():
+            return []
+        prompts = []
+        for region, label in ((crop, True), (np.logical_not(crop), False)):
+            if not region.any():
+                continue
+            distance = cv2.distanceTransform(region.astype(np.uint8), cv2.DIST_L2, 3)
+            y, x = divmod(int(np.argmax(distance)), distance.shape[1])
+            prompts.append(([min(int((x + 0.5) / scale), tile.x1 - tile.x0 - 1),
+                             min(int((y + 0.5) / scale), tile.y1 - tile.y0 - 1)], label))
+        return prompts
+
+    def _calculate_tile_mask(self, filepath: str, image_data: np.ndarray, tile: Tile, prompts: list,
+                             scale: float) -> np.ndarray:
+        """
+        Segments one tile, the tile's embedding is cached like the embedding of a whole image.
+        Returns the tile's mask at the working scale.
+        :param prompts: (point, label) pairs in tile coordinates
+        """
+        scaled = tile.scaled(scale)
+        key = f"{filepath}#{tile.x0},{tile.y0},{tile.x1},{tile.y1}"
+        with self.pool.checkout(key) as context:
+            self._set_image(context, key, np.ascontiguousarray(image_data[tile.y0:tile.y1, tile.x0:tile.x1]))
+            logits = self._predict_low_res_logits(context.predictor, [point for point, _ in prompts],
+                                                  [label for _, label in prompts], None)
+            with torch.no_grad():
+                masks = self.sam.postprocess_masks(logits, context.predictor.input_size,
+                                                   (scaled.y1 - scaled.y0, scaled.x1 - scaled.x0))
+        return (masks[0, 0] > self.sam.mask_threshold).cpu().numpy()
 
     def _process_mask(self, mask):
-        """Converts mask to binary format and processes edges for contour detection."""
-        result_mask = np.array(mask) * 255
-        image = np.ascontiguousarray(result_mask, dtype=np.uint8)
-
-        for x in range(0, image.shape[0]):
-            if image[x][0] == 0:
-                cv2.floodFill(image, None, (0, x), 255)
-            if image[x][image.shape[1] - 1] == 0:
-                cv2.floodFill(image, None, (image.shape[1] - 1, x), 255)
-        for y in range(0, image.shape[1]):
-            if image[0][y] == 0:
-                cv2.floodFill(image, None, (y, 0), 255)
-            if image[image.shape[0] - 1][y] == 0:
-                cv2.floodFill(image, None, (y, image.shape[0] - 1), 255)
-
-        _, binary_image = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY_INV)
+        """Converts mask to binary format and removes the unmasked regions touching the image border."""
+        unmasked = np.logical_not(mask).astype(np.uint8)
+        _, labels = cv2.connectedComponents(unmasked, connectivity=4)
+
+        # label 0 is the masked area, every other label touching the border is flooded into it
+        flooded = np.zeros(labels.max() + 1, dtype=bool)
+        flooded[0] = True
+        for border in (labels[0], labels[-1], labels[:, 0], labels[:, -1]):
+            flooded[border] = True
 
+        binary_image = np.where(flooded[labels], 0, 255).astype(np.uint8)
         return binary_image
 
-    def _remove_small_masks(self, image, contours, threshold_fraction = 0.001):
-        new_contours = []
-        image_data = cv2.imread(image.filepath)
-        image_pixels = image_data.shape[0] * image_data.shape[1]
+    def _working_scale(self, height: int, width: int) -> float:
+        """Scale of the working resolution relative to the original image, 1 when the image is small enough."""
+        if not self.working_resolution:
+            return 1.0
+        return min(1.0, self.working_resolution / max(height, width))
+
+    def _extract_contours(self, mask: np.ndarray, scale: float = 1.0,
+                          reference_shape: tuple[int, int] | None = None) -> list[np.ndarray]:
+        """
+        Finds the outer contours of the objects in the mask and removes the small ones.
+        :param mask: Background mask, at the working resolution
+        :param scale: Scale of the mask relative to the original image, contours are returned in original coordinates
+        :param reference_shape: Shape the small object threshold is relative to, the whole mask when not given
+        """
+        binary_image = self._process_mask(mask)
+        contours, _ = cv2.findContours(binary_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours = self._remove_small_masks(reference_shape or mask.shape, contours)
+        if scale == 1.0:
+            return contours
+        return [np.round(contour / scale).astype(np.int32) for contour in contours]
+
+    def _remove_small_masks(self, image_shape, contours, threshold_fraction = 0.001):
+        """Removes contours smaller than the given fraction of the image area."""
+        image_pixels = image_shape[0] * image_shape[1]
         contour_removal_threshold = image_pixels * threshold_fraction
-        for contour in contours:
-            if cv2.contourArea(contour) < contour_removal_threshold:
-                cv2.drawContours(image_data, [contour], -1, color=(0, 0, 0), thickness=cv2.FILLED)
-            else:
-                new_contours.append(contour)
-        return new_contours
+        return [contour for contour in contours if cv2.contourArea(contour) >= contour_removal_threshold]
 
     def _extract_bounding_boxes(self, contours) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
         """Extracts bounding boxes from contours."""
@@ -101,29 +390,56 @@ class ObjectSegmentation:
             objects_bounding_boxes.append(((x, y), (x + w, y + h)))
         return objects_bounding_boxes
 
-    def _remove_background_from_image(self, image: Image, contours) -> None:
-        img = cv2.imread(image.filepath)
-        fill_color = [255, 255, 255]
+    def _remove_background_from_image(self, image: Image, img: np.ndarray, contours) -> None:
+        """Whites out everything outside the contours, in place, and saves the result next to the image."""
+        fill_value = 255
         mask_value = 255
-        stencil = np.zeros(img.shape[:-1]).astype(np.uint8)
+        stencil = np.zeros(img.shape[:-1], dtype=np.uint8)
         cv2.fillPoly(stencil, contours, mask_value)
-        sel = stencil != mask_value
-        img[sel] = fill_color
-        cv2.imwrite(image.filepath[:-4] + "_processed.bmp", img)
+        # broadcasting the stencil avoids the index arrays of a boolean mask assignment
+        np.copyto(img, np.uint8(fill_value), where=(stencil != mask_value)[..., None])
+        cv2.imwrite(get_processed_image_path(image), img)
 
     def count_objects(self, image: Image) -> int:
-        result_mask = self.calculate_mask(image)
+        timings = {}
+        start = time.perf_counter()
+
+        def lap(stage: str) -> None:
+            nonlocal start
+            now = time.perf_counter()
+            timings[stage] = round(now - start, 4)
+            start = now
+
+        # decoded once, every stage below works on this array
+        image_data = cv2.imread(image.filepath)
+        lap('decode')
+        height, width = image_data.shape[:2]
+        # the mask and its contours are computed at the working resolution, the processed image and the bounding
+        # boxes stay at the original resolution
+        scale = self._working_scale(height, width)
+        working_size = (round(height * scale), round(width * scale)) if scale < 1 else None
+        reference_shape = None
+        if self.tile_size and max(height, width) > self.tile_size:
+            result_mask = self._calculate_tiled_mask(image, image_data, scale)
+            # small objects are judged relative to the tile they were segmented in
+            reference_shape = (round(self.tile_size * scale),) * 2
+        else:
+            result_mask = self.calculate_mask(image, image_data, working_size)
+        lap('mask')
         if result_mask is None:
             log.warning("No mask found for image: %s", image.id)
             return 0
-        binary_image = self._process_mask(result_mask)
-        contours, _ = cv2.findContours(binary_image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        contours = self._remove_small_masks(image, contours)
-        self._remove_background_from_image(image, contours)
+        contours = self._extract_contours(result_mask, scale, reference_shape)
+        lap('contours')
+        self._remove_background_from_image(image, image_data, contours)
+        lap('background')
         object_count = len(contours)
         log.info("Number of objects detected: %s", object_count)
         bounding_boxes = self._get_bounding_boxes(contours)
         bulk_set_elements(image, bounding_boxes)
+        lap('elements')
+        log.info("Counted objects in image %s (%dx%d, working scale %.3f), stage timings [s]: %s",
+                 image.id, width, height, scale, timings)
         return object_count
 
     def _get_bounding_boxes(self, contours):
@@ -0,0 +1,80 @@
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from segment_anything import SamPredictor
+from segment_anything.modeling import Sam
+
+
+class PredictorContext:
+    """SAM predictor with its own image state, the model weights are shared with the other contexts of the pool."""
+
+    def __init__(self, sam: Sam):
+        self.predictor = SamPredictor(sam)
+        self.current_filepath = None
+
+
+class PredictorPool:
+    """Fixed number of predictor contexts, each one is used by a single request at a time."""
+
+    def __init__(self, sam: Sam, size: int):
+        assert size > 0
+        self.contexts = [PredictorContext(sam) for _ in range(size)]
+        # least recently returned first
+        self.free = list(self.contexts)
+        self.condition = threading.Condition()
+        self.waiting_requests = 0
+        self.counters = {'checkouts': 0, 'image_hits': 0, 'waits': 0}
+
+    @contextmanager
+    def checkout(self, filepath: str | None = None, background: bool = False,
+                 prerequisite: Callable[[], None] | None = None) -> Iterator[PredictorContext]:
+        """
+        Waits for a free context and holds it until the block exits.
+        :param filepath: A free context which already has this image set is preferred
+        :param background: Background work only gets a context when no request is waiting for one
+        :param prerequisite: Called before taking a context, background work cannot take one in the meantime,
+                             so it must not need a context itself
+        """
+        if background:
+            with self.condition:
+                self.condition.wait_for(lambda: self.free and self.waiting_requests == 0)
+                context = self._take(filepath)
+        else:
+            with self.condition:
+                self.waiting_requests += 1
+            try:
+                if prerequisite is not None:
+                    prerequisite()
+            except BaseException:
+                with self.condition:
+                    self.waiting_requests -= 1
+                    self.condition.notify_all()
+                raise
+            with self.condition:
+                if not self.free:
+                    self.counters['waits'] += 1
+                    self.condition.wait_for(lambda: self.free)
+                self.waiting_requests -= 1
+                context = self._take(filepath)
+        try:
+            yield context
+        finally:
+            with self.condition:
+                self.free.append(context)
+                # background waiters may be notified first, they have to wait on for the requests
+                self.condition.notify_all()
+
+    def _take(self, filepath: str | None) -> PredictorContext:
+        context = next((context for context in self.free if context.current_filepath == filepath), None)
+        if context is not None:
+            self.counters['image_hits'] += 1
+        else:
+            context = self.free[0]
+        self.free.remove(context)
+        self.counters['checkouts'] += 1
+        return context
+
+    def stats(self) -> dict:
+        with self.condition:
+            return {'size': len(self.contexts), 'busy': len(self.contexts) - len(self.free), **self.counters}
@@ -0,0 +1,50 @@
+from typing import NamedTuple
+
+
+class Tile(NamedTuple):
+    """
+    Region of the image segmented on its own, in original image coordinates.
+    The core is the part of the tile which goes into the merged mask, the cores of all tiles partition the image,
+    so every pixel of an overlap comes from exactly one tile.
+    """
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+    core_x0: int
+    core_y0: int
+    core_x1: int
+    core_y1: int
+
+    def contains(self, x: float, y: float) -> bool:
+        return self.x0 <= x < self.x1 and self.y0 <= y < self.y1
+
+    def scaled(self, scale: float) -> 'Tile':
+        """The same tile in a scaled image, neighbouring tiles round their shared boundaries the same way."""
+        return Tile(round(self.x0 * scale), round(self.y0 * scale), round(self.x1 * scale), round(self.y1 * scale),
+                    round(self.core_x0 * scale), round(self.core_y0 * scale), round(self.core_x1 * scale),
+                    round(self.core_y1 * scale))
+
+
+def split_axis(length: int, tile_size: int, overlap: int) -> list[tuple[int, int, int, int]]:
+    """
+    Splits one axis into overlapping segments of tile_size, the last one is aligned with the end.
+    :return: (start, end, core start, core end) of each segment, cores are split in the middle of the overlaps
+    """
+    if tile_size <= overlap:
+        raise ValueError(f"Tile size {tile_size} must be larger than the overlap {overlap}")
+    if length <= tile_size:
+        return [(0, length, 0, length)]
+    stride = tile_size - overlap
+    starts = list(range(0, length - tile_size, stride)) + [length - tile_size]
+    # the core boundary between two neighbours is the middle of their overlap
+    boundaries = [0] + [(next_start + start + tile_size) // 2 for start, next_start in zip(starts, starts[1:])] \
+        + [length]
+    return [(start, start + tile_size, boundaries[i], boundaries[i + 1]) for i, start in enumerate(starts)]
+
+
+def split_into_tiles(height: int, width: int, tile_size: int, overlap: int) -> list[Tile]:
+    """Covers the image with overlapping tiles, row by row."""
+    return [Tile(x0, y0, x1, y1, core_x0, core_y0, core_x1, core_y1)
+            for y0, y1, core_y0, core_y1 in split_axis(height, tile_size, overlap)
+            for x0, x1, core_x0, core_x1 in split_axis(width, tile_size, overlap)]
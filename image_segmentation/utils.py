@@ -6,7 +6,7 @@ from PIL import Image as PILImage
 from PIL import ImageDraw
 
 from objects_counter.db.dataops.image import get_image_by_id
-from objects_counter.db.models import ImageElement
+from objects_counter.db.models import ImageElement, Image
 
 
 def display_element(element: ImageElement):
@@ -22,15 +22,32 @@ def display_element(element: ImageElement):
 
 
 def crop_element(image: np.ndarray, top_left: Tuple[float, float], bottom_right: Tuple[float, float]) -> PILImage.Image:
-    """Crops the image based on bounding box coordinates."""
-    pil_image = PILImage.fromarray(image)
-    (x_min, y_min), (x_max, y_max) = top_left, bottom_right
-    return pil_image.crop((x_min, y_min, x_max, y_max))
-
-
-def delete_temp_images(directory: str) -> None:
-    """Deletes all images in the temporary directory."""
-    for filename in os.listdir(directory):
-        file_path = os.path.join(directory, filename)
-        if os.path.isfile(file_path):
-            os.unlink(file_path)
+    """
+    Crops the image based on bounding box coordinates, slicing the array instead of copying the whole image.
+    Same as PIL's crop: the coordinates are rounded and the parts of the box outside the image are black.
+    """
+    (x_min, y_min), (x_max, y_max) = ((round(x), round(y)) for x, y in (top_left, bottom_right))
+    if x_max < x_min or y_max < y_min:
+        raise ValueError(f"Invalid bounding box: {top_left}, {bottom_right}")
+    height, width = image.shape[:2]
+    if 0 <= x_min and 0 <= y_min and x_max <= width and y_max <= height:
+        return PILImage.fromarray(image[y_min:y_max, x_min:x_max])
+    cropped = np.zeros((y_max - y_min, x_max - x_min) + image.shape[2:], dtype=image.dtype)
+    inner_x_min, inner_y_min = min(max(x_min, 0), width), min(max(y_min, 0), height)
+    inner_x_max, inner_y_max = max(min(x_max, width), inner_x_min), max(min(y_max, height), inner_y_min)
+    cropped[inner_y_min - y_min:inner_y_max - y_min, inner_x_min - x_min:inner_x_max - x_min] = \
+        image[inner_y_min:inner_y_max, inner_x_min:inner_x_max]
+    return PILImage.fromarray(cropped)
+
+
+def get_processed_image_path(image: Image) -> str:
+    """Path of the image with its background removed, each image has its own even when it shares the uploaded file."""
+    return f"{os.path.splitext(image.filepath)[0]}_{image.id}_processed.bmp"
+
+
+def find_processed_image_path(image: Image) -> str:
+    """Path of an existing processed image, images processed before the paths included the image id use the old one."""
+    processed_path = get_processed_image_path(image)
+    if os.path.exists(processed_path):
+        return processed_path
+    return image.filepath[:-4] + "_processed.bmp"
@@ -4,7 +4,9 @@ from flask_restx import Api
 from image_segmentation.object_classification.classifier import ObjectClassifier
 from image_segmentation.object_classification.feature_extraction import FeatureSimilarity, ColorSimilarity
 from image_segmentation.object_detection.object_segmentation import ObjectSegmentation
-from objects_counter.consts import SAM_CHECKPOINT, SAM_MODEL_TYPE
+from objects_counter.consts import SAM_CHECKPOINT, SAM_MODEL_TYPE, EMBEDDING_BATCH_SIZE, \
+    FEATURE_CACHE_BYTES, SAM_CACHE_BYTES, SAM_SPILL_BYTES, SAM_POOL_SIZE, TORCH_THREADS, \
+    WORKING_RESOLUTION, TILE_SIZE, TILE_OVERLAP
 
 
 class FixedApi(Api):
@@ -17,7 +19,10 @@ class FixedApi(Api):
 
 blueprint = Blueprint('api', __name__, url_prefix='/api')
 api = FixedApi(blueprint)
-sam = ObjectSegmentation(SAM_CHECKPOINT, model_type=SAM_MODEL_TYPE)
-feature_similarity_model = FeatureSimilarity()
+sam = ObjectSegmentation(SAM_CHECKPOINT, model_type=SAM_MODEL_TYPE, cache_bytes=SAM_CACHE_BYTES,
+                         spill_bytes=SAM_SPILL_BYTES, pool_size=SAM_POOL_SIZE, torch_threads=TORCH_THREADS,
+                         working_resolution=WORKING_RESOLUTION, tile_size=TILE_SIZE, tile_overlap=TILE_OVERLAP)
+feature_similarity_model = FeatureSimilarity(batch_size=EMBEDDING_BATCH_SIZE)
 color_similarity_model = ColorSimilarity()
-object_grouper = ObjectClassifier(sam, feature_similarity_model, color_similarity_model)
+object_grouper = ObjectClassifier(sam, feature_similarity_model, color_similarity_model,
+                                  feature_cache_bytes=FEATURE_CACHE_BYTES)
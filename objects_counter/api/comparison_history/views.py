@@ -5,9 +5,10 @@ from flask import jsonify, Response
 from flask_restx import Namespace, Resource
 from werkzeug.exceptions import Forbidden, NotFound
 
-from objects_counter.api.utils import authentication_required, get_thumbnails
+from objects_counter.api.utils import authentication_required, get_thumbnails, page_parser, parse_page_args, \
+    get_thumbnail_manifest
 from objects_counter.db.dataops.comparison_history import get_comparisons_by_user_id, delete_comparison_by_id, \
-    get_comparison_by_id
+    get_comparison_by_id, get_comparisons_summary_by_user_id, get_comparisons_thumbnail_image_ids_by_user_id
 from objects_counter.db.models import User
 
 api = Namespace('comparison_history', description='History of comparisons (image to dataset)')
@@ -29,6 +30,24 @@ class ComparisonHistory(Resource):
         return jsonify(get_comparisons_by_user_id(current_user.id))
 
 
+@api.route('/summary')
+class ComparisonHistorySummary(Resource):
+    @api.doc("Page of user's comparisons with classification counts instead of images and elements")
+    @api.expect(page_parser)
+    @api.response(200, 'Success')
+    @api.response(400, 'Invalid page arguments')
+    @api.response(401, 'You must be logged in to access this resource')
+    @authentication_required
+    def get(self, current_user: User) -> typing.Any:
+        """Page of user's comparisons, from the newest"""
+        try:
+            limit, cursor = parse_page_args()
+            return jsonify(get_comparisons_summary_by_user_id(current_user.id, limit, cursor))
+        except ValueError as e:
+            log.error("Invalid page arguments: %s", e)
+            return Response("Invalid page arguments", 400)
+
+
 @api.route('/<int:comparison_id>')
 class ComparisonHistoryDetails(Resource):
     @api.doc("Get comparison details")
@@ -85,3 +104,14 @@ class ComparisonHistoryThumbnails(Resource):
         comparisons = current_user.comparisons
         thumbnails = get_thumbnails(comparisons)
         return jsonify(thumbnails)
+
+
+@api.route('/thumbnails/manifest')
+class ComparisonHistoryThumbnailsManifest(Resource):
+    @api.doc("URLs of the thumbnails of user's comparisons, newest first")
+    @api.response(200, 'Success')
+    @api.response(401, 'You must be logged in to access this resource')
+    @authentication_required
+    def get(self, current_user: User) -> typing.Any:
+        """List URLs of user's comparisons thumbnails"""
+        return jsonify(get_thumbnail_manifest(get_comparisons_thumbnail_image_ids_by_user_id(current_user.id)))
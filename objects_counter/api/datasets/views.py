@@ -8,10 +8,12 @@ from werkzeug.exceptions import NotFound, Forbidden
 from objects_counter.api.datasets.models import insert_dataset_model, insert_image_model, patch_dataset_model, \
     adjust_classifications_model, images_list_model
 from objects_counter.api.common import object_grouper
-from objects_counter.api.utils import authentication_required, get_thumbnails
+from objects_counter.api.utils import authentication_required, get_thumbnails, page_parser, parse_page_args, \
+    get_thumbnail_manifest
 from objects_counter.db.dataops.comparison_history import insert_comparison
 from objects_counter.db.dataops.dataset import get_user_datasets_serialized, get_dataset_by_id, delete_dataset_by_id, \
-    insert_dataset, add_image_to_dataset, rename_dataset, get_user_datasets, update_unfinished_state
+    insert_dataset, add_image_to_dataset, rename_dataset, get_user_datasets, update_unfinished_state, \
+    get_user_datasets_summary, get_user_datasets_thumbnail_image_ids
 from objects_counter.db.dataops.image import serialize_image_as_result, get_image_by_id, \
     bulk_update_element_classification_by_id
 from objects_counter.db.models import User
@@ -44,6 +46,24 @@ class Datasets(Resource):
             return Response("Invalid dataset data", 400)
 
 
+@api.route('/summary')
+class DatasetsSummary(Resource):
+    @api.doc("Page of user's datasets with classification counts instead of images and elements")
+    @api.expect(page_parser)
+    @api.response(200, 'Success')
+    @api.response(400, 'Invalid page arguments')
+    @api.response(401, 'You must be logged in to access this resource')
+    @authentication_required
+    def get(self, current_user: User) -> typing.Any:
+        """Page of user's datasets, from the newest"""
+        try:
+            limit, cursor = parse_page_args()
+            return jsonify(get_user_datasets_summary(current_user, limit, cursor))
+        except ValueError as e:
+            log.error("Invalid page arguments: %s", e)
+            return Response("Invalid page arguments", 400)
+
+
 @api.route('/<int:dataset_id>')
 class Dataset(Resource):
     @authentication_required
@@ -187,11 +207,13 @@ class AdjustClassifications(Resource):
                 log.error("Image %s does not belong to dataset %s", image_id, dataset_id)
                 return Response("Image does not belong to dataset", 400)
             classifications = data.get('classifications', [])
+            if not isinstance(classifications, list):
+                raise ValueError("Classifications must be a list")
             bulk_update_element_classification_by_id(classifications)
             return jsonify(serialize_image_as_result(image))
         except ValueError as e:
-            log.exception("Invalid dataset ID %s or image ID %s: %s", dataset_id, image_id, e)
-            return Response("Invalid dataset ID or image ID", 400)
+            log.exception("Invalid dataset ID %s, image ID %s or classifications: %s", dataset_id, image_id, e)
+            return Response("Invalid dataset ID, image ID or classifications", 400)
         except NotFound as e:
             log.exception("Dataset or image not found: %s", e)
             return Response("Dataset or image not found", 404)
@@ -249,3 +271,14 @@ class DatasetsThumbnails(Resource):
         datasets = get_user_datasets(current_user)
         thumbnails = get_thumbnails(datasets)
         return jsonify(thumbnails)
+
+
+@api.route('/thumbnails/manifest')
+class DatasetsThumbnailsManifest(Resource):
+    @api.doc("URLs of the thumbnails of user's datasets, newest first")
+    @api.response(200, 'Success')
+    @api.response(401, 'You must be logged in to access this resource')
+    @authentication_required
+    def get(self, current_user: User) -> typing.Any:
+        """List URLs of user's datasets thumbnails"""
+        return jsonify(get_thumbnail_manifest(get_user_datasets_thumbnail_image_ids(current_user)))
@@ -0,0 +1,96 @@
+import itertools
+import threading
+import typing
+
+
+class _Slot:
+    """Requests for one key: the newest payload and the result of the newest finished computation."""
+
+    def __init__(self):
+        self.run_lock = threading.Lock()
+        self.generation = 0
+        self.pending = None
+        self.finished_generation = 0
+        self.result = None
+        self.waiters = 0
+
+
+class LatestWinsCoalescer:
+    """
+    Runs at most one computation per key at a time and only for the newest payload.
+    Requests queued behind a running computation do not compute their own, now stale, payload: the first of them
+    computes the newest payload and every other one gets that result.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots: dict[typing.Hashable, _Slot] = {}
+        self.counters = {'requests': 0, 'computations': 0, 'skipped': 0}
+
+    def submit(self, key: typing.Hashable, payload: typing.Any,
+               compute: typing.Callable[[typing.Any], typing.Any]) -> typing.Any:
+        """
+        :param key: Requests with the same key are coalesced
+        :param payload: Input of this request, replaced by a newer one if it arrives before the computation starts
+        :param compute: Computes the result for a payload
+        :return: Result for this payload or for a newer one
+        """
+        with self.lock:
+            slot = self.slots.setdefault(key, _Slot())
+            slot.generation += 1
+            generation = slot.generation
+            slot.pending = payload
+            slot.waiters += 1
+            self.counters['requests'] += 1
+        try:
+            with slot.run_lock:
+                with self.lock:
+                    if slot.finished_generation >= generation:
+                        self.counters['skipped'] += 1
+                        return slot.result
+                    newest_generation, newest_payload = slot.generation, slot.pending
+                    self.counters['computations'] += 1
+                result = compute(newest_payload)
+                with self.lock:
+                    slot.finished_generation = newest_generation
+                    slot.result = result
+                return result
+        finally:
+            with self.lock:
+                slot.waiters -= 1
+                if slot.waiters == 0:
+                    del self.slots[key]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {'pending': sum(slot.waiters for slot in self.slots.values()), **self.counters}
+
+
+class LatestWrites:
+    """
+    Orders writes of one key by the arrival of their requests, a write of an older request never replaces the value
+    written for a newer one, even when the older request reaches the write later.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.arrivals = itertools.count(1)
+        self.written: dict[typing.Hashable, int] = {}
+
+    def ticket(self) -> int:
+        """:return: Arrival order of a request, taken when the request arrives"""
+        return next(self.arrivals)
+
+    def write(self, key: typing.Hashable, ticket: int, write: typing.Callable[[], typing.Any]) -> bool:
+        """
+        :param key: Writes with the same key are ordered
+        :param ticket: Arrival order of the request making the write
+        :param write: Writes the value, called only when no newer request of the key has written yet
+        :return: Whether the value was written
+        """
+        with self.lock:
+            if self.written.get(key, 0) > ticket:
+                return False
+            write()
+            self.written[key] = ticket
+            return True
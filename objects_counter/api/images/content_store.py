@@ -0,0 +1,110 @@
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+
+from objects_counter.utils import create_thumbnail
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 2 ** 20
+DEFAULT_EXTENSION = '.png'
+DIGEST_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=DIGEST_CACHE_SIZE)
+def _file_digest(path: str, _mtime_ns: int, _size: int) -> str:
+    """The modification time and size are part of the cache key, a rewritten file is hashed again."""
+    content_hash = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(CHUNK_SIZE):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+class ContentStore:
+    """
+    Content addressed storage of uploaded images: files are named after the SHA-256 of their content, so the upload
+    folder itself is the index. Identical uploads share the stored file and its thumbnail.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {'uploads': 0, 'file_hits': 0, 'thumbnails': 0, 'thumbnail_hits': 0}
+
+    def save(self, upload: FileStorage, upload_folder: str, thumbnail_folder: str) -> tuple[str, str]:
+        """
+        Streams the upload to disk while hashing it, an already stored copy is kept instead.
+        :return: Path of the stored file and path for its thumbnail
+        """
+        if not os.path.exists(upload_folder):
+            log.warning("Upload folder does not exist")
+            os.makedirs(upload_folder)
+        extension = os.path.splitext(secure_filename(upload.filename or ''))[1].lower() or DEFAULT_EXTENSION
+        content_hash = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=upload_folder, suffix='.part', delete=False) as temporary_file:
+            try:
+                while chunk := upload.stream.read(CHUNK_SIZE):
+                    content_hash.update(chunk)
+                    temporary_file.write(chunk)
+            except BaseException:
+                temporary_file.close()
+                os.remove(temporary_file.name)
+                raise
+        filename = content_hash.hexdigest() + extension
+        dst = os.path.join(upload_folder, filename)
+        try:
+            if os.path.exists(dst):
+                os.remove(temporary_file.name)
+                file_hit = True
+            else:
+                # atomic, a concurrent upload of the same content replaces it with identical bytes
+                os.replace(temporary_file.name, dst)
+                file_hit = False
+        except OSError:
+            if os.path.exists(temporary_file.name):
+                os.remove(temporary_file.name)
+            raise
+        with self.lock:
+            self.counters['uploads'] += 1
+            self.counters['file_hits'] += file_hit
+        return dst, os.path.join(thumbnail_folder, filename)
+
+    def ensure_thumbnail(self, image_path: str, thumbnail_path: str) -> None:
+        """Creates the thumbnail unless it was already created for the same content."""
+        thumbnail_hit = os.path.exists(thumbnail_path)
+        if not thumbnail_hit:
+            # the extension selects the thumbnail's format
+            with tempfile.NamedTemporaryFile(dir=os.path.dirname(thumbnail_path),
+                                             suffix=os.path.splitext(thumbnail_path)[1], delete=False) as temporary:
+                pass
+            try:
+                create_thumbnail(image_path, temporary.name)
+                # atomic, a concurrent request never serves a partially written thumbnail
+                os.replace(temporary.name, thumbnail_path)
+            except BaseException:
+                if os.path.exists(temporary.name):
+                    os.remove(temporary.name)
+                raise
+        with self.lock:
+            self.counters['thumbnails'] += 1
+            self.counters['thumbnail_hits'] += thumbnail_hit
+
+    @staticmethod
+    def digest(path: str) -> str:
+        """SHA-256 of a stored file, e.g. as its ETag, computed once per version of the file."""
+        stat = os.stat(path)
+        return _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                **self.counters,
+                'file_hit_rate': self.counters['file_hits'] / max(self.counters['uploads'], 1),
+                'thumbnail_hit_rate': self.counters['thumbnail_hits'] / max(self.counters['thumbnails'], 1)
+            }
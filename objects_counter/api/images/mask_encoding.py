@@ -0,0 +1,66 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image as PILImage
+
+JSON_ENCODING = 'json'
+RLE_ENCODING = 'rle'
+PNG_ENCODING = 'png'
+BITS_ENCODING = 'bits'
+MASK_ENCODINGS = [JSON_ENCODING, RLE_ENCODING, PNG_ENCODING, BITS_ENCODING]
+
+RLE_MIMETYPE = 'application/vnd.coco-rle+json'
+PNG_MIMETYPE = 'image/png'
+BITS_MIMETYPE = 'application/octet-stream'
+ACCEPTED_MIMETYPES = {
+    RLE_MIMETYPE: RLE_ENCODING,
+    PNG_MIMETYPE: PNG_ENCODING,
+    BITS_MIMETYPE: BITS_ENCODING,
+}
+
+
+def encoding_from_accept(accept_mimetypes) -> str:
+    """Picks the encoding of the best match of the Accept header, the legacy JSON array when nothing else matches."""
+    # ties go to the first listed type, so wildcards keep the legacy encoding
+    best_match = accept_mimetypes.best_match(['application/json', *ACCEPTED_MIMETYPES])
+    return ACCEPTED_MIMETYPES.get(best_match, JSON_ENCODING)
+
+
+def downsample_mask(mask: np.ndarray, max_size: int) -> np.ndarray:
+    """Scales the mask down so its longer side is at most max_size pixels, smaller masks are returned as they are."""
+    height, width = mask.shape
+    scale = max_size / max(height, width)
+    if scale >= 1:
+        return mask
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    # area averaging keeps thin structures better than nearest neighbour, > 127 is the majority vote
+    return cv2.resize(mask.astype(np.uint8) * 255, size, interpolation=cv2.INTER_AREA) > 127
+
+
+def encode_rle(mask: np.ndarray) -> dict:
+    """
+    Uncompressed COCO run-length encoding.
+    :param mask: Boolean mask of shape (height, width)
+    :return: Dictionary with the mask size [height, width] and the run lengths of the mask in column-major order,
+             starting with a (possibly empty) run of False values
+    """
+    pixels = np.asarray(mask, dtype=bool).ravel(order='F')
+    changes = np.flatnonzero(pixels[1:] != pixels[:-1]) + 1
+    boundaries = np.concatenate(([0], changes, [pixels.size]))
+    counts = np.diff(boundaries)
+    if pixels.size and pixels[0]:
+        counts = np.concatenate(([0], counts))
+    return {'size': list(mask.shape), 'counts': counts.tolist()}
+
+
+def encode_png(mask: np.ndarray) -> bytes:
+    """Encodes the mask as a 1-bit PNG."""
+    buffer = io.BytesIO()
+    PILImage.fromarray(np.asarray(mask, dtype=bool)).save(buffer, format='PNG', optimize=False)
+    return buffer.getvalue()
+
+
+def encode_bits(mask: np.ndarray) -> bytes:
+    """Packs the mask row by row into bits, most significant bit first, each row padded to a whole byte."""
+    return np.packbits(np.asarray(mask, dtype=bool), axis=1).tobytes()
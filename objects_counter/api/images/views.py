@@ -1,28 +1,45 @@
 import json
 import logging
 import os
-import random
-import string
-import time
 import typing
+from concurrent.futures import ThreadPoolExecutor
 
 import flask
 from flask import request, send_file, Response, jsonify
-from flask_restx import Resource, Namespace
+from flask_restx import Resource, Namespace, inputs
 from werkzeug.datastructures import FileStorage
 from werkzeug.exceptions import NotFound
-from werkzeug.utils import secure_filename
 
 from objects_counter.api.common import sam
+from objects_counter.api.images.coalescing import LatestWinsCoalescer, LatestWrites
+from objects_counter.api.images.content_store import ContentStore
+from objects_counter.api.images.mask_encoding import MASK_ENCODINGS, JSON_ENCODING, RLE_ENCODING, PNG_ENCODING, \
+    RLE_MIMETYPE, PNG_MIMETYPE, BITS_MIMETYPE, encoding_from_accept, downsample_mask, encode_rle, encode_png, \
+    encode_bits
 from objects_counter.api.images.models import points_model, accept_model
 from objects_counter.api.utils import authentication_required, gzip_compress
-from objects_counter.db.dataops.image import insert_image, update_background_points, get_image_by_id
-from objects_counter.db.models import User
-from objects_counter.utils import create_thumbnail
+from objects_counter.consts import THUMBNAIL_WORKERS, THUMBNAIL_MAX_AGE
+from objects_counter.db.dataops.image import insert_image, bulk_insert_images, update_background_points, get_image_by_id
+from objects_counter.db.models import User, Image
 
 api = Namespace('images', description='Image related operations')
 process_parser = api.parser()
 process_parser.add_argument('images', type=FileStorage, location='files')
+batch_process_parser = api.parser()
+batch_process_parser.add_argument('images', type=FileStorage, location='files', action='append')
+background_parser = api.parser()
+background_parser.add_argument('encoding', type=str, location='args', choices=MASK_ENCODINGS,
+                               help='Mask encoding, chosen from the Accept header when not given')
+background_parser.add_argument('preview', type=inputs.boolean, location='args', default=False,
+                               help='Return the low resolution mask used for interactive previews')
+background_parser.add_argument('preview_size', type=int, location='args',
+                               help='Longest side of a downsampled mask preview [px]')
+# uploads with the same content share the stored file, its thumbnail and its SAM embedding
+content_store = ContentStore()
+# background point edits of one image arrive faster than SAM predicts, only the newest points are predicted
+background_predictions = LatestWinsCoalescer()
+# previews and full masks of one image are predicted separately, but only the newest points of the image are saved
+background_points = LatestWrites()
 
 log = logging.getLogger(__name__)
 
@@ -40,27 +57,72 @@ class Process(Resource):
             return 'No image provided', 400
         image = request.files["image"]
 
-        # save the received images to upload directory
-        if not os.path.exists(flask.current_app.config["UPLOAD_FOLDER"]):
-            log.warning("Upload folder does not exist")
-            os.makedirs(flask.current_app.config["UPLOAD_FOLDER"])
-        filename = secure_filename(image.filename)
-        if not filename:
-            filename = "empty_filename"
-        prefix = (str(int(time.time())) + "_").join(random.choice(string.ascii_letters) for _ in range(8))
-        unique_safe_filename = prefix + "_" + filename
-        dst = os.path.join(flask.current_app.config["UPLOAD_FOLDER"], unique_safe_filename)
-        image.save(dst)
-
-        thumbnail_path = os.path.join(flask.current_app.config["THUMBNAIL_FOLDER"], unique_safe_filename)
-        create_thumbnail(dst, thumbnail_path)
+        dst, thumbnail_path = content_store.save(image, flask.current_app.config["UPLOAD_FOLDER"],
+                                                 flask.current_app.config["THUMBNAIL_FOLDER"])
+        content_store.ensure_thumbnail(dst, thumbnail_path)
 
         # save file location in the db
         image_obj = insert_image(dst, thumbnail_path)
-        _ = sam.calculate_mask(image_obj)
+        # the embedding is computed in the background, the first background request waits for it if needed
+        sam.precompute_embedding(image_obj)
         return image_obj.id, 201
 
 
+@api.route('/upload/batch')
+class BatchProcess(Resource):
+    @api.expect(batch_process_parser)
+    @api.response(201, "Images submitted successfully")
+    @api.response(400, "No images provided")
+    @api.response(413, "Payload too large")
+    def post(self) -> typing.Any:
+        images = request.files.getlist("images")
+        if not images:
+            log.error("No images provided")
+            return 'No images provided', 400
+
+        paths = [content_store.save(image, flask.current_app.config["UPLOAD_FOLDER"],
+                                    flask.current_app.config["THUMBNAIL_FOLDER"]) for image in images]
+        # decoding and resizing happen in PIL without holding the GIL
+        with ThreadPoolExecutor(max_workers=min(THUMBNAIL_WORKERS, len(paths))) as executor:
+            list(executor.map(lambda path: content_store.ensure_thumbnail(*path), paths))
+
+        # save file locations in the db
+        image_objs = bulk_insert_images(paths)
+        for image_obj in image_objs:
+            sam.precompute_embedding(image_obj)
+        log.info("Uploaded %s images", len(image_objs))
+        return [image_obj.id for image_obj in image_objs], 201
+
+
+@api.route('/upload/stats')
+class UploadStats(Resource):
+    @api.response(200, "Upload deduplication statistics")
+    @api.response(401, "Unauthorized")
+    @authentication_required
+    def get(self, _current_user: User) -> typing.Any:
+        return jsonify({'uploads': content_store.stats(), 'sam_embeddings': sam.cache.stats()})
+
+
+@api.route('/<int:image_id>/status')
+class ImageStatus(Resource):
+    @api.doc(params={'image_id': 'The image ID'})
+    @api.response(200, "Image status")
+    @api.response(404, "Image not found")
+    def get(self, image_id: int) -> typing.Any:
+        try:
+            image = get_image_by_id(image_id)
+        except NotFound as e:
+            log.exception("Image %s not found: %s", image_id, e)
+            return 'Image not found', 404
+        return jsonify({'id': image.id, 'embedding': sam.embedding_status(image)})
+
+
+def can_access_image(image: Image, user: User) -> bool:
+    # Original: if images.result.user_id != current_user.id:
+    # Workaround, as images from comparisons don't have a result assigned
+    return not image.result or image.result.user == user
+
+
 @api.route('/<int:image_id>')
 class ImageApi(Resource):
     @api.doc(params={'image_id': 'The image ID'})
@@ -72,9 +134,7 @@ class ImageApi(Resource):
     def get(self, current_user: User, image_id: int) -> typing.Any:
         try:
             image = get_image_by_id(image_id)
-            # Original: if images.result.user_id != current_user.id:
-            # Workaround, as images from comparisons don't have a result assigned
-            if image.result and image.result.user != current_user:
+            if not can_access_image(image, current_user):
                 log.error("User %s is not authorized to access images %s", current_user.id, image_id)
                 return 'Forbidden', 403
         except NotFound as e:
@@ -83,14 +143,48 @@ class ImageApi(Resource):
         return send_file(image.filepath)
 
 
+@api.route('/<int:image_id>/thumbnail')
+class ImageThumbnail(Resource):
+    @api.doc(params={'image_id': 'The image ID'})
+    @api.response(200, "Thumbnail found")
+    @api.response(304, "Thumbnail not modified")
+    @api.response(401, "Unauthorized")
+    @api.response(403, "Forbidden")
+    @api.response(404, "Image or thumbnail not found")
+    @authentication_required
+    def get(self, current_user: User, image_id: int) -> typing.Any:
+        try:
+            image = get_image_by_id(image_id)
+            if not can_access_image(image, current_user):
+                log.error("User %s is not authorized to access thumbnail of image %s", current_user.id, image_id)
+                return 'Forbidden', 403
+        except NotFound as e:
+            log.exception("Image %s not found: %s", image_id, e)
+            return 'Image not found', 404
+        if not image.thumbnail or not os.path.exists(image.thumbnail):
+            log.error("Thumbnail of image %s not found", image_id)
+            return 'Thumbnail not found', 404
+        response = send_file(image.thumbnail, etag=content_store.digest(image.thumbnail), conditional=True,
+                             max_age=THUMBNAIL_MAX_AGE)
+        # the thumbnail of an image never changes, private as the access is checked for each user
+        response.cache_control.public = False
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        return response
+
+
 @api.route('/<int:image_id>/background')
 class BackgroundPoints(Resource):
     @api.doc(params={'image_id': 'The images ID'})
     @api.response(200, "Background points updated")
     @api.response(400, "No points provided")
     @api.response(404, "Image not found")
-    @api.expect(points_model)
+    @api.expect(points_model, background_parser)
     def put(self, image_id: int) -> typing.Any:
+        args = background_parser.parse_args()
+        if args['preview_size'] is not None and args['preview_size'] < 1:
+            log.error("Invalid preview size: %s", args['preview_size'])
+            return 'Preview size must be positive', 400
         points = request.json
         if not points:
             log.error("No points provided")
@@ -104,13 +198,45 @@ class BackgroundPoints(Resource):
             log.exception("Image %s not found: %s", image_id, e)
             return 'Image not found', 404
 
-        # save the points in the db
-        update_background_points(image_id, points)
-        mask = sam.calculate_mask(image).tolist()
-        result = {"mask": mask}
-        result_bytes = json.dumps(result).encode('utf-8')
+        def predict(newest: tuple[int, dict]):
+            ticket, newest_points = newest
+            # save the points in the db, unless a newer request of another mask kind already saved its points
+            background_points.write(image_id, ticket, lambda: update_background_points(image_id, newest_points))
+            if args['preview']:
+                return sam.calculate_preview_mask(image, args['preview_size'])
+            full_mask = sam.calculate_mask(image)
+            if args['preview_size']:
+                return downsample_mask(full_mask, args['preview_size'])
+            return full_mask
+
+        mask = background_predictions.submit((image_id, args['preview'], args['preview_size']),
+                                             (background_points.ticket(), points), predict)
+        log.debug("Background predictions: %s", background_predictions.stats())
+        return mask_response(mask, args['encoding'] or encoding_from_accept(request.accept_mimetypes))
+
+
+@api.route('/background/stats')
+class BackgroundPredictionStats(Resource):
+    @api.response(200, "Background prediction statistics")
+    @api.response(401, "Unauthorized")
+    @authentication_required
+    def get(self, _current_user: User) -> typing.Any:
+        return jsonify(background_predictions.stats())
+
+
+def mask_response(mask, encoding: str) -> Response:
+    height, width = mask.shape
+    if encoding == JSON_ENCODING:
+        result_bytes = json.dumps({"mask": mask.tolist()}).encode('utf-8')
         compressed_result = gzip_compress(result_bytes)
         return Response(compressed_result, 200, headers={'Content-Encoding': 'gzip'}, content_type='application/json')
+    if encoding == RLE_ENCODING:
+        return Response(json.dumps({"mask": encode_rle(mask)}), 200, content_type=RLE_MIMETYPE)
+    if encoding == PNG_ENCODING:
+        return Response(encode_png(mask), 200, content_type=PNG_MIMETYPE)
+    headers = {'X-Mask-Width': str(width), 'X-Mask-Height': str(height),
+               'Access-Control-Expose-Headers': 'X-Mask-Width, X-Mask-Height'}
+    return Response(encode_bits(mask), 200, headers=headers, content_type=BITS_MIMETYPE)
 
 
 @api.route('/<int:image_id>/background/accept')
@@ -7,12 +7,14 @@ from werkzeug.exceptions import NotFound, Forbidden
 
 from objects_counter.api.common import object_grouper
 from objects_counter.api.results.models import insert_result_model
-from objects_counter.api.utils import authentication_required, get_thumbnails, authentication_optional
+from objects_counter.api.utils import authentication_required, get_thumbnails, authentication_optional, page_parser, \
+    parse_page_args, get_thumbnail_manifest
 from objects_counter.db.dataops.dataset import get_dataset_by_id
 from objects_counter.db.dataops.image import serialize_image_as_result, get_images_by_ids, get_image_element_by_id
 from objects_counter.db.dataops.result import get_result_by_id, insert_result
 from objects_counter.db.dataops.result import (get_user_results_serialized, get_user_results,
-                                               rename_classification, delete_result_by_id)
+                                               rename_classification, delete_result_by_id, get_user_results_summary,
+                                               get_user_results_thumbnail_image_ids)
 from objects_counter.db.models import User, ImageElement
 
 api = Namespace('results', description='Results related operations')
@@ -57,6 +59,24 @@ class Results(Resource):
             return Response("Failed to insert result", 500)
 
 
+@api.route('/summary')
+class ResultsSummary(Resource):
+    @api.doc("Page of user's results with classification counts instead of images and elements")
+    @api.expect(page_parser)
+    @api.response(200, 'Success')
+    @api.response(400, 'Invalid page arguments')
+    @api.response(401, 'You must be logged in to access this resource')
+    @authentication_required
+    def get(self, current_user: User) -> typing.Any:
+        """Page of user's results, from the newest"""
+        try:
+            limit, cursor = parse_page_args()
+            return jsonify(get_user_results_summary(current_user, limit, cursor))
+        except ValueError as e:
+            log.error("Invalid page arguments: %s", e)
+            return Response("Invalid page arguments", 400)
+
+
 @api.route('/thumbnails')
 class GetThumbnails(Resource):
     @authentication_required
@@ -66,6 +86,17 @@ class GetThumbnails(Resource):
         return jsonify(thumbnails)
 
 
+@api.route('/thumbnails/manifest')
+class ThumbnailsManifest(Resource):
+    @api.doc("URLs of the thumbnails of user's results, newest first")
+    @api.response(200, 'Success')
+    @api.response(401, 'You must be logged in to access this resource')
+    @authentication_required
+    def get(self, current_user: User) -> typing.Any:
+        """List URLs of user's results thumbnails"""
+        return jsonify(get_thumbnail_manifest(get_user_results_thumbnail_image_ids(current_user)))
+
+
 @api.route('/<int:result_id>')
 class Result(Resource):
     @api.doc(params={'result_id': 'The result ID'})
@@ -6,15 +6,22 @@ from functools import wraps
 from http import HTTPStatus
 
 import jwt
-from flask import request, Response, current_app
+from flask import request, Response, current_app, url_for
+from flask_restx import reqparse
 from jwt import DecodeError
 
-from objects_counter.consts import MAX_DB_STRING_LENGTH, MIN_USERNAME_LENGTH
+from objects_counter.consts import MAX_DB_STRING_LENGTH, MIN_USERNAME_LENGTH, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from objects_counter.db.dataops.user import get_user_by_id
 from objects_counter.db.models import Dataset, Result, Comparison
 
 log = logging.getLogger(__name__)
 
+page_parser = reqparse.RequestParser()
+page_parser.add_argument('limit', type=int, location='args', default=DEFAULT_PAGE_SIZE,
+                         help=f'Number of items on the page, at most {MAX_PAGE_SIZE}')
+page_parser.add_argument('cursor', type=str, location='args',
+                         help='next_cursor of the previous page, the newest items when not given')
+
 
 def authentication_required(f):
     @wraps(f)
@@ -92,6 +99,16 @@ def get_user_from_input(data):
     return username, password
 
 
+def parse_page_args() -> tuple[int, str | None]:
+    """
+    :return: Page size and cursor of a paginated list request
+    """
+    args = page_parser.parse_args()
+    if not 1 <= args['limit'] <= MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    return args['limit'], args['cursor']
+
+
 def gzip_compress(data: bytes) -> bytes:
     buffer = io.BytesIO()
     with gzip.GzipFile(fileobj=buffer, mode='wb') as f:
@@ -113,3 +130,12 @@ def get_thumbnails(collection: list[Dataset | Result | Comparison]) -> list[dict
             'thumbnail': base64_thumbnail.decode('utf-8')
         })
     return thumbnails
+
+
+def get_thumbnail_manifest(thumbnail_image_ids: list[tuple[int, int]]) -> list[dict]:
+    """
+    :param thumbnail_image_ids: Pairs of item ID and the ID of the image shown as its thumbnail
+    :return: URL of each item's thumbnail, served and cached one by one instead of inlined
+    """
+    return [{'id': item_id, 'image_id': image_id, 'url': url_for('api.images_image_thumbnail', image_id=image_id)}
+            for item_id, image_id in thumbnail_image_ids]
@@ -12,7 +12,7 @@ from objects_counter.utils import config_logging, config_db
 config_logging()  # noqa: E402
 SERVICE_MODE = sys.argv[1] != 'run'  # noqa: E402
 if not SERVICE_MODE:
-    from objects_counter.api.common import blueprint, api
+    from objects_counter.api.common import blueprint, api, sam
 from objects_counter.consts import UPLOAD_FOLDER, DB_NAME
 from objects_counter.db.models import db, bcrypt
 
@@ -28,6 +28,7 @@ app.config.from_pyfile('config.py', silent=True)
 
 app.config['UPLOAD_FOLDER'] = os.path.join(app.instance_path, UPLOAD_FOLDER)
 app.config['THUMBNAIL_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'thumbnails')
+app.config['SAM_CACHE_FOLDER'] = os.path.join(app.instance_path, 'sam_cache')
 
 try:
     os.makedirs(app.instance_path)
@@ -47,6 +48,7 @@ except FileExistsError:
 if not SERVICE_MODE:
     api.init_app(app, add_specs=False)
     app.register_blueprint(blueprint)
+    sam.cache.set_spill_folder(app.config['SAM_CACHE_FOLDER'])
 
 config_db(app, DB_NAME)
 bcrypt.init_app(app)
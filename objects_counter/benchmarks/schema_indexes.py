@@ -0,0 +1,127 @@
+"""
+Compares the query plans and execution times of the element schema before and after the integer bounding box
+columns and the foreign key indexes, with EXPLAIN ANALYZE on synthetic data in a local PostgreSQL database.
+Both layouts are created side by side in the schemas legacy and current, which are dropped and recreated.
+
+Run from the repository root: python -m objects_counter.benchmarks.schema_indexes
+The database is taken from BENCHMARK_DATABASE_URL, e.g. postgresql+psycopg2://postgres@localhost:5432/benchmark
+"""
+import os
+from statistics import median
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from objects_counter.db.models import db
+
+DATABASE_URL = os.environ.get('BENCHMARK_DATABASE_URL',
+                              'postgresql+psycopg2://postgres@localhost:5432/objects_counter_benchmark')
+USERS = 50
+DATASETS = 500
+RESULTS = 5_000
+COMPARISONS = 1_000
+IMAGES = 20_000
+ELEMENTS_PER_IMAGE = 15
+CLASSIFICATIONS = 1_000
+REPEATS = 5
+
+# the box columns of each layout, as SQL expressions of the generated coordinates x and y
+BOX_COLUMNS = {
+    'legacy': ('top_left, bottom_right', 'json_build_array(x, y), json_build_array(x + 20, y + 20)'),
+    'current': ('x_min, y_min, x_max, y_max', 'x, y, x + 20, y + 20')
+}
+BOX_FILTERS = {
+    'legacy': "top_left::text = '[100, 200]' AND bottom_right::text = '[120, 220]'",
+    'current': 'x_min = 100 AND y_min = 200 AND x_max = 120 AND y_max = 220'
+}
+QUERIES = {
+    'elements of an image': 'SELECT * FROM image_element WHERE image_id = 4242',
+    'elements by classification': "SELECT * FROM image_element WHERE classification = '421'",
+    'element by bounding box': 'SELECT * FROM image_element WHERE {box_filter}',
+    'images of a result': 'SELECT * FROM image WHERE result_id = 1234',
+    'images of a dataset': 'SELECT * FROM image WHERE dataset_id = 123',
+    'images of a comparison': 'SELECT * FROM image WHERE comparison_id = 321',
+    'datasets of a user': 'SELECT * FROM dataset WHERE user_id = 7',
+    'comparisons of a user': 'SELECT * FROM comparison WHERE user_id = 7',
+    'element boxes of a dataset': 'SELECT image_element.* FROM image_element JOIN image ON image.id = '
+                                  'image_element.image_id WHERE image.dataset_id = 123'
+}
+
+
+def create_schema(connection: Connection, schema: str) -> None:
+    """Creates the tables of the models in the schema, the legacy layout without indexes and with JSON boxes."""
+    connection.execute(text(f'DROP SCHEMA IF EXISTS {schema} CASCADE'))
+    connection.execute(text(f'CREATE SCHEMA {schema}'))
+    db.metadata.create_all(connection.execution_options(schema_translate_map={None: schema}))
+    if schema == 'legacy':
+        for table in db.metadata.tables.values():
+            for index in table.indexes:
+                connection.execute(text(f'DROP INDEX {schema}.{index.name}'))
+        connection.execute(text(f'ALTER TABLE {schema}.image_element DROP COLUMN x_min, DROP COLUMN y_min, '
+                                'DROP COLUMN x_max, DROP COLUMN y_max, ADD COLUMN top_left JSON NOT NULL, '
+                                'ADD COLUMN bottom_right JSON NOT NULL'))
+
+
+def populate(connection: Connection, schema: str) -> None:
+    connection.execute(text(f'SET search_path TO {schema}'))
+    connection.execute(text(f"""INSERT INTO "user" (username, password)
+        SELECT 'user' || i, 'password' FROM generate_series(1, {USERS}) AS i"""))
+    connection.execute(text(f"""INSERT INTO dataset (name, timestamp, unfinished, user_id)
+        SELECT 'dataset' || i, now(), false, 1 + i % {USERS} FROM generate_series(1, {DATASETS}) AS i"""))
+    connection.execute(text(f"""INSERT INTO result (user_id, data, timestamp)
+        SELECT 1 + i % {USERS}, '{{}}', now() FROM generate_series(1, {RESULTS}) AS i"""))
+    connection.execute(text(f"""INSERT INTO comparison (dataset_id, user_id, diff, timestamp)
+        SELECT 1 + i % {DATASETS}, 1 + i % {USERS}, '{{}}', now() FROM generate_series(1, {COMPARISONS}) AS i"""))
+    connection.execute(text(f"""INSERT INTO image (filepath, timestamp, result_id, dataset_id, comparison_id)
+        SELECT 'image' || i || '.png', now(),
+               CASE WHEN i % 3 = 0 THEN 1 + i % {RESULTS} END,
+               CASE WHEN i % 3 = 1 THEN 1 + i % {DATASETS} END,
+               CASE WHEN i % 3 = 2 THEN 1 + i % {COMPARISONS} END
+        FROM generate_series(1, {IMAGES}) AS i"""))
+    box_columns, box_values = BOX_COLUMNS[schema]
+    connection.execute(text(f"""INSERT INTO image_element (image_id, {box_columns}, classification, is_leader)
+        SELECT 1 + i % {IMAGES}, {box_values}, (i % {CLASSIFICATIONS})::text, false
+        FROM (SELECT i, (i * 37) % 4000 AS x, (i * 91) % 3000 AS y
+              FROM generate_series(1, {IMAGES * ELEMENTS_PER_IMAGE}) AS i) AS elements"""))
+    connection.execute(text('ANALYZE'))
+
+
+def explain(connection: Connection, schema: str, query: str) -> tuple[str, float]:
+    """
+    :return: Node types of the plan, outermost first, and the median execution time [ms]
+    """
+    connection.execute(text(f'SET search_path TO {schema}'))
+    query = query.format(box_filter=BOX_FILTERS[schema])
+    times = []
+    plan = None
+    for _ in range(REPEATS):
+        plan = connection.execute(text(f'EXPLAIN (ANALYZE, FORMAT JSON) {query}')).scalar()[0]
+        times.append(plan['Execution Time'])
+    nodes = []
+    node = plan['Plan']
+    while node is not None:
+        nodes.append(node['Node Type'])
+        node = next((child for child in node.get('Plans', []) if child.get('Parent Relationship') != 'Inner'), None)
+    return ' > '.join(nodes), median(times)
+
+
+def main():
+    engine = create_engine(DATABASE_URL)
+    with engine.begin() as connection:
+        for schema in BOX_COLUMNS:
+            create_schema(connection, schema)
+            populate(connection, schema)
+    print(f"{IMAGES} images, {IMAGES * ELEMENTS_PER_IMAGE} elements, median of {REPEATS} runs")
+    print(f"{'query':<28} {'legacy plan':<52} {'[ms]':>8} {'current plan':<52} {'[ms]':>8}")
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            legacy_plan, legacy_time = explain(connection, 'legacy', query)
+            current_plan, current_time = explain(connection, 'current', query)
+            print(f"{name:<28} {legacy_plan:<52} {legacy_time:>8.3f} {current_plan:<52} {current_time:>8.3f}")
+    with engine.begin() as connection:
+        for schema in BOX_COLUMNS:
+            connection.execute(text(f'DROP SCHEMA {schema} CASCADE'))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import os
 
+from image_segmentation.constants import DEFAULT_EMBEDDING_BATCH_SIZE, DEFAULT_FEATURE_CACHE_BYTES, \
+    DEFAULT_SAM_CACHE_BYTES, DEFAULT_SAM_SPILL_BYTES, DEFAULT_SAM_POOL_SIZE, DEFAULT_TILE_OVERLAP
+
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 UPLOAD_FOLDER = 'uploads'
 DB_NAME = 'objects_counter'
@@ -10,4 +13,17 @@ MIN_USERNAME_LENGTH = 4
 MAX_DB_STRING_LENGTH = 255
 SAM_CHECKPOINT = os.environ.get('SAM_CHECKPOINT')
 SAM_MODEL_TYPE = os.environ.get('SAM_MODEL_TYPE', 'vit_h')
+EMBEDDING_BATCH_SIZE = int(os.environ.get('EMBEDDING_BATCH_SIZE', DEFAULT_EMBEDDING_BATCH_SIZE))
+FEATURE_CACHE_BYTES = int(os.environ.get('FEATURE_CACHE_BYTES', DEFAULT_FEATURE_CACHE_BYTES))
+SAM_CACHE_BYTES = int(os.environ.get('SAM_CACHE_BYTES', DEFAULT_SAM_CACHE_BYTES))
+SAM_SPILL_BYTES = int(os.environ.get('SAM_SPILL_BYTES', DEFAULT_SAM_SPILL_BYTES))
+SAM_POOL_SIZE = int(os.environ.get('SAM_POOL_SIZE', DEFAULT_SAM_POOL_SIZE))
+TORCH_THREADS = int(os.environ.get('TORCH_THREADS', 0)) or None
+WORKING_RESOLUTION = int(os.environ.get('WORKING_RESOLUTION', 0)) or None
+TILE_SIZE = int(os.environ.get('TILE_SIZE', 0)) or None
+TILE_OVERLAP = int(os.environ.get('TILE_OVERLAP', DEFAULT_TILE_OVERLAP))
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', os.cpu_count() or 1))
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
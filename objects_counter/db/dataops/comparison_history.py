@@ -2,8 +2,10 @@ import logging
 
 from natsort import natsorted
 from sqlalchemy.exc import DatabaseError
+from sqlalchemy.orm import joinedload, selectinload
 from werkzeug.exceptions import Forbidden, NotFound
 
+from objects_counter.db.dataops.summary import get_page, summarize_images, get_thumbnail_image_ids
 from objects_counter.db.models import Comparison, db, User, Dataset, Image
 
 log = logging.getLogger(__name__)
@@ -24,10 +26,41 @@ def insert_comparison(user: User, dataset: Dataset, images: list[Image], diff: d
 
 
 def get_comparisons_by_user_id(user_id: User) -> list[dict]:
-    comparisons = Comparison.query.filter_by(user_id=user_id).all()
+    """Serializes the user's comparisons and their datasets with a constant number of queries."""
+    comparisons = Comparison.query.filter_by(user_id=user_id).order_by(Comparison.id).options(
+        joinedload(Comparison.user),
+        selectinload(Comparison.images).selectinload(Image.elements),
+        joinedload(Comparison.dataset).joinedload(Dataset.user),
+        joinedload(Comparison.dataset).selectinload(Dataset.images).selectinload(Image.elements)
+    ).all()
     return [comparison.as_dict() for comparison in comparisons]
 
 
+def get_comparisons_summary_by_user_id(user_id: int, limit: int, cursor: str | None = None) -> dict:
+    """
+    Page of the user's comparisons from the newest, with the dataset's name instead of the whole dataset and
+    without images and elements, only their counts.
+    :return: Summaries of the comparisons and the cursor of the next page
+    """
+    query = Comparison.query.filter_by(user_id=user_id).options(joinedload(Comparison.dataset))
+    comparisons, next_cursor = get_page(query, Comparison, limit, cursor)
+    summaries = summarize_images(Image.comparison_id, [comparison.id for comparison in comparisons])
+    return {
+        'items': [{
+            'id': comparison.id,
+            'dataset': {'id': comparison.dataset.id, 'name': comparison.dataset.name},
+            'diff': comparison.diff,
+            'timestamp': comparison.timestamp,
+            **summaries[comparison.id]
+        } for comparison in comparisons],
+        'next_cursor': next_cursor
+    }
+
+
+def get_comparisons_thumbnail_image_ids_by_user_id(user_id: int) -> list[tuple[int, int]]:
+    return get_thumbnail_image_ids(Comparison, Image.comparison_id, user_id)
+
+
 def get_comparison_by_id(comparison_id: int) -> Comparison:
     return Comparison.query.filter_by(id=comparison_id).one_or_404()
 
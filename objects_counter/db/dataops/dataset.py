@@ -1,11 +1,13 @@
 import logging
 
 from sqlalchemy.exc import DatabaseError
+from sqlalchemy.orm import joinedload, selectinload
 from werkzeug.exceptions import Forbidden
 
 from image_segmentation.object_classification.classifier import ObjectClassifier
 from objects_counter.db.dataops.image import get_image_by_id, update_element_classification_by_id, set_element_as_leader
-from objects_counter.db.models import User, Dataset, db
+from objects_counter.db.dataops.summary import get_page, summarize_images, get_thumbnail_image_ids
+from objects_counter.db.models import User, Dataset, db, Image
 
 log = logging.getLogger(__name__)
 
@@ -47,13 +49,40 @@ def get_user_datasets(user: User) -> list[Dataset]:
 
 
 def get_user_datasets_serialized(user: User) -> list[dict]:
-    datasets = get_user_datasets(user)
+    """Serializes the user's datasets with a constant number of queries, whatever the number of images."""
+    datasets = Dataset.query.filter_by(user_id=user.id).order_by(Dataset.id).options(
+        joinedload(Dataset.user),
+        selectinload(Dataset.images).selectinload(Image.elements)
+    ).all()
     serialized_datasets = []
     for dataset in datasets:
         serialized_datasets.append(dataset.as_dict())
     return serialized_datasets
 
 
+def get_user_datasets_summary(user: User, limit: int, cursor: str | None = None) -> dict:
+    """
+    Page of the user's datasets from the newest, without images and elements, only their counts.
+    :return: Summaries of the datasets and the cursor of the next page
+    """
+    datasets, next_cursor = get_page(Dataset.query.filter_by(user_id=user.id), Dataset, limit, cursor)
+    summaries = summarize_images(Image.dataset_id, [dataset.id for dataset in datasets])
+    return {
+        'items': [{
+            'id': dataset.id,
+            'name': dataset.name,
+            'unfinished': dataset.unfinished,
+            'timestamp': dataset.timestamp,
+            **summaries[dataset.id]
+        } for dataset in datasets],
+        'next_cursor': next_cursor
+    }
+
+
+def get_user_datasets_thumbnail_image_ids(user: User) -> list[tuple[int, int]]:
+    return get_thumbnail_image_ids(Dataset, Image.dataset_id, user.id)
+
+
 def get_dataset_by_id(dataset_id: int) -> Dataset:
     return Dataset.query.filter_by(id=dataset_id).one_or_404()
 
@@ -0,0 +1,70 @@
+import logging
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DatabaseError
+
+from objects_counter.db.models import db, Image, ImageElement, ImageElementFeatures
+
+log = logging.getLogger(__name__)
+
+EMBEDDING_DTYPE = np.dtype('<f2')
+HISTOGRAM_DTYPE = np.dtype('<f4')
+
+
+def get_element_features(element_ids: list[int]) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+    """
+    :param element_ids: IDs of the elements to look up
+    :return: Flat embedding and histogram arrays of the elements which have stored features, keyed by element ID
+    """
+    if not element_ids:
+        return {}
+    rows = ImageElementFeatures.query.filter(ImageElementFeatures.element_id.in_(element_ids)).all()
+    return {
+        row.element_id: (np.frombuffer(row.embedding, dtype=EMBEDDING_DTYPE),
+                         np.frombuffer(row.histogram, dtype=HISTOGRAM_DTYPE))
+        for row in rows
+    }
+
+
+def bulk_set_element_features(features: dict[int, tuple[np.ndarray, np.ndarray]], do_commit: bool = True) -> None:
+    """
+    Stores the embeddings and histograms keyed by element ID, replacing previously stored ones.
+    The embeddings are stored as EMBEDDING_DTYPE and the histograms as HISTOGRAM_DTYPE.
+    """
+    if not features:
+        return
+    statement = insert(ImageElementFeatures).values([
+        {
+            'element_id': element_id,
+            'embedding': np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes(),
+            'histogram': np.asarray(histogram, dtype=HISTOGRAM_DTYPE).tobytes()
+        }
+        for element_id, (embedding, histogram) in features.items()
+    ])
+    statement = statement.on_conflict_do_update(index_elements=[ImageElementFeatures.element_id], set_={
+        'embedding': statement.excluded.embedding,
+        'histogram': statement.excluded.histogram
+    })
+    db.session.execute(statement)
+    if do_commit:
+        try:
+            db.session.commit()
+        except DatabaseError as e:
+            log.exception('Failed to store element features: %s', e)
+            db.session.rollback()
+            raise
+
+
+def delete_element_features_by_image(image: Image, do_commit: bool = True) -> None:
+    element_ids = select(ImageElement.id).where(ImageElement.image_id == image.id)
+    ImageElementFeatures.query.filter(ImageElementFeatures.element_id.in_(element_ids)).delete(
+        synchronize_session=False)
+    if do_commit:
+        try:
+            db.session.commit()
+        except DatabaseError as e:
+            log.exception('Failed to delete element features: %s', e)
+            db.session.rollback()
+            raise
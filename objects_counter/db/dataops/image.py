@@ -1,19 +1,26 @@
 import logging
 
 from natsort import natsorted
+from sqlalchemy import column, Float, insert, Integer, String, update, values
 from sqlalchemy.exc import DatabaseError
 
+from objects_counter.db.dataops.element_features import delete_element_features_by_image
 from objects_counter.db.models import db, Image, ImageElement
 
 log = logging.getLogger(__name__)
 
 
-def insert_image(filepath: str, thumbnail_path: str) -> Image:
+def _new_image(filepath: str, thumbnail_path: str) -> Image:
     image = Image(filepath=filepath, thumbnail=thumbnail_path)
     image.background_points = {"data": [{
         "position": [0, 0],
         "positive": False
     }]}
+    return image
+
+
+def insert_image(filepath: str, thumbnail_path: str) -> Image:
+    image = _new_image(filepath, thumbnail_path)
     db.session.add(image)
     try:
         db.session.commit()
@@ -24,6 +31,23 @@ def insert_image(filepath: str, thumbnail_path: str) -> Image:
         raise
 
 
+def bulk_insert_images(paths: list[tuple[str, str]]) -> list[Image]:
+    """
+    Inserts all images in one transaction.
+    :param paths: Pairs of image file path and thumbnail path
+    :return: The inserted images, in the order of the paths
+    """
+    images = [_new_image(filepath, thumbnail_path) for filepath, thumbnail_path in paths]
+    db.session.add_all(images)
+    try:
+        db.session.commit()
+        return images
+    except DatabaseError as e:
+        log.exception('Failed to insert images: %s', e)
+        db.session.rollback()
+        raise
+
+
 def get_images() -> list[Image]:
     return Image.query.all()
 
@@ -60,9 +84,16 @@ def delete_image_by_id(image_id: int) -> None:
 
 
 def bulk_set_elements(image: Image, elements: list[tuple[tuple[int, int], tuple[int, int]]]) -> None:
+    """Replaces the elements of the image in one transaction, with one DELETE and one multi-row INSERT."""
+    delete_element_features_by_image(image, do_commit=False)
     delete_elements_by_image(image, do_commit=False)
-    for element in elements:
-        insert_element(image, element[0], element[1], do_commit=False)
+    if elements:
+        db.session.execute(insert(ImageElement).values([
+            {'image_id': image.id, 'x_min': x_min, 'y_min': y_min, 'x_max': x_max, 'y_max': y_max}
+            for (x_min, y_min), (x_max, y_max) in elements
+        ]))
+    # the elements were written past the session, image.elements has to be loaded again
+    db.session.expire(image, ['elements'])
     try:
         db.session.commit()
     except DatabaseError as e:
@@ -72,8 +103,8 @@ def bulk_set_elements(image: Image, elements: list[tuple[tuple[int, int], tuple[
 
 
 def delete_elements_by_image(image: Image, do_commit: bool = True) -> None:
-    for element in image.elements:
-        db.session.delete(element)
+    ImageElement.query.filter(ImageElement.image_id == image.id).delete(synchronize_session=False)
+    db.session.expire(image, ['elements'])
     if do_commit:
         try:
             db.session.commit()
@@ -126,8 +157,9 @@ def update_background_points(image_id: int, points: dict) -> None:
 
 def update_element_classification(bounding_box: tuple[tuple[int, int], tuple[int, int]], classification: str,
                                   certainty: float) -> None:
-    ImageElement.query.filter(ImageElement.top_left == bounding_box[0],
-                              ImageElement.bottom_right == bounding_box[1]).update(
+    (x_min, y_min), (x_max, y_max) = bounding_box
+    ImageElement.query.filter(ImageElement.x_min == x_min, ImageElement.y_min == y_min,
+                              ImageElement.x_max == x_max, ImageElement.y_max == y_max).update(
         {'classification': classification, 'certainty': certainty})
     try:
         db.session.commit()
@@ -150,19 +182,49 @@ def update_element_classification_by_id(element_id: int, classification: str, ce
 
 
 def bulk_update_element_classification_by_id(classifications: list[dict]) -> None:
+    """
+    :param classifications: Client input, a name and a list of element IDs for each classification
+    :raises ValueError: When a name is missing or an element ID is not an integer
+    """
+    element_classifications = {}
     for classification in classifications:
+        if not isinstance(classification, dict):
+            raise ValueError('Classification must be an object')
         name = classification.get('name')
         if not name:
             raise ValueError('Classification name is required')
         elements = classification.get('elements', [])
+        if not isinstance(elements, list):
+            raise ValueError('Classification elements must be a list')
         for element_id in elements:
-            update_element_classification_by_id(element_id, name, 1., do_commit=False)
-    try:
-        db.session.commit()
-    except DatabaseError as e:
-        log.exception('Failed to update element classifications: %s', e)
-        db.session.rollback()
-        raise
+            if not isinstance(element_id, int) or isinstance(element_id, bool):
+                raise ValueError(f'Invalid element ID: {element_id!r}')
+            element_classifications[element_id] = (name, 1.)
+    bulk_update_element_classifications(element_classifications)
+
+
+def bulk_update_element_classifications(classifications: dict[int, tuple[str, float]],
+                                        do_commit: bool = True) -> None:
+    """
+    Updates the classification and certainty of many elements with a single UPDATE ... FROM (VALUES ...).
+    :param classifications: Classification and certainty keyed by element ID
+    """
+    if classifications:
+        rows = values(column('id', Integer), column('classification', String), column('certainty', Float),
+                      name='classifications').data([
+                          (int(element_id), classification, float(certainty))
+                          for element_id, (classification, certainty) in classifications.items()
+                      ])
+        db.session.execute(update(ImageElement).where(ImageElement.id == rows.c.id).values(
+            classification=rows.c.classification, certainty=rows.c.certainty
+        ), execution_options={'synchronize_session': False})
+    if do_commit:
+        try:
+            db.session.commit()
+        except DatabaseError as e:
+            log.exception('Failed to update element classifications: %s', e)
+            db.session.rollback()
+            raise
 
 
 def set_element_as_leader(element_id: int, image: Image, do_commit: bool = False) -> None:
@@ -1,9 +1,11 @@
 import logging
 
 from sqlalchemy.exc import DatabaseError
+from sqlalchemy.orm import joinedload, selectinload
 from werkzeug.exceptions import Forbidden
 
 from objects_counter.db.dataops.image import serialize_image_as_result
+from objects_counter.db.dataops.summary import get_page, summarize_images, get_thumbnail_image_ids
 from objects_counter.db.models import Result, db, User, Image
 
 log = logging.getLogger(__name__)
@@ -33,13 +35,34 @@ def get_user_results(user: User) -> list[Result]:
 
 
 def get_user_results_serialized(user: User) -> list[dict]:
-    results = get_user_results(user)
+    """Serializes the user's results with a constant number of queries, whatever the number of images."""
+    results = Result.query.filter_by(user_id=user.id).order_by(Result.id).options(
+        joinedload(Result.user),
+        selectinload(Result.images).selectinload(Image.elements)
+    ).all()
     results_list = []
     for result in results:
         results_list.append(result.as_dict())
     return results_list
 
 
+def get_user_results_summary(user: User, limit: int, cursor: str | None = None) -> dict:
+    """
+    Page of the user's results from the newest, without images and elements, only their counts.
+    :return: Summaries of the results and the cursor of the next page
+    """
+    results, next_cursor = get_page(Result.query.filter_by(user_id=user.id), Result, limit, cursor)
+    summaries = summarize_images(Image.result_id, [result.id for result in results])
+    return {
+        'items': [{'id': result.id, 'timestamp': result.timestamp, **summaries[result.id]} for result in results],
+        'next_cursor': next_cursor
+    }
+
+
+def get_user_results_thumbnail_image_ids(user: User) -> list[tuple[int, int]]:
+    return get_thumbnail_image_ids(Result, Image.result_id, user.id)
+
+
 def get_result_by_id(result_id: int) -> Result:
     return Result.query.filter_by(id=result_id).one_or_404()
 
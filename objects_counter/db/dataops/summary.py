@@ -0,0 +1,84 @@
+import datetime
+
+from natsort import natsorted
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import InstrumentedAttribute, Query
+
+from objects_counter.db.models import db, Image, ImageElement
+
+CURSOR_SEPARATOR = ','
+
+
+def encode_cursor(item) -> str:
+    return f'{item.timestamp.isoformat()}{CURSOR_SEPARATOR}{item.id}'
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    """
+    :param cursor: Cursor returned with the previous page
+    :return: Timestamp and ID of the last item of the previous page
+    """
+    try:
+        timestamp, item_id = cursor.rsplit(CURSOR_SEPARATOR, 1)
+        return datetime.datetime.fromisoformat(timestamp), int(item_id)
+    except ValueError as e:
+        raise ValueError(f'Invalid cursor: {cursor}') from e
+
+
+def get_page(query: Query, model, limit: int, cursor: str | None) -> tuple[list, str | None]:
+    """
+    Keyset pagination from the newest item, on (timestamp, id).
+    :param query: Items to paginate, usually filtered by user
+    :param model: Model of the items, with timestamp and id columns
+    :param limit: Maximum number of items on the page
+    :param cursor: Cursor of the previous page, the first page when not given
+    :return: Items of the page and cursor of the next page, None on the last page
+    """
+    if cursor is not None:
+        query = query.filter(tuple_(model.timestamp, model.id) < tuple_(*decode_cursor(cursor)))
+    items = query.order_by(model.timestamp.desc(), model.id.desc()).limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+    return items[:limit], encode_cursor(items[limit - 1])
+
+
+def get_thumbnail_image_ids(model, image_owner: InstrumentedAttribute, user_id: int) -> list[tuple[int, int]]:
+    """
+    Finds the image shown as thumbnail of each of the user's items with one query.
+    :param model: Model of the items, with user_id, timestamp and id columns
+    :param image_owner: Foreign key of Image pointing to the items, e.g. Image.result_id
+    :return: Pairs of item ID and thumbnail image ID, newest item first, items without images are left out
+    """
+    return db.session.query(model.id, func.min(Image.id)).join(Image, image_owner == model.id).filter(
+        model.user_id == user_id).group_by(model.id, model.timestamp).order_by(
+        model.timestamp.desc(), model.id.desc()).all()
+
+
+def summarize_images(image_owner: InstrumentedAttribute, owner_ids: list[int]) -> dict[int, dict]:
+    """
+    Counts the images and the elements of each classification with two aggregate queries, whatever the number of
+    items, images and elements.
+    :param image_owner: Foreign key of Image pointing to the items, e.g. Image.result_id
+    :param owner_ids: IDs of the items
+    :return: Image count, ID of the image to show as thumbnail and element counts by classification, keyed by item ID
+    """
+    summaries = {owner_id: {'image_count': 0, 'thumbnail_image_id': None, 'element_count': 0, 'classifications': []}
+                 for owner_id in owner_ids}
+    if not owner_ids:
+        return summaries
+    image_rows = db.session.query(image_owner, func.count(Image.id), func.min(Image.id)).filter(
+        image_owner.in_(owner_ids)).group_by(image_owner)
+    for owner_id, image_count, thumbnail_image_id in image_rows:
+        summaries[owner_id]['image_count'] = image_count
+        summaries[owner_id]['thumbnail_image_id'] = thumbnail_image_id
+
+    element_rows = db.session.query(image_owner, ImageElement.classification, func.count(ImageElement.id)).join(
+        Image, Image.id == ImageElement.image_id).filter(image_owner.in_(owner_ids)).group_by(
+        image_owner, ImageElement.classification)
+    for owner_id, classification, count in element_rows:
+        summaries[owner_id]['element_count'] += count
+        if classification is not None:
+            summaries[owner_id]['classifications'].append({'name': classification, 'count': count})
+    for summary in summaries.values():
+        summary['classifications'] = natsorted(summary['classifications'], key=lambda item: item['name'])
+    return summaries
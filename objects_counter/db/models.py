@@ -14,11 +14,12 @@ class Image(db.Model):
     thumbnail = db.Column(db.String(255), nullable=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=db.func.now())
     background_points = db.Column(db.JSON, nullable=True)
-    result_id = db.Column(db.Integer, db.ForeignKey('result.id', ondelete="CASCADE"), nullable=True)
+    result_id = db.Column(db.Integer, db.ForeignKey('result.id', ondelete="CASCADE"), nullable=True, index=True)
     result = db.relationship('Result', backref='images')
-    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id', ondelete="CASCADE"), nullable=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id', ondelete="CASCADE"), nullable=True, index=True)
     dataset = db.relationship('Dataset', backref='images')
-    comparison_id = db.Column(db.Integer, db.ForeignKey('comparison.id', ondelete="CASCADE"), nullable=True)
+    comparison_id = db.Column(db.Integer, db.ForeignKey('comparison.id', ondelete="CASCADE"), nullable=True,
+                              index=True)
     comparison = db.relationship('Comparison', backref='images')
 
     def as_dict(self):
@@ -33,14 +34,32 @@ class Image(db.Model):
 class ImageElement(db.Model):
     __tablename__ = 'image_element'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    image_id = db.Column(db.Integer, db.ForeignKey(Image.id, ondelete="CASCADE"), nullable=False)
-    top_left = db.Column(db.JSON, nullable=False)
-    bottom_right = db.Column(db.JSON, nullable=False)
-    classification = db.Column(db.String(255), nullable=True)
+    image_id = db.Column(db.Integer, db.ForeignKey(Image.id, ondelete="CASCADE"), nullable=False, index=True)
+    x_min = db.Column(db.Integer, nullable=False)
+    y_min = db.Column(db.Integer, nullable=False)
+    x_max = db.Column(db.Integer, nullable=False)
+    y_max = db.Column(db.Integer, nullable=False)
+    classification = db.Column(db.String(255), nullable=True, index=True)
     certainty = db.Column(db.Float, nullable=True)
     image = db.relationship('Image', backref='elements')
     is_leader = db.Column(db.Boolean, nullable=False, default=False)
 
+    @property
+    def top_left(self) -> list[int]:
+        return [self.x_min, self.y_min]
+
+    @top_left.setter
+    def top_left(self, point: tuple[int, int]) -> None:
+        self.x_min, self.y_min = point
+
+    @property
+    def bottom_right(self) -> list[int]:
+        return [self.x_max, self.y_max]
+
+    @bottom_right.setter
+    def bottom_right(self, point: tuple[int, int]) -> None:
+        self.x_max, self.y_max = point
+
     def as_dict(self):
         return {
             'id': self.id,
@@ -51,6 +70,13 @@ class ImageElement(db.Model):
         }
 
 
+class ImageElementFeatures(db.Model):
+    __tablename__ = 'image_element_features'
+    element_id = db.Column(db.Integer, db.ForeignKey(ImageElement.id, ondelete="CASCADE"), primary_key=True)
+    embedding = db.Column(db.LargeBinary, nullable=False)
+    histogram = db.Column(db.LargeBinary, nullable=False)
+
+
 class User(db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -60,6 +86,8 @@ class User(db.Model):
 
 class Result(db.Model):
     __tablename__ = 'result'
+    # keyset pagination of the user's results from the newest
+    __table_args__ = (db.Index('ix_result_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     user_id = db.Column(db.Integer, db.ForeignKey(User.id), nullable=True)
     data = db.Column(db.JSON, nullable=False)
@@ -78,6 +106,8 @@ class Result(db.Model):
 
 class Dataset(db.Model):
     __tablename__ = 'dataset'
+    # keyset pagination of the user's datasets from the newest
+    __table_args__ = (db.Index('ix_dataset_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(255), nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, default=db.func.now())
@@ -99,6 +129,8 @@ class Dataset(db.Model):
 
 class Comparison(db.Model):
     __tablename__ = 'comparison'
+    # keyset pagination of the user's comparisons from the newest
+    __table_args__ = (db.Index('ix_comparison_user_id_timestamp_id', 'user_id', 'timestamp', 'id'),)
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id', ondelete='CASCADE'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
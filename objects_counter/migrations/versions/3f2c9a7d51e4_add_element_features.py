@@ -0,0 +1,30 @@
+"""Add stored element features
+
+Revision ID: 3f2c9a7d51e4
+Revises: 84a25d5d5551
+Create Date: 2026-10-18 10:12:41.204513
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '3f2c9a7d51e4'
+down_revision = '84a25d5d5551'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('image_element_features',
+                    sa.Column('element_id', sa.Integer(), nullable=False),
+                    sa.Column('embedding', sa.LargeBinary(), nullable=False),
+                    sa.Column('histogram', sa.LargeBinary(), nullable=False),
+                    sa.ForeignKeyConstraint(['element_id'], ['image_element.id'],
+                                            'fk_image_element_features_element_id_image_element', ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('element_id')
+                    )
+
+
+def downgrade():
+    op.drop_table('image_element_features')
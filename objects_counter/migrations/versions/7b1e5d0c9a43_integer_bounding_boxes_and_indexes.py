@@ -0,0 +1,54 @@
+"""Integer bounding boxes and foreign key indexes
+
+Revision ID: 7b1e5d0c9a43
+Revises: 3f2c9a7d51e4
+Create Date: 2026-10-18 16:05:12.381940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '7b1e5d0c9a43'
+down_revision = '3f2c9a7d51e4'
+branch_labels = None
+depends_on = None
+
+BOX_COLUMNS = [('x_min', 'top_left', 0), ('y_min', 'top_left', 1), ('x_max', 'bottom_right', 0),
+               ('y_max', 'bottom_right', 1)]
+INDEXES = [('image_element', 'image_id'), ('image_element', 'classification'), ('image', 'result_id'),
+           ('image', 'dataset_id'), ('image', 'comparison_id'), ('result', 'user_id'), ('dataset', 'user_id'),
+           ('comparison', 'user_id')]
+
+
+def upgrade():
+    with op.batch_alter_table('image_element', schema=None) as batch_op:
+        for column, _, _ in BOX_COLUMNS:
+            batch_op.add_column(sa.Column(column, sa.Integer(), nullable=True))
+    op.execute('UPDATE image_element SET ' + ', '.join(
+        f"{column} = round(({json_column} ->> {position})::numeric)" for column, json_column, position in BOX_COLUMNS
+    ))
+    with op.batch_alter_table('image_element', schema=None) as batch_op:
+        for column, _, _ in BOX_COLUMNS:
+            batch_op.alter_column(column, nullable=False)
+        batch_op.drop_column('top_left')
+        batch_op.drop_column('bottom_right')
+
+    for table, column in INDEXES:
+        op.create_index(f'ix_{table}_{column}', table, [column], unique=False)
+
+
+def downgrade():
+    for table, column in INDEXES:
+        op.drop_index(f'ix_{table}_{column}', table_name=table)
+
+    with op.batch_alter_table('image_element', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('top_left', sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column('bottom_right', sa.JSON(), nullable=True))
+    op.execute('UPDATE image_element SET top_left = json_build_array(x_min, y_min), '
+               'bottom_right = json_build_array(x_max, y_max)')
+    with op.batch_alter_table('image_element', schema=None) as batch_op:
+        batch_op.alter_column('top_left', nullable=False)
+        batch_op.alter_column('bottom_right', nullable=False)
+        for column, _, _ in BOX_COLUMNS:
+            batch_op.drop_column(column)
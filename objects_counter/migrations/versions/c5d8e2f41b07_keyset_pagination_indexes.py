@@ -0,0 +1,29 @@
+"""Keyset pagination indexes
+
+Revision ID: c5d8e2f41b07
+Revises: 7b1e5d0c9a43
+Create Date: 2026-10-18 18:41:37.522106
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'c5d8e2f41b07'
+down_revision = '7b1e5d0c9a43'
+branch_labels = None
+depends_on = None
+
+TABLES = ['result', 'dataset', 'comparison']
+
+
+def upgrade():
+    # the user's items are listed from the newest, the user_id indexes are prefixes of the new ones
+    for table in TABLES:
+        op.create_index(f'ix_{table}_user_id_timestamp_id', table, ['user_id', 'timestamp', 'id'], unique=False)
+        op.drop_index(f'ix_{table}_user_id', table_name=table)
+
+
+def downgrade():
+    for table in TABLES:
+        op.create_index(f'ix_{table}_user_id', table, ['user_id'], unique=False)
+        op.drop_index(f'ix_{table}_user_id_timestamp_id', table_name=table)
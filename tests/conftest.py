@@ -0,0 +1,64 @@
+import importlib
+from types import SimpleNamespace
+from unittest import mock
+
+import jwt
+import pytest
+from flask import Flask
+
+from image_segmentation.object_classification import feature_extraction
+from image_segmentation.object_detection import object_segmentation
+from image_segmentation.object_detection.embedding_cache import EmbeddingCache
+from objects_counter.db.models import db, User
+
+
+def import_api():
+    """
+    Imports the API with the models replaced, objects_counter.api.common loads them when it is imported.
+    :return: The objects_counter.api.common module
+    """
+    def new_segmentation(*_args, **_kwargs):
+        return SimpleNamespace(cache=EmbeddingCache(0), precompute_embedding=lambda image: None)
+
+    with mock.patch.object(object_segmentation, 'ObjectSegmentation', new_segmentation), \
+            mock.patch.object(feature_extraction, 'FeatureSimilarity', lambda **_kwargs: None):
+        importlib.import_module('objects_counter.api')
+    return importlib.import_module('objects_counter.api.common')
+
+
+# before the test modules, which import parts of the API
+api_common = import_api()
+
+
+@pytest.fixture(name='app')
+def app_fixture():
+    """Application with the models created in an in-memory SQLite database."""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(name='client')
+def client_fixture(app):
+    """Test client of the application with the API registered."""
+    app.register_blueprint(api_common.blueprint)
+    return app.test_client()
+
+
+@pytest.fixture(name='user')
+def user_fixture(app) -> User:  # pylint: disable=unused-argument
+    user = User(username='user', password='password')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+@pytest.fixture(name='auth_headers')
+def auth_headers_fixture(app, user) -> dict:
+    return {'Authorization': jwt.encode({'user_id': user.id}, app.config['SECRET_KEY'], algorithm='HS256')}
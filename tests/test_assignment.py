@@ -0,0 +1,52 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from image_segmentation.object_classification.assignment import assign_expected_categories, OPTIMAL_ASSIGNMENT, \
+    GREEDY_ASSIGNMENT
+
+
+def total_margin(probabilities, assignment) -> float:
+    return sum(element[category] - min(element.values())
+               for element, category in zip(probabilities, assignment) if category is not None)
+
+
+def test_optimal_assignment_beats_greedy():
+    # the greedy method gives a its best margin and leaves b to an element which does not fit it
+    probabilities = [{'a': 0.9, 'b': 0.8, 'c': 0.0}, {'a': 0.85, 'b': 0.0, 'c': 0.0}]
+    expected = {'a': 1, 'b': 1, 'c': 0}
+    greedy = assign_expected_categories(probabilities, ['a', 'b', 'c'], expected, method=GREEDY_ASSIGNMENT)
+    optimal = assign_expected_categories(probabilities, ['a', 'b', 'c'], expected, method=OPTIMAL_ASSIGNMENT)
+    assert greedy == ['a', 'b']
+    assert optimal == ['b', 'a']
+    assert total_margin(probabilities, optimal) > total_margin(probabilities, greedy)
+
+
+@pytest.mark.parametrize('method', [OPTIMAL_ASSIGNMENT, GREEDY_ASSIGNMENT])
+def test_expected_counts_are_met(method):
+    rng = np.random.default_rng(1)
+    categories = ['a', 'b', 'c']
+    probabilities = [dict(zip(categories, row)) for row in rng.random((7, 3)).tolist()]
+    assignment = assign_expected_categories(probabilities, categories, {'a': 2, 'b': 1, 'c': 2}, method=method)
+    assert [assignment.count(category) for category in categories + [None]] == [2, 1, 2, 2]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_optimal_assignment_maximizes_total_margin(seed):
+    rng = np.random.default_rng(seed)
+    categories = ['a', 'b']
+    probabilities = [dict(zip(categories, row)) for row in rng.random((5, 2)).tolist()]
+    expected = {'a': 2, 'b': 2}
+    optimal = assign_expected_categories(probabilities, categories, expected)
+    greedy = assign_expected_categories(probabilities, categories, expected, method=GREEDY_ASSIGNMENT)
+    best = max(total_margin(probabilities, assignment)
+               for assignment in itertools.product(categories + [None], repeat=len(probabilities))
+               if all(assignment.count(category) <= expected[category] for category in categories))
+    assert total_margin(probabilities, optimal) == pytest.approx(best)
+    assert total_margin(probabilities, optimal) >= total_margin(probabilities, greedy) - 1e-12
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError):
+        assign_expected_categories([], ['a'], {'a': 0}, method='random')
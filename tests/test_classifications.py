@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+from image_segmentation.object_classification import classifier as classifier_module
+from image_segmentation.object_classification.classifier import ObjectClassifier
+from objects_counter.db.dataops import image as image_dataops
+from objects_counter.db.dataops.image import bulk_update_element_classification_by_id
+
+# element id -> similarity to the other elements, 1 and 2 are alike, 3 is different
+SIMILARITY = {frozenset({1, 2}): 0.9, frozenset({1, 3}): 0.1, frozenset({2, 3}): 0.2}
+
+
+def new_element(element_id: int) -> SimpleNamespace:
+    return SimpleNamespace(id=element_id, classification=None, certainty=None)
+
+
+@pytest.fixture(name='stored')
+def stored_fixture(monkeypatch) -> list[dict]:
+    stored = []
+    monkeypatch.setattr(classifier_module, 'bulk_update_element_classifications', stored.append)
+    monkeypatch.setattr(image_dataops, 'bulk_update_element_classifications', stored.append)
+    return stored
+
+
+@pytest.fixture(name='classifier')
+def classifier_fixture(monkeypatch) -> ObjectClassifier:
+    classifier = ObjectClassifier(None, None, None)
+
+    def calculate_similarity(element, other, _color_weight=None):
+        if element.id == other.id:
+            return 1
+        # a commit in the middle of grouping expires the elements, the attributes read back the stored values
+        for expired in (element, other):
+            expired.classification, expired.certainty = None, None
+        return SIMILARITY[frozenset({element.id, other.id})]
+
+    monkeypatch.setattr(classifier, 'calculate_similarity', calculate_similarity)
+    return classifier
+
+
+def test_grouping_keeps_assignments_in_one_update(classifier, stored):
+    elements = [new_element(element_id) for element_id in (1, 2, 3)]
+    classifier.assign_categories_based_on_similarity(elements, None, threshold=0.7, color_weight=0.5)
+    assert stored == [{1: ('1', 1.0), 2: ('1', 0.9), 3: ('2', 1.0)}]
+
+
+def test_grouping_with_representatives(classifier, stored):
+    elements = [new_element(element_id) for element_id in (1, 2, 3)]
+    classifier.assign_categories_based_on_similarity(elements, [elements[2], elements[0]], threshold=0.7,
+                                                     color_weight=0.5)
+    assert stored == [{3: ('1', 1.0), 1: ('2', 1.0), 2: ('2', 0.9)}]
+
+
+def test_element_ids_are_validated(stored):
+    bulk_update_element_classification_by_id([{'name': 'a', 'elements': [1, 2]}, {'name': 'b', 'elements': [3]}])
+    assert stored == [{1: ('a', 1.), 2: ('a', 1.), 3: ('b', 1.)}]
+
+
+@pytest.mark.parametrize('classifications', [
+    [{'name': 'a', 'elements': ['x']}],
+    [{'name': 'a', 'elements': [None]}],
+    [{'name': 'a', 'elements': [1.5]}],
+    [{'name': 'a', 'elements': [True]}],
+    [{'name': 'a', 'elements': 1}],
+    [{'elements': [1]}],
+    ['a'],
+])
+def test_invalid_classifications_are_rejected(classifications, stored):
+    with pytest.raises(ValueError):
+        bulk_update_element_classification_by_id(classifications)
+    assert not stored
@@ -0,0 +1,136 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import torch
+
+from image_segmentation.object_classification import classifier as classifier_module
+from image_segmentation.object_classification.classifier import ObjectClassifier
+from image_segmentation.object_classification.feature_extraction import ColorSimilarity
+from objects_counter.db.dataops.element_features import EMBEDDING_DTYPE, HISTOGRAM_DTYPE
+
+BINS = len(ColorSimilarity.ISCC_NBS_CENTROIDS_LUV)
+EMBEDDING_SIZE = 8
+
+
+def element_features(element_id: int) -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(element_id)
+    histogram = rng.random(BINS)
+    return rng.standard_normal(EMBEDDING_SIZE).astype(np.float32), histogram / histogram.sum()
+
+
+def new_elements(*element_ids: int) -> list[SimpleNamespace]:
+    return [SimpleNamespace(id=element_id, classification=None) for element_id in element_ids]
+
+
+def stored_features(element_id: int) -> tuple[np.ndarray, np.ndarray]:
+    """Features of the element at the precision they are stored at"""
+    embedding, histogram = element_features(element_id)
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE), np.asarray(histogram, dtype=HISTOGRAM_DTYPE)
+
+
+@pytest.fixture(name='stored')
+def stored_fixture(monkeypatch) -> dict[int, tuple[np.ndarray, np.ndarray]]:
+    """Stored features, elements 1 to 3 have them at first"""
+    stored = {element_id: stored_features(element_id) for element_id in (1, 2, 3)}
+
+    def set_features(features, do_commit=True):
+        # a commit in the middle of classification would expire every loaded element
+        assert not do_commit
+        stored.update({element_id: (np.asarray(embedding, dtype=EMBEDDING_DTYPE).copy(),
+                                    np.asarray(histogram, dtype=HISTOGRAM_DTYPE).copy())
+                       for element_id, (embedding, histogram) in features.items()})
+
+    monkeypatch.setattr(classifier_module, 'get_element_features',
+                        lambda element_ids: {element_id: stored[element_id]
+                                             for element_id in element_ids if element_id in stored})
+    monkeypatch.setattr(classifier_module, 'bulk_set_element_features', set_features)
+    return stored
+
+
+def new_classifier(monkeypatch) -> ObjectClassifier:
+    """Classifier with an empty feature cache, missing features are computed by a fake processor."""
+    classifier = ObjectClassifier(None, SimpleNamespace(device='cpu'), ColorSimilarity())
+    classifier.processed = []
+
+    class Processor:
+        def __init__(self, *_models):
+            pass
+
+        @staticmethod
+        def process_image_elements(elements):
+            classifier.processed.append([element.id for element in elements])
+            features = [element_features(element.id) for element in elements]
+            return torch.from_numpy(np.stack([embedding for embedding, _ in features])), \
+                np.stack([histogram for _, histogram in features])
+
+    monkeypatch.setattr(classifier_module, 'ImageElementProcessor', Processor)
+    return classifier
+
+
+@pytest.fixture(name='classifier')
+def classifier_fixture(monkeypatch, stored) -> ObjectClassifier:  # pylint: disable=unused-argument
+    return new_classifier(monkeypatch)
+
+
+def test_stored_features_are_not_computed_again(classifier, stored):
+    embeddings, histograms = classifier.process_elements(new_elements(4, 1, 5, 2))
+    assert classifier.processed == [[4, 5]]
+    assert set(stored) == {1, 2, 3, 4, 5}
+    for row, element_id in enumerate((4, 1, 5, 2)):
+        embedding, histogram = stored_features(element_id)
+        assert torch.equal(embeddings[row], torch.from_numpy(embedding.astype(np.float32)))
+        assert np.array_equal(histograms[row], histogram.astype(np.float64))
+        assert np.array_equal(stored[element_id][0], embedding)
+
+
+def test_fresh_and_stored_features_classify_the_same(monkeypatch, stored):
+    dataset_elements = new_elements(1, 2, 3)
+    for element, category in zip(dataset_elements, ('a', 'b', 'a')):
+        element.classification = category
+    dataset = SimpleNamespace(preprocessed=True, elements=dataset_elements, categories=['a', 'b'])
+    elements = new_elements(4, 5, 6, 7)
+
+    fresh = new_classifier(monkeypatch)
+    fresh_classifications = fresh.classify_image_elements_based_on_dataset(elements, dataset)
+    assert fresh.processed == [[4, 5, 6, 7]]
+    assert set(stored) == {1, 2, 3, 4, 5, 6, 7}
+    loading = new_classifier(monkeypatch)
+    assert loading.classify_image_elements_based_on_dataset(elements, dataset) == fresh_classifications
+    assert not loading.processed
+
+
+def test_features_are_served_from_cache(classifier):
+    classifier.get_features(new_elements(1, 4))
+    embeddings, _ = classifier.get_features(new_elements(6, 4, 1))
+    assert classifier.processed == [[4], [6]]
+    assert classifier.feature_cache.stats()['hits'] == 2
+    assert torch.equal(embeddings[1], torch.from_numpy(stored_features(4)[0].astype(np.float32)))
+
+
+def test_similarity_matrix_matches_pairs(classifier):
+    elements_i, elements_j = new_elements(1, 2, 4, 5), new_elements(2, 3, 6)
+    matrix = classifier.calculate_similarity_matrix(elements_i, elements_j)
+    expected = [[classifier.calculate_similarity(element_i, element_j) for element_j in elements_j]
+                for element_i in elements_i]
+    assert matrix.shape == (4, 3)
+    assert matrix[1, 0] == 1
+    # float32 embeddings, the matrix product sums in a different order than the pairwise cosine similarity
+    np.testing.assert_allclose(matrix, expected, atol=1e-6)
+
+
+def test_dataset_classification_matches_pairs(classifier):
+    dataset_elements = new_elements(1, 2, 3, 4, 5)
+    for element, category in zip(dataset_elements, ('a', 'b', 'a', 'c', 'b')):
+        element.classification = category
+    dataset = SimpleNamespace(preprocessed=True, elements=dataset_elements, categories=['a', 'b', 'c'])
+    elements = new_elements(6, 7, 2)
+
+    classifications = classifier.classify_image_elements_based_on_dataset(elements, dataset)
+    for element, classification in zip(elements, classifications):
+        means = {category: np.mean([classifier.calculate_similarity(element, other)
+                                    for other in dataset_elements if other.classification == category])
+                 for category in dataset.categories}
+        assert [category for category, _ in classification] == sorted(means, key=means.get, reverse=True)
+        for category, mean in classification:
+            assert mean == pytest.approx(means[category], abs=1e-6)
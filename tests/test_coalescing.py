@@ -0,0 +1,105 @@
+import threading
+import time
+
+from objects_counter.api.images.coalescing import LatestWinsCoalescer, LatestWrites
+
+TIMEOUT = 5
+
+
+def test_single_request_computes_its_payload():
+    coalescer = LatestWinsCoalescer()
+    assert coalescer.submit('a', 2, lambda payload: payload * 10) == 20
+    assert coalescer.stats() == {'pending': 0, 'requests': 1, 'computations': 1, 'skipped': 0}
+    assert not coalescer.slots
+
+
+def test_queued_requests_get_the_newest_result():
+    coalescer = LatestWinsCoalescer()
+    started, release = threading.Event(), threading.Event()
+    computed = []
+
+    def compute(payload):
+        computed.append(payload)
+        if payload == 'first':
+            started.set()
+            assert release.wait(TIMEOUT)
+        return payload.upper()
+
+    results = {}
+
+    def request(payload):
+        results[payload] = coalescer.submit('image', payload, compute)
+
+    first = threading.Thread(target=request, args=('first',))
+    first.start()
+    assert started.wait(TIMEOUT)
+    queued = [threading.Thread(target=request, args=(payload,)) for payload in ('second', 'third', 'fourth')]
+    for thread in queued:
+        thread.start()
+        # the payloads arrive in order
+        while coalescer.stats()['pending'] < 2 + queued.index(thread):
+            time.sleep(0.001)
+    release.set()
+    for thread in [first] + queued:
+        thread.join(TIMEOUT)
+
+    # the stale payloads are never computed
+    assert computed == ['first', 'fourth']
+    assert results == {'first': 'FIRST', 'second': 'FOURTH', 'third': 'FOURTH', 'fourth': 'FOURTH'}
+    assert coalescer.stats() == {'pending': 0, 'requests': 4, 'computations': 2, 'skipped': 2}
+
+
+def test_keys_are_independent():
+    coalescer = LatestWinsCoalescer()
+    assert coalescer.submit('a', 1, lambda payload: payload) == 1
+    assert coalescer.submit('b', 2, lambda payload: payload) == 2
+    assert coalescer.stats()['computations'] == 2
+
+
+def test_failed_computation_is_not_shared():
+    coalescer = LatestWinsCoalescer()
+
+    def fail(_payload):
+        raise RuntimeError("failed")
+
+    try:
+        coalescer.submit('a', 1, fail)
+    except RuntimeError:
+        pass
+    assert coalescer.submit('a', 2, lambda payload: payload) == 2
+    assert not coalescer.slots
+
+
+def test_older_request_does_not_overwrite_newer_write():
+    writes = LatestWrites()
+    values = {}
+    older, newer = writes.ticket(), writes.ticket()
+    assert writes.write('image', newer, lambda: values.update(image='newer'))
+    # the older request, e.g. a full mask queued behind another one, reaches its write last
+    assert not writes.write('image', older, lambda: values.update(image='older'))
+    assert values == {'image': 'newer'}
+    assert writes.write('other', older, lambda: values.update(other='older'))
+    assert values == {'image': 'newer', 'other': 'older'}
+
+
+def test_failed_write_does_not_block_older_writes():
+    writes = LatestWrites()
+    values = {}
+    older, newer = writes.ticket(), writes.ticket()
+
+    def fail():
+        raise RuntimeError("failed")
+
+    try:
+        writes.write('image', newer, fail)
+    except RuntimeError:
+        pass
+    assert writes.write('image', older, lambda: values.update(image='older'))
+    assert values == {'image': 'older'}
+
+
+def test_background_stats_require_authentication(client, auth_headers):
+    assert client.get('/api/images/background/stats').status_code == 401
+    response = client.get('/api/images/background/stats', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['pending'] == 0
@@ -0,0 +1,25 @@
+import cv2
+import numpy as np
+from PIL import Image as PILImage
+
+from image_segmentation.object_classification.feature_extraction import ColorSimilarity
+
+
+def test_lookup_table_matches_closest_centroid():
+    colors = np.random.default_rng(0).integers(0, 256, (2000, 3), dtype=np.uint8)
+    colors = np.concatenate([colors, [[0, 0, 0], [255, 255, 255], [255, 0, 0]]]).astype(np.uint8)
+    luv = cv2.cvtColor((colors.astype(np.float32) / 255.0)[np.newaxis], cv2.COLOR_RGB2Luv)[0]
+    distances = np.sqrt(((luv[:, np.newaxis] - ColorSimilarity.ISCC_NBS_CENTROIDS_LUV[np.newaxis]) ** 2).sum(axis=-1))
+    table = ColorSimilarity.get_bin_lookup_table()
+    assert table.shape == (256, 256, 256)
+    assert np.array_equal(table[colors[:, 0], colors[:, 1], colors[:, 2]], np.argmin(distances, axis=1))
+    assert ColorSimilarity.get_bin_lookup_table() is table
+
+
+def test_histogram_ignores_white_background():
+    image = np.full((16, 16, 3), 255, dtype=np.uint8)
+    image[:8] = [185, 50, 66]
+    histogram = ColorSimilarity.get_histogram(PILImage.fromarray(image))
+    assert np.isclose(histogram.sum(), 1)
+    # red is the second ISCC-NBS bin, resizing blends a few pixels at the edge of the background
+    assert np.argmax(histogram) == 1 and histogram[1] > 0.9
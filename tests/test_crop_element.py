@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from PIL import Image as PILImage
+
+from image_segmentation.utils import crop_element
+
+BOXES = [
+    ((2, 3), (10, 12)),
+    ((0, 0), (16, 20)),
+    ((1.4, 2.6), (7.5, 9.49)),
+    ((-4, -3), (5, 6)),
+    ((10, 15), (25, 30)),
+    ((-5, -5), (30, 30)),
+    ((20, 25), (24, 28)),
+]
+
+
+@pytest.mark.parametrize('top_left, bottom_right', BOXES)
+@pytest.mark.parametrize('channels', [(), (3,)])
+def test_crop_element_matches_pil_crop(top_left, bottom_right, channels):
+    image = np.random.default_rng(0).integers(1, 256, (20, 16) + channels, dtype=np.uint8)
+    expected = PILImage.fromarray(image).crop((*top_left, *bottom_right))
+    cropped = crop_element(image, top_left, bottom_right)
+    assert cropped.mode == expected.mode
+    assert cropped.size == expected.size
+    assert np.array_equal(np.array(cropped), np.array(expected))
+
+
+def test_crop_element_rejects_inverted_box():
+    with pytest.raises(ValueError):
+        crop_element(np.zeros((20, 16), dtype=np.uint8), (8, 8), (4, 12))
@@ -0,0 +1,45 @@
+# pylint: disable=protected-access
+import os
+
+import numpy as np
+import torch
+
+from image_segmentation.object_detection.embedding_cache import EmbeddingCache, ImageCache
+
+
+def new_entry(value: float) -> ImageCache:
+    return ImageCache(torch.full((1, 4, 8, 8), value, dtype=torch.float32), (64, 64), (64, 64))
+
+
+def test_evicted_embedding_is_memory_mapped_back(tmp_path, monkeypatch):
+    entry_bytes = new_entry(0).nbytes
+    cache = EmbeddingCache(entry_bytes, 10 * entry_bytes)
+    cache.set_spill_folder(str(tmp_path))
+    cache.put('a.png', new_entry(1.))
+    cache.put('b.png', new_entry(2.))
+    assert 'a.png' in cache.spilled and 'a.png' not in cache.entries
+
+    loaded = []
+    load = np.load
+    monkeypatch.setattr(np, 'load', lambda *args, **kwargs: loaded.append(load(*args, **kwargs)) or loaded[-1])
+    entry = cache.get('a.png')
+    assert isinstance(loaded[0], np.memmap)
+    # the tensor uses the mapping, nothing is copied
+    assert entry.features.data_ptr() == loaded[0].ctypes.data
+    assert torch.equal(entry.features, new_entry(1.).features)
+    assert cache.stats()['spill_hits'] == 1
+
+
+def test_set_spill_folder_only_removes_spilled_embeddings(tmp_path):
+    cache = EmbeddingCache(0, 10 * new_entry(0).nbytes)
+    cache.set_spill_folder(str(tmp_path))
+    cache.put('a.png', new_entry(1.))
+    cache.put('b.png', new_entry(2.))
+    spilled_path = cache._spill_path('a.png')
+    assert os.path.exists(spilled_path)
+    (tmp_path / 'notes.txt').write_text('kept')
+    (tmp_path / 'folder').mkdir()
+
+    EmbeddingCache(0).set_spill_folder(str(tmp_path))
+    assert not os.path.exists(spilled_path)
+    assert sorted(os.listdir(tmp_path)) == ['folder', 'notes.txt']
@@ -0,0 +1,57 @@
+import numpy as np
+import torch
+
+from image_segmentation.object_classification.feature_cache import FeatureCache
+
+# 4 float32 embedding values and 2 float64 histogram bins
+ROW_BYTES = 4 * 4 + 2 * 8
+
+
+def features(*element_ids: int) -> tuple[torch.Tensor, np.ndarray]:
+    values = np.array(element_ids, dtype=np.float64)[:, np.newaxis]
+    return torch.from_numpy(np.repeat(values, 4, axis=1)).float(), np.repeat(values, 2, axis=1)
+
+
+def cached_ids(cache: FeatureCache, element_ids: list[int]) -> list[int]:
+    positions, embeddings, histograms = cache.get(element_ids)
+    ids = [element_ids[position] for position in positions]
+    if ids:
+        # every element keeps its own row
+        assert embeddings[:, 0].tolist() == ids and histograms[:, 0].tolist() == ids
+    return ids
+
+
+def test_least_recently_used_elements_are_evicted():
+    cache = FeatureCache(3 * ROW_BYTES)
+    cache.put([1, 2, 3], *features(1, 2, 3))
+    assert cache.capacity == 3
+    assert cached_ids(cache, [1]) == [1]
+    cache.put([4], *features(4))
+    assert cached_ids(cache, [1, 2, 3, 4]) == [1, 3, 4]
+    cache.put([5, 6], *features(5, 6))
+    assert cached_ids(cache, [1, 2, 3, 4, 5, 6]) == [4, 5, 6]
+    assert cache.stats()['evictions'] == 3
+    assert cache.stats()['bytes'] <= cache.max_bytes
+
+
+def test_only_the_last_elements_are_kept_when_they_do_not_fit():
+    cache = FeatureCache(2 * ROW_BYTES)
+    cache.put([1, 2, 3, 4], *features(1, 2, 3, 4))
+    assert len(cache) == 2
+    assert cached_ids(cache, [1, 2, 3, 4]) == [3, 4]
+
+
+def test_cached_element_is_updated_in_place():
+    cache = FeatureCache(3 * ROW_BYTES)
+    cache.put([1, 2], *features(1, 2))
+    embeddings, histograms = features(1)
+    cache.put([1], embeddings, histograms)
+    assert len(cache) == 2 and cache.stats()['evictions'] == 0
+    assert cached_ids(cache, [2, 1]) == [2, 1]
+
+
+def test_zero_budget_caches_nothing():
+    cache = FeatureCache(0)
+    cache.put([1], *features(1))
+    assert not cache and cached_ids(cache, [1]) == []
+    assert cache.stats()['misses'] == 1
@@ -0,0 +1,72 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image as PILImage
+from werkzeug.datastructures import MIMEAccept
+
+from objects_counter.api.images.mask_encoding import encode_rle, encode_png, encode_bits, downsample_mask, \
+    encoding_from_accept, JSON_ENCODING, RLE_ENCODING, PNG_ENCODING, BITS_ENCODING
+
+MASKS = [
+    np.random.default_rng(0).random((37, 53)) > 0.5,
+    np.zeros((4, 9), dtype=bool),
+    np.ones((5, 8), dtype=bool),
+    np.eye(16, 3, dtype=bool),
+    np.array([[True]]),
+]
+
+
+def decode_rle(encoded: dict) -> np.ndarray:
+    height, width = encoded['size']
+    values = np.arange(len(encoded['counts'])) % 2 == 1
+    return np.repeat(values, encoded['counts']).reshape((height, width), order='F')
+
+
+@pytest.mark.parametrize('mask', MASKS)
+def test_rle_round_trip(mask):
+    encoded = encode_rle(mask)
+    assert encoded['size'] == list(mask.shape)
+    assert sum(encoded['counts']) == mask.size
+    # runs alternate, only the first one can be empty
+    assert all(count > 0 for count in encoded['counts'][1:])
+    assert np.array_equal(decode_rle(encoded), mask)
+
+
+@pytest.mark.parametrize('mask', MASKS)
+def test_png_round_trip(mask):
+    with PILImage.open(io.BytesIO(encode_png(mask))) as image:
+        assert image.mode == '1'
+        assert np.array_equal(np.array(image), mask)
+
+
+@pytest.mark.parametrize('mask', MASKS)
+def test_bits_round_trip(mask):
+    encoded = encode_bits(mask)
+    height, width = mask.shape
+    assert len(encoded) == height * ((width + 7) // 8)
+    bits = np.frombuffer(encoded, dtype=np.uint8).reshape((height, -1))
+    assert np.array_equal(np.unpackbits(bits, axis=1, count=width).astype(bool), mask)
+
+
+def test_downsample_mask():
+    mask = np.zeros((400, 200), dtype=bool)
+    mask[100:300, 50:150] = True
+    small = downsample_mask(mask, 100)
+    assert small.shape == (100, 50)
+    assert small[25:75, 13:37].all() and not small[:24].any()
+    assert downsample_mask(mask, 400) is mask
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('application/vnd.coco-rle+json', RLE_ENCODING),
+    ('image/png', PNG_ENCODING),
+    ('application/octet-stream', BITS_ENCODING),
+    ('application/json', JSON_ENCODING),
+    ('*/*', JSON_ENCODING),
+    ('image/png;q=0.5, application/octet-stream', BITS_ENCODING),
+])
+def test_encoding_from_accept(accept, encoding):
+    values = [(value.split(';')[0].strip(), float(value.split('q=')[1]) if 'q=' in value else 1)
+              for value in accept.split(',')]
+    assert encoding_from_accept(MIMEAccept(values)) == encoding
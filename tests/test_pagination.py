@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+
+from objects_counter.db.dataops.summary import get_page, decode_cursor, encode_cursor
+from objects_counter.db.models import db, Result, Image, ImageElement
+
+START = datetime.datetime(2025, 5, 6, 12, 30)
+
+
+@pytest.fixture(name='results')
+def results_fixture(user) -> list[Result]:
+    """Results of the user, several of them share a timestamp, newest first"""
+    results = [Result(user=user, data={}, timestamp=START + datetime.timedelta(minutes=minute))
+               for minute in (0, 1, 1, 1, 2, 3, 3, 5)]
+    db.session.add_all(results)
+    db.session.commit()
+    return sorted(results, key=lambda result: (result.timestamp, result.id), reverse=True)
+
+
+def test_cursor_round_trip(results):
+    assert decode_cursor(encode_cursor(results[0])) == (results[0].timestamp, results[0].id)
+
+
+@pytest.mark.parametrize('cursor', ['', 'abc', '2025-05-06T12:30:00', '2025-05-06T12:30:00,x', 'x,1'])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 8, 20])
+def test_pages_cover_results_once_in_order(results, user, limit):
+    pages = []
+    cursor = None
+    while True:
+        items, cursor = get_page(Result.query.filter_by(user_id=user.id), Result, limit, cursor)
+        pages.append(items)
+        if cursor is None:
+            break
+    assert all(len(page) == limit for page in pages[:-1]) and 0 < len(pages[-1]) <= limit
+    assert [result.id for page in pages for result in page] == [result.id for result in results]
+
+
+def test_summary_endpoint(client, auth_headers, results):
+    image = Image(filepath='image.png', result=results[0])
+    elements = [ImageElement(image=image, top_left=(i, i), bottom_right=(i + 1, i + 1), classification=name)
+                for i, name in enumerate(['10', '2', '2'])]
+    db.session.add_all([image, *elements])
+    db.session.commit()
+
+    response = client.get('/api/results/summary?limit=3', headers=auth_headers)
+    assert response.status_code == 200
+    items = response.json['items']
+    assert [item['id'] for item in items] == [result.id for result in results[:3]]
+    assert items[0]['image_count'] == 1 and items[0]['element_count'] == 3
+    assert items[0]['classifications'] == [{'name': '2', 'count': 2}, {'name': '10', 'count': 1}]
+    assert items[1]['image_count'] == 0 and items[1]['thumbnail_image_id'] is None
+
+    following = client.get('/api/results/summary', query_string={'limit': 3, 'cursor': response.json['next_cursor']},
+                           headers=auth_headers)
+    assert [item['id'] for item in following.json['items']] == [result.id for result in results[3:6]]
+
+
+@pytest.mark.parametrize('query', ['limit=0', 'limit=1000', 'cursor=invalid'])
+def test_summary_endpoint_rejects_invalid_page(client, auth_headers, results, query):  # pylint: disable=unused-argument
+    assert client.get(f'/api/results/summary?{query}', headers=auth_headers).status_code == 400
@@ -0,0 +1,116 @@
+# pylint: disable=protected-access
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+import torch
+
+from image_segmentation.object_detection import object_segmentation
+from image_segmentation.object_detection.object_segmentation import ObjectSegmentation, EMBEDDING_QUEUED, \
+    EMBEDDING_READY
+
+TIMEOUT = 5
+
+
+class FakeSam(SimpleNamespace):
+    def __init__(self):
+        super().__init__(image_encoder=SimpleNamespace(img_size=1024))
+
+    def to(self, _device):
+        return self
+
+    def eval(self):
+        return self
+
+
+def wait_until(condition) -> None:
+    deadline = time.monotonic() + TIMEOUT
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture(name='segmentation')
+def segmentation_fixture(request, monkeypatch):
+    """Segmentation with a fake encoder, one predictor context unless the test passes another pool size."""
+    monkeypatch.setitem(object_segmentation.sam_model_registry, 'vit_h', lambda checkpoint: FakeSam())
+    segmentation = ObjectSegmentation('unused', pool_size=getattr(request, 'param', 1))
+    encoded = []
+
+    def set_image(predictor, image_data):
+        encoded.append(image_data)
+        predictor.features = torch.zeros(1, 4, 2, 2)
+        predictor.original_size = image_data.shape[:2]
+        predictor.input_size = image_data.shape[:2]
+        predictor.is_image_set = True
+
+    for context in segmentation.pool.contexts:
+        context.predictor.set_image = lambda image_data, predictor=context.predictor: set_image(predictor, image_data)
+    segmentation.encoded = encoded
+    yield segmentation
+    segmentation.precompute_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def test_request_takes_over_precompute_waiting_for_context(segmentation):
+    image = SimpleNamespace(filepath='b.png')
+    image_data = torch.zeros(8, 8, 3).numpy()
+    pool = segmentation.pool
+    finished = threading.Event()
+
+    def request():
+        with pool.checkout(image.filepath,
+                           prerequisite=lambda: segmentation._wait_for_precompute(image.filepath)) as context:
+            segmentation._set_image(context, image.filepath, image_data)
+        finished.set()
+
+    with pool.checkout('a.png'):
+        # the precompute of b has started, but waits for the only context
+        segmentation.precompute_embedding(image)
+        wait_until(segmentation.precomputing[image.filepath].future.running)
+        assert segmentation.embedding_status(image) == EMBEDDING_QUEUED
+        thread = threading.Thread(target=request, daemon=True)
+        thread.start()
+        # the request waits for the context as well, ahead of the precompute
+        wait_until(lambda: pool.waiting_requests == 1)
+    assert finished.wait(TIMEOUT), "the request deadlocked with the precompute"
+    thread.join(TIMEOUT)
+    segmentation.precompute_executor.submit(lambda: None).result(TIMEOUT)
+    assert len(segmentation.encoded) == 1
+    assert segmentation.embedding_status(image) == EMBEDDING_READY
+    assert not pool.waiting_requests and len(pool.free) == 1
+
+
+@pytest.mark.parametrize('segmentation', [2], indirect=True)
+def test_request_waits_for_running_precompute(segmentation):
+    image = SimpleNamespace(filepath='b.png')
+    image_data = torch.zeros(8, 8, 3).numpy()
+    pool = segmentation.pool
+    release, entered, finished = threading.Event(), threading.Event(), threading.Event()
+    original_set_image = segmentation._set_image
+
+    def slow_set_image(context, filepath, data=None):
+        assert release.wait(TIMEOUT)
+        original_set_image(context, filepath, image_data if data is None else data)
+
+    def request():
+        with pool.checkout(image.filepath,
+                           prerequisite=lambda: segmentation._wait_for_precompute(image.filepath)) as context:
+            entered.set()
+            original_set_image(context, image.filepath, image_data)
+        finished.set()
+
+    segmentation._set_image = slow_set_image
+    segmentation.precompute_embedding(image)
+    wait_until(lambda: segmentation.precomputing[image.filepath].started)
+    thread = threading.Thread(target=request, daemon=True)
+    thread.start()
+    wait_until(lambda: pool.waiting_requests == 1)
+    # the second context is free, only the running precompute holds the request back
+    assert not entered.wait(0.2)
+    assert pool.waiting_requests == 1 and len(pool.free) == 1
+    release.set()
+    assert finished.wait(TIMEOUT)
+    thread.join(TIMEOUT)
+    assert len(segmentation.encoded) == 1
+    assert image.filepath not in segmentation.precomputing
@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import pytest
+from sqlalchemy import event
+
+from objects_counter.db.dataops.comparison_history import get_comparisons_by_user_id
+from objects_counter.db.dataops.dataset import get_user_datasets_serialized
+from objects_counter.db.dataops.result import get_user_results_serialized
+from objects_counter.db.models import db, User, Dataset, Result, Comparison, Image, ImageElement
+
+IMAGES_PER_ITEM = 3
+ELEMENTS_PER_IMAGE = 5
+SERIALIZATIONS = {
+    'results': (get_user_results_serialized, 3),
+    'datasets': (get_user_datasets_serialized, 3),
+    'comparisons': (lambda user: get_comparisons_by_user_id(user.id), 5)
+}
+
+
+@contextmanager
+def count_queries() -> Iterator[list[str]]:
+    """Collects the statements executed by the session's engine inside the block."""
+    statements = []
+
+    def collect(_connection, _cursor, statement, _parameters, _context, _executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', collect)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', collect)
+
+
+def new_images(count: int) -> list[Image]:
+    images = [Image(filepath=f'image{i}.png') for i in range(count)]
+    for image in images:
+        image.elements = [ImageElement(top_left=(j, j), bottom_right=(j + 10, j + 10), classification=str(j % 2))
+                          for j in range(ELEMENTS_PER_IMAGE)]
+        db.session.add_all(image.elements)
+    db.session.add_all(images)
+    return images
+
+
+def populate(size: int) -> int:
+    """Creates a user with size datasets, results and comparisons, each with its own images and elements."""
+    user = User(username=f'user{size}', password='password')
+    db.session.add(user)
+    for i in range(size):
+        dataset = Dataset(name=f'dataset{i}', user=user, images=new_images(IMAGES_PER_ITEM))
+        db.session.add_all([dataset, Result(user=user, data={}, images=new_images(IMAGES_PER_ITEM)),
+                            Comparison(user=user, dataset=dataset, diff={}, images=new_images(IMAGES_PER_ITEM))])
+    db.session.commit()
+    return user.id
+
+
+def measure(user_id: int, serialize: Callable[[User], list]) -> tuple[int, list]:
+    """Counts the queries of one serialization, starting from an empty session with only the user loaded."""
+    db.session.remove()
+    user = db.session.get(User, user_id)
+    with count_queries() as statements:
+        serialized = serialize(user)
+    return len(statements), serialized
+
+
+@pytest.mark.parametrize('name', SERIALIZATIONS)
+def test_serialization_queries_do_not_grow_with_data(app, name):  # pylint: disable=unused-argument
+    serialize, max_queries = SERIALIZATIONS[name]
+    small_user_id, large_user_id = populate(2), populate(20)
+    small_count, small = measure(small_user_id, serialize)
+    large_count, large = measure(large_user_id, serialize)
+    assert (len(small), len(large)) == (2, 20)
+    assert all(len(item['images']) == IMAGES_PER_ITEM for item in large)
+    assert small_count == large_count <= max_queries
@@ -0,0 +1,104 @@
+# pylint: disable=protected-access
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from image_segmentation.object_detection import object_segmentation
+from image_segmentation.object_detection.object_segmentation import ObjectSegmentation
+from image_segmentation.object_detection.tiling import Tile, split_axis, split_into_tiles
+
+
+@pytest.mark.parametrize('length, tile_size, overlap', [
+    (100, 100, 10), (101, 100, 10), (1000, 256, 64), (1000, 256, 0), (777, 300, 299), (50, 100, 20)
+])
+def test_split_axis_covers_length(length, tile_size, overlap):
+    segments = split_axis(length, tile_size, overlap)
+    assert segments[0][0] == 0 and segments[-1][1] == length
+    # the cores partition the axis
+    assert segments[0][2] == 0 and segments[-1][3] == length
+    for (start, end, core_start, core_end), following in zip(segments, segments[1:] + [None]):
+        assert end - start == min(tile_size, length)
+        assert start <= core_start < core_end <= end
+        if following is not None:
+            assert end - following[0] >= overlap
+            assert following[2] == core_end
+
+
+def test_split_axis_segments():
+    assert split_axis(80, 100, 20) == [(0, 80, 0, 80)]
+    # the last segment is aligned with the end, its core starts in the middle of the larger overlap
+    assert split_axis(250, 100, 0) == [(0, 100, 0, 100), (100, 200, 100, 175), (150, 250, 175, 250)]
+
+
+@pytest.mark.parametrize('tile_size, overlap', [(100, 100), (100, 150)])
+def test_split_axis_rejects_overlap_not_smaller_than_tile(tile_size, overlap):
+    with pytest.raises(ValueError):
+        split_axis(1000, tile_size, overlap)
+
+
+def test_tiles_partition_image():
+    height, width = 700, 1000
+    covered = [[0] * width for _ in range(height)]
+    for tile in split_into_tiles(height, width, 300, 50):
+        for y in range(tile.core_y0, tile.core_y1):
+            for x in range(tile.core_x0, tile.core_x1):
+                covered[y][x] += 1
+    assert all(count == 1 for row in covered for count in row)
+
+
+@pytest.mark.parametrize('tile_size, tile_overlap', [(128, 128), (64, 128)])
+def test_segmentation_rejects_overlap_not_smaller_than_tile(tile_size, tile_overlap):
+    with pytest.raises(ValueError):
+        ObjectSegmentation('unused', tile_size=tile_size, tile_overlap=tile_overlap)
+
+
+def test_prompts_from_mask_are_inside_their_regions():
+    tile = Tile(100, 0, 300, 200, 100, 0, 300, 200)
+    # working scale 0.5, the object covers the top left quarter of the tile
+    mask = np.ones((100, 200), dtype=bool)
+    mask[0:50, 50:100] = False
+    (background, background_label), (element, element_label) = \
+        ObjectSegmentation._prompts_from_mask(mask, tile, 0.5)
+    assert background_label and not element_label
+    assert mask[background[1] // 2, (tile.x0 + background[0]) // 2]
+    assert not mask[element[1] // 2, (tile.x0 + element[0]) // 2]
+
+
+def test_tile_without_background_has_no_prompts():
+    tile = Tile(0, 0, 100, 100, 0, 0, 100, 100)
+    assert not ObjectSegmentation._prompts_from_mask(np.zeros((100, 100), dtype=bool), tile, 1)
+
+
+def test_every_tile_is_segmented_with_prompts(monkeypatch):
+    # only the tiling attributes are needed, no model is loaded
+    segmentation = ObjectSegmentation.__new__(ObjectSegmentation)
+    segmentation.tile_size, segmentation.tile_overlap = 100, 20
+    segmentation.pool = SimpleNamespace(contexts=[None, None], stats=dict)
+    # one background point, in the first tile only
+    monkeypatch.setattr(object_segmentation, 'get_background_points', lambda image: ([[5, 5]], [True]))
+    # the whole image is too coarse to see the small objects
+    monkeypatch.setattr(segmentation, 'calculate_mask',
+                        lambda image, image_data, output_size: np.ones(output_size, dtype=bool))
+    lock = threading.Lock()
+    prompted = {}
+
+    def calculate_tile_mask(_filepath, _image_data, tile, prompts, _scale):
+        with lock:
+            prompted[tile] = prompts
+        # a small object in the middle of every tile
+        mask = np.ones((tile.y1 - tile.y0, tile.x1 - tile.x0), dtype=bool)
+        mask[45:55, 45:55] = False
+        return mask
+
+    monkeypatch.setattr(segmentation, '_calculate_tile_mask', calculate_tile_mask)
+    image_data = np.zeros((180, 260, 3), dtype=np.uint8)
+    merged = segmentation._calculate_tiled_mask(SimpleNamespace(id=1, filepath='image.png'), image_data, 1)
+
+    tiles = split_into_tiles(180, 260, 100, 20)
+    assert set(prompted) == set(tiles)
+    assert prompted[tiles[0]] == [([5, 5], True)]
+    assert all(prompts and prompts[0][1] for prompts in prompted.values())
+    # the small objects found in the tiles are in the merged mask
+    assert (~merged).sum() == 100 * len(tiles)
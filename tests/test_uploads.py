@@ -0,0 +1,59 @@
+import io
+import os
+
+import pytest
+from PIL import Image as PILImage
+from werkzeug.datastructures import FileStorage
+
+from objects_counter.api.images.content_store import ContentStore
+
+
+class FailingStream(io.BytesIO):
+    def read(self, size=-1):
+        if self.tell():
+            raise OSError("connection reset")
+        return super().read(size)
+
+
+def test_identical_uploads_share_the_stored_file(tmp_path):
+    store = ContentStore()
+    first, thumbnail = store.save(FileStorage(io.BytesIO(b'image'), 'a.PNG'), str(tmp_path), 'thumbnails')
+    second, _ = store.save(FileStorage(io.BytesIO(b'image'), 'b.png'), str(tmp_path), 'thumbnails')
+    assert first == second and os.path.basename(thumbnail) == os.path.basename(first)
+    assert first.endswith('.png')
+    assert os.listdir(tmp_path) == [os.path.basename(first)]
+    assert store.stats()['file_hits'] == 1
+
+
+def test_failed_upload_leaves_no_partial_file(tmp_path):
+    with pytest.raises(OSError):
+        ContentStore().save(FileStorage(FailingStream(b'image'), 'a.png'), str(tmp_path), 'thumbnails')
+    assert not os.listdir(tmp_path)
+
+
+def test_thumbnail_is_written_once(tmp_path):
+    image_path, thumbnail_path = str(tmp_path / 'image.png'), str(tmp_path / 'thumbnails' / 'image.png')
+    PILImage.new('RGB', (512, 300)).save(image_path)
+    os.makedirs(tmp_path / 'thumbnails')
+    store = ContentStore()
+    store.ensure_thumbnail(image_path, thumbnail_path)
+    store.ensure_thumbnail(image_path, thumbnail_path)
+    with PILImage.open(thumbnail_path) as thumbnail:
+        assert thumbnail.format == 'PNG' and thumbnail.size == (256, 256)
+    assert os.listdir(tmp_path / 'thumbnails') == ['image.png']
+    assert store.stats()['thumbnail_hits'] == 1
+
+
+def test_failed_thumbnail_leaves_no_partial_file(tmp_path):
+    image_path = tmp_path / 'image.png'
+    image_path.write_bytes(b'not an image')
+    with pytest.raises(OSError):
+        ContentStore().ensure_thumbnail(str(image_path), str(tmp_path / 'thumbnail.png'))
+    assert os.listdir(tmp_path) == ['image.png']
+
+
+def test_upload_stats_require_authentication(client, auth_headers):
+    assert client.get('/api/images/upload/stats').status_code == 401
+    response = client.get('/api/images/upload/stats', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json['uploads']['uploads'] == 0
@@ -35,7 +35,7 @@ export const endpoints = {
     getResults: "/api/results/",
     getResult: "/api/results/{result_id}",
     createResult: "/api/results/",
-    getResultsThumbnails: "/api/results/thumbnails",
+    getResultsThumbnails: "/api/results/thumbnails/manifest",
     deleteResult: "/api/results/{result_id}",
     renameClassification: "/api/results/{result_id}/classification/{classification_name}/rename",
     getDatasets: "/api/datasets/",
@@ -45,11 +45,11 @@ export const endpoints = {
     renameDataset: "/api/datasets/{dataset_id}",
     getDatasetImages: "/api/datasets/{dataset_id}/images",
     addImageToDataset: "/api/datasets/{dataset_id}/images",
-    getDatasetsThumbnails: "/api/datasets/thumbnails",
+    getDatasetsThumbnails: "/api/datasets/thumbnails/manifest",
     adjustDatasetClassifications: "/api/datasets/{dataset_id}/images/{image_id}",
     compareToDataset: "/api/datasets/{dataset_id}/comparison",
     getComparisonHistory: "/api/comparison_history/",
-    getComparisonHistoryThumbnails: "/api/comparison_history/thumbnails",
+    getComparisonHistoryThumbnails: "/api/comparison_history/thumbnails/manifest",
     deleteComparison: "/api/comparison_history/{comparison_id}"
 };
 
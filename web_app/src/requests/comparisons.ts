@@ -1,10 +1,10 @@
 import { config, endpoints } from "@/config";
 import type {
     CompareToDatasetResponse,
-    GetComparisonHistoryResponse,
-    GetThumbnailsResponse
+    GetComparisonHistoryResponse
 } from "@/types/requests";
 import { sendRequest } from "@/utils";
+import { getThumbnails } from "@/requests/images";
 
 
 
@@ -56,13 +56,7 @@ export async function deleteComparison(id: string | number) {
 export async function getComparisonHistoryThumbnails() {
     const requestUri = config.serverUri + endpoints.getComparisonHistoryThumbnails;
 
-    const requestPromise = sendRequest(requestUri, null, "GET");
-    const response = await requestPromise;
-
-    if (response.ok) {
-        return response.json() as Promise<GetThumbnailsResponse>;
-    }
-    else {
+    return getThumbnails(requestUri).catch(() => {
         throw new Error("Failed to get comparison history thumbnails");
-    }
+    });
 }
@@ -1,5 +1,6 @@
 import { config, endpoints } from "@/config";
 import { sendRequest } from "@/utils";
+import { getThumbnails } from "@/requests/images";
 import type {
     AddImageToDatasetRequestData,
     AddImageToDatasetResponse,
@@ -8,7 +9,6 @@ import type {
     CreateDatasetResponse,
     GetDatasetResponse,
     GetDatasetsResponse,
-    GetThumbnailsResponse,
     RenameDatasetResponse
 } from "@/types/requests";
 
@@ -47,15 +47,9 @@ export async function getDatasets() {
 export async function getDatasetsThumbnails() {
     const requestUri = config.serverUri + endpoints.getDatasetsThumbnails;
 
-    const requestPromise = sendRequest(requestUri, null, "GET");
-    const response = await requestPromise;
-
-    if (response.ok) {
-        return response.json() as Promise<GetThumbnailsResponse>;
-    }
-    else {
+    return getThumbnails(requestUri).catch(() => {
         throw new Error(`Failed to get datasets thumbnails`);
-    }
+    });
 }
 
 
@@ -3,6 +3,8 @@ import { sendRequest } from "@/utils";
 import type { BackgroundPoint } from "@/types/app";
 import type {
     AcceptBackgroundResponse,
+    GetThumbnailManifestResponse,
+    GetThumbnailsResponse,
     SendBackgroundPointsResponse,
     UploadImageResponse
 } from "@/types/requests";
@@ -24,6 +26,60 @@ export async function getImageBlob(id: string | number) {
 }
 
 
+// The thumbnail of an image never changes, so its object URL is created once and reused on every load
+const thumbnailUris = new Map<number, Promise<string>>();
+
+
+async function getThumbnailUri(imageId: number, url: string): Promise<string> {
+    const cached = thumbnailUris.get(imageId);
+
+    if (cached !== undefined) {
+        return cached;
+    }
+
+    const thumbnailUri = sendRequest(config.serverUri + url, null, "GET").then(async response => {
+        if (!response.ok) {
+            throw new Error(`Failed to get thumbnail of image ${imageId}`);
+        }
+
+        return URL.createObjectURL(await response.blob());
+    });
+    thumbnailUris.set(imageId, thumbnailUri);
+    // a failed request is retried on the next load
+    thumbnailUri.catch(() => {
+        if (thumbnailUris.get(imageId) === thumbnailUri) {
+            thumbnailUris.delete(imageId);
+        }
+    });
+
+    return thumbnailUri;
+}
+
+
+// Releases the cached thumbnails, they belong to the user who loaded them
+export function revokeThumbnails() {
+    for (const thumbnailUri of thumbnailUris.values()) {
+        thumbnailUri.then(uri => URL.revokeObjectURL(uri)).catch(() => { });
+    }
+    thumbnailUris.clear();
+}
+
+
+// Thumbnails are fetched one by one, so the browser caches each of them
+export async function getThumbnails(manifestUri: string): Promise<GetThumbnailsResponse> {
+    const manifestResponse = await sendRequest(manifestUri, null, "GET");
+
+    if (!manifestResponse.ok) {
+        throw new Error("Failed to get thumbnails manifest");
+    }
+
+    const manifest = await manifestResponse.json() as GetThumbnailManifestResponse;
+    return Promise.all(manifest.map(async item => {
+        return { id: item.id, thumbnailUri: await getThumbnailUri(item.image_id, item.url) };
+    }));
+}
+
+
 export async function uploadImage(imageFile: File) {
     const requestUri = config.serverUri + endpoints.uploadImage;
     const requestData = new FormData();
@@ -43,7 +99,7 @@ export async function uploadImage(imageFile: File) {
 
 export async function sendBackgroundPoints(id: string | number, points: Array<BackgroundPoint>) {
     const requestUri = config.serverUri + endpoints.sendSelection
-        .replace("{image_id}", id.toString());
+        .replace("{image_id}", id.toString()) + "?preview=true&encoding=rle";
     const requestData = JSON.stringify({ data: points });
 
     const requestPromise = sendRequest(requestUri, requestData, "PUT");
@@ -1,10 +1,10 @@
 import { config, endpoints } from "@/config";
 import { sendRequest } from "@/utils";
+import { getThumbnails } from "@/requests/images";
 import type {
     CreateResultResponse,
     GetResultResponse,
-    GetResultsResponse,
-    GetThumbnailsResponse
+    GetResultsResponse
 } from "@/types/requests";
 
 
@@ -63,15 +63,9 @@ export async function createResult(
 export async function getResultsThumbnails() {
     const requestUri = config.serverUri + endpoints.getResultsThumbnails;
 
-    const requestPromise = sendRequest(requestUri, null, "GET");
-    const response = await requestPromise;
-
-    if (response.ok) {
-        return response.json() as Promise<GetThumbnailsResponse>;
-    }
-    else {
+    return getThumbnails(requestUri).catch(() => {
         throw new Error(`Failed to get results thumbnails`);
-    }
+    });
 }
 
 
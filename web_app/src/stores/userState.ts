@@ -1,5 +1,6 @@
 import type { UserLoginResponse } from "@/types/requests";
 import { defineStore } from "pinia";
+import { revokeThumbnails } from "@/requests/images";
 
 
 // Stores data related to the current user
@@ -31,6 +32,7 @@ export const useUserStateStore = defineStore("userState", {
 
         logout() {
             this.reset();
+            revokeThumbnails();
 
             document.cookie = "username=; path=/; secure; sameSite=strict; expires=Thu, 01 Jan 1970 00:00:00 GMT";
             document.cookie = "userId=; path=/; secure; sameSite=strict; expires=Thu, 01 Jan 1970 00:00:00 GMT";
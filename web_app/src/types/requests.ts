@@ -8,8 +8,14 @@ import type { BackgroundPoint } from "./app";
 
 export type UploadImageResponse = number;
 
+// Uncompressed COCO run-length encoding: run lengths in column-major order, starting with a run of false values
+export interface RunLengthEncodedMask {
+    size: [number, number],     // [height, width]
+    counts: Array<number>
+}
+
 export interface SendBackgroundPointsResponse {
-    mask: Array<Array<boolean>>
+    mask: RunLengthEncodedMask
 }
 
 export type AcceptBackgroundResponse = ImageWithAllData;
@@ -94,9 +100,15 @@ export interface UserLoginResponse {
 
 // Common
 
+export interface GetThumbnailManifestResponse extends Array<{
+    id: number,
+    image_id: number,
+    url: string
+}> { }
+
 export interface GetThumbnailsResponse extends Array<{
     id: number,
-    thumbnail: string
+    thumbnailUri: string
 }> { }
 
 export interface ImageElementResponse {
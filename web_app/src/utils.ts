@@ -1,7 +1,12 @@
 import { boundingBoxColors, config } from "./config";
 import { useUserStateStore } from "./stores/userState";
 import { useImageStateStore } from "./stores/imageState";
-import type { GetDatasetResponse, ImageElementResponse, ImageWithAllData } from "./types/requests";
+import type {
+    GetDatasetResponse,
+    ImageElementResponse,
+    ImageWithAllData,
+    RunLengthEncodedMask
+} from "./types/requests";
 import type { DatasetClassificationListItem, ImageDetails, ObjectClassification } from "./types/app";
 
 
@@ -56,22 +61,23 @@ export function formatClassificationName(name: string): string {
 }
 
 
-export function createMaskImage(mask: Array<Array<boolean>>): ImageData {
-    const width = mask[0].length;
-    const height = mask.length;
-    const buffer = new Uint8ClampedArray(width * height * 4);
+export function createMaskImage(mask: RunLengthEncodedMask): ImageData {
+    const [height, width] = mask.size;
+    // Zero-filled, so only the runs of true values need to be written
+    const pixels = new Uint32Array(width * height);
 
-    for (let y = 0; y < height; y++) {
-        for (let x = 0; x < width; x++) {
-            const pos = (y * width + x) * 4;
-            buffer[pos] = Number(mask[y][x]) * 255;
-            buffer[pos + 1] = Number(mask[y][x]) * 255;
-            buffer[pos + 2] = Number(mask[y][x]) * 255;
-            buffer[pos + 3] = Number(mask[y][x]) * 255;
+    let index = 0;
+    mask.counts.forEach((count, run) => {
+        if (run % 2 === 1) {
+            // Runs go down the columns
+            for (let i = index; i < index + count; i++) {
+                pixels[(i % height) * width + Math.floor(i / height)] = 0xffffffff;
+            }
         }
-    }
+        index += count;
+    });
 
-    const imageData = new ImageData(buffer, width, height);
+    const imageData = new ImageData(new Uint8ClampedArray(pixels.buffer), width, height);
     return imageData;
 }
 
@@ -185,11 +191,6 @@ export async function processImageData(source: File | Blob, id: number): Promise
 }
 
 
-export function base64ToImageUri(base64: string): string {
-    return "data:image/png;base64," + base64;
-}
-
-
 export function isUserAgentMobile(): boolean {
     return /Android|webOS|iPhone|iPad|iPod|BlackBerry|IEMobile|Opera Mini/i.test(navigator.userAgent);
 }